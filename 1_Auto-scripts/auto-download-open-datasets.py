@@ -2,10 +2,27 @@ import sys
 import os
 from pathlib import Path
 import argparse
-import requests
-import shutil
 import time
+import json
 import zipfile
+import hashlib
+import shutil
+import threading
+import importlib.util
+import io
+import socket
+import struct
+import zlib
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+# requests (and urllib3) are imported in the functions that talk to the network, so --help, --list and
+# --dry-run do not pay for importing them.
+
+# harmonize_utils.py lives in 2_Harmonize-cgm-datasets; its glob_to_regex matches archive members against the
+# same patterns the harmonization scripts pass to Path.rglob.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "2_Harmonize-cgm-datasets"))
+from harmonize_utils import glob_to_regex
 
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
@@ -22,21 +39,366 @@ def file_size(download_request):
     return file_size
 
 
+# Download key: [url, output file, dataset folder name, approximate size unzipped, approximate download size]
+DATA_SETS = {
+    "d1namo": ["https://zenodo.org/records/5651217/files/diabetes_subset_pictures-glucose-food-insulin.zip?download=1", "D1NAMO_raw-data.zip", "D1NAMO", 503795712, 251670528],
+    "bigideas": ["https://physionet.org/content/big-ideas-glycemic-wearable/get-zip/1.1.2/", "BIGIDEAs_raw-data.zip", "BIGIDEAs", 41899750402, 5015249922],
+    "shanghai": ["https://ndownloader.figshare.com/files/42966622", "Shanghai_raw-data.zip", "Shanghai", 17637376, 4202496],
+    "uchtt1dm": ["https://github.com/fisiologiacuantitativauc/UC_HT_T1DM/archive/refs/heads/main.zip", "UCHTT1DM_raw-data.zip", "UCHTT1DM", 7364608, 3346432],
+    "hupa-ucm": ["https://data.mendeley.com/public-api/zip/3hbcscwz44/download/1", "HUPA-UCM_raw-data.zip", "HUPA-UCM", 510099456, 81461248],
+    "cgmacros": ["https://physionet.org/content/cgmacros/get-zip/1.0.0/", "CGMacros_raw-data.zip", "CGMacros", 2142145147, 657529467],
+    "t1d-uom": ["https://zenodo.org/records/15806142/files/sharpic/ManchesterCSCoordinatedDiabetesStudy-V1.0.3.zip?download=1", "T1D-UOM_raw-data.zip", "T1D-UOM", 47886336, 7397376],
+    "bris-t1d_open": ["https://data.bris.ac.uk/datasets/33z5jc8fa6tob21ptrugzqog08/33z5jc8fa6tob21ptrugzqog08.zip", "Bris-T1_Open_raw-data.zip", "Bris-T1D_Open", 184420193, 26367841],
+    "azt1d": ["https://data.mendeley.com/public-api/zip/gk9m674wcx/download/1", "AZT1D_raw-data.zip", "AZT1D", 1564389376, 775856128],
+    "park_2025": ["https://web.stanford.edu/group/genetics/cgmdb/data/data_cgm.csv", "Park_2025_raw-data.csv", "Park_2025", 1236992, 1236992],
+    "physiocgm": ["https://springernature.figshare.com/ndownloader/articles/28136294/versions/1", "PhysioCGM_raw-data.zip", "PhysioCGM", 9166416330, 9166416330]
+}
+
+
 def dataset_library(download_request):
-    data_sets = {
-        "d1namo": ["https://zenodo.org/records/5651217/files/diabetes_subset_pictures-glucose-food-insulin.zip?download=1", "D1NAMO_raw-data.zip", "D1NAMO", 503795712, 251670528],
-        "bigideas": ["https://physionet.org/content/big-ideas-glycemic-wearable/get-zip/1.1.2/", "BIGIDEAs_raw-data.zip", "BIGIDEAs", 41899750402, 5015249922],
-        "shanghai": ["https://ndownloader.figshare.com/files/42966622", "Shanghai_raw-data.zip", "Shanghai", 17637376, 4202496],
-        "uchtt1dm": ["https://github.com/fisiologiacuantitativauc/UC_HT_T1DM/archive/refs/heads/main.zip", "UCHTT1DM_raw-data.zip", "UCHTT1DM", 7364608, 3346432],
-        "hupa-ucm": ["https://data.mendeley.com/public-api/zip/3hbcscwz44/download/1", "HUPA-UCM_raw-data.zip", "HUPA-UCM", 510099456, 81461248],
-        "cgmacros": ["https://physionet.org/content/cgmacros/get-zip/1.0.0/", "CGMacros_raw-data.zip", "CGMacros", 2142145147, 657529467],
-        "t1d-uom": ["https://zenodo.org/records/15806142/files/sharpic/ManchesterCSCoordinatedDiabetesStudy-V1.0.3.zip?download=1", "T1D-UOM_raw-data.zip", "T1D-UOM", 47886336, 7397376],
-        "bris-t1d_open": ["https://data.bris.ac.uk/datasets/33z5jc8fa6tob21ptrugzqog08/33z5jc8fa6tob21ptrugzqog08.zip", "Bris-T1_Open_raw-data.zip", "Bris-T1D_Open", 184420193, 26367841],
-        "azt1d": ["https://data.mendeley.com/public-api/zip/gk9m674wcx/download/1", "AZT1D_raw-data.zip", "AZT1D", 1564389376, 775856128],
-        "park_2025": ["https://web.stanford.edu/group/genetics/cgmdb/data/data_cgm.csv", "Park_2025_raw-data.csv", "Park_2025", 1236992, 1236992],
-        "physiocgm": ["https://springernature.figshare.com/ndownloader/articles/28136294/versions/1", "PhysioCGM_raw-data.zip", "PhysioCGM", 9166416330, 9166416330]
+    return DATA_SETS[download_request][0], DATA_SETS[download_request][1], DATA_SETS[download_request][2], DATA_SETS[download_request][3], DATA_SETS[download_request][4]
+
+
+def dataset_options(download_request):
+    '''
+    Optional per-dataset download settings that are not part of dataset_library.
+      - "segments": number of parallel byte-range connections used when downloading with --segmented.
+      - "download_workers" / "unpack_workers": pool sizes for datasets split into per-subject zips.
+      - "members": glob patterns (as used by the dataset's harmonizer with rglob) for the archive members
+        that harmonization needs. Only these are extracted unless --extract full is used.
+      - "harmonize": auto-harmonize-CGM-datasets.py keys for downloads that hold more than one Glucose-ML
+        dataset (default: the download key itself).
+    '''
+    options = {
+        "d1namo": {"members": ["diabetes_subset*/*/glucose.csv"]},
+        "bigideas": {"segments": 8, "members": ["*/Dexcom_*.csv"]},
+        "shanghai": {"members": ["Shanghai_T1DM/*.xls", "Shanghai_T1DM/*.xlsx", "Shanghai_T2DM/*"], "harmonize": ["shanghait1dm", "shanghait2dm"]},
+        "uchtt1dm": {"members": ["**/Glucose.xlsx"]},
+        "hupa-ucm": {"members": ["**/Preprocessed/*.csv"]},
+        "cgmacros": {"segments": 4, "members": ["**/CGMacros_dateshifted*.zip", "*/CGMacros-*.csv"], "harmonize": ["cgmacros_dexcom", "cgmacros_libre"]},
+        "t1d-uom": {"members": ["*/Glucose Data/*.csv"]},
+        "bris-t1d_open": {"members": ["**/processed_state/*.csv"]},
+        "azt1d": {"segments": 4, "members": ["**/*2025.zip", "*Diabetes/AZT1D 2025/CGM Records/**/**/*.csv"]},
+        "physiocgm": {"download_workers": 4, "unpack_workers": 2, "members": ["*_raw/cgm.csv"]},
     }
-    return data_sets[download_request][0], data_sets[download_request][1], data_sets[download_request][2], data_sets[download_request][3], data_sets[download_request][4]
+    return options.get(download_request, {})
+
+
+def member_matches(name, patterns):
+    '''
+    Returns True if an archive member name matches any of the glob patterns.
+    '''
+    return any(glob_to_regex(pattern, recursive=True).fullmatch(name) for pattern in patterns)
+
+
+PARALLEL_EXTRACT_MIN_BYTES = 32 * 1024 * 1024  # Smaller extractions are not worth starting workers for.
+
+
+def _extract_members_parallel(zip_path, members, extract_dir, workers):
+    '''
+    Extracts members of a zip archive with a pool of worker threads. Each worker opens its own handle on
+    the archive, and members are handed out largest first so the workers finish at about the same time.
+    zlib releases the GIL while inflating and while computing CRC-32s, so the workers run on separate cores.
+    Each member's CRC-32 is checked by zipfile as it is read; a mismatch raises zipfile.BadZipFile.
+    '''
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract_member(info):
+        if not hasattr(local, "zf"):
+            local.zf = zipfile.ZipFile(zip_path)
+            with handles_lock:
+                handles.append(local.zf)
+        local.zf.extract(info, extract_dir)
+
+    # Create every parent folder up front so the workers never race each other to create the same one.
+    for folder in {_member_target(extract_dir, info.filename).parent for info in members}:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(extract_member, info) for info in sorted(members, key=lambda info: info.file_size, reverse=True)]:
+                future.result()
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def extract_archive(zip_path, extract_dir, patterns=None, name_prefix="", workers=1):
+    '''
+    Extracts a zip archive into extract_dir.
+    With patterns, only the members matching them are extracted: the member list is read from the
+    zip's central directory and everything else is skipped. name_prefix is prepended to member names
+    before matching, for archives that are unpacked into a subfolder of the raw-data directory.
+    If no member matches, the whole archive is extracted so nothing is silently lost.
+    With workers > 1, large extractions are spread over that many threads (see _extract_members_parallel);
+    the files written are the same as with one worker.
+    Returns (members extracted, uncompressed bytes extracted).
+    '''
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        selected = members
+        if patterns:
+            compiled = [glob_to_regex(pattern, recursive=True) for pattern in patterns]
+            selected = [info for info in members if any(regex.fullmatch(name_prefix + info.filename) for regex in compiled)]
+            if not selected:
+                print(f"{YELLOW}Glucose-ML{R}: No members of {Path(zip_path).name} matched {patterns}. Extracting the whole archive.")
+                selected = members
+
+        if workers > 1 and len(selected) > 1 and sum(info.file_size for info in selected) >= PARALLEL_EXTRACT_MIN_BYTES:
+            _extract_members_parallel(zip_path, selected, extract_dir, workers)
+        else:
+            for info in selected:
+                zf.extract(info, extract_dir)
+
+    extracted_bytes = sum(info.file_size for info in selected)
+    if patterns:
+        total_bytes = sum(info.file_size for info in members)
+        print(
+            f"{LIME_GREEN}Glucose-ML{R}: Extracted {len(selected)} of {len(members)} files from {LIGHT_RED}{Path(zip_path).name}{R} "
+            f"({extracted_bytes/1e6:.1f} of {total_bytes/1e6:.1f} MB)."
+        )
+    return len(selected), extracted_bytes
+
+
+def _member_target(extract_dir, name):
+    '''
+    Returns where ZipFile.extract would write an archive member: drive letters, leading slashes and
+    "." / ".." path parts are dropped so members cannot be written outside extract_dir.
+    '''
+    arcname = name.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    arcname = os.path.sep.join(part for part in arcname.split(os.path.sep) if part not in ("", os.path.curdir, os.path.pardir))
+    return Path(extract_dir) / arcname
+
+
+class StreamingZipExtractor:
+    '''
+    Unzips a zip archive from its bytes as they are downloaded, so extraction finishes with the download.
+    The archive is read front to back through its local file headers; members matching patterns (all
+    members without patterns) are inflated with zlib and written to extract_dir, and the CRC-32 of each
+    one is computed on the way. Streaming stops at the central directory.
+
+    Members whose sizes are not in the local header (data descriptor) can still be streamed when they are
+    deflated, since the end of a deflate stream is self-delimiting. Anything that cannot be streamed
+    (encryption, other compression methods, stored members of unknown size) stops streaming; finish() then
+    extracts whatever was not streamed the normal way.
+    '''
+
+    LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+    def __init__(self, extract_dir, patterns=None, name_prefix=""):
+        self.extract_dir = Path(extract_dir)
+        self.patterns = patterns
+        self.name_prefix = name_prefix
+        self.compiled = [glob_to_regex(pattern, recursive=True) for pattern in patterns] if patterns else None
+        self.extracted = {}
+        self.reset()
+
+    def reset(self):
+        '''
+        Starts over from the first byte of the archive (e.g. when the download restarts).
+        '''
+        self.position = 0
+        self.buffer = bytearray()
+        self.member = None
+        self.stopped = None
+        self.extracted = {}
+
+    def _wanted(self, name):
+        return self.compiled is None or any(regex.fullmatch(self.name_prefix + name) for regex in self.compiled)
+
+    def _stop(self, reason):
+        if self.member is not None and self.member["out"] is not None:
+            self.member["out"].close()
+        self.member = None
+        self.stopped = reason
+
+    def feed(self, data):
+        '''
+        Takes the next bytes of the archive.
+        '''
+        self.position += len(data)
+        if self.stopped is not None:
+            return
+        self.buffer += data
+        try:
+            while self.stopped is None and self._step():
+                pass
+        except (zlib.error, OSError, ValueError) as e:
+            self._stop(f"{type(e).__name__}: {e}")
+
+    def feed_file(self, path):
+        '''
+        Feeds the bytes of a partly downloaded archive already on disk.
+        '''
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+                self.feed(chunk)
+
+    def _step(self):
+        '''
+        Parses as much of the buffer as possible. Returns True if it made progress.
+        '''
+        if self.member is None:
+            return self._read_header()
+        if self.member["state"] == "data":
+            return self._read_data()
+        return self._read_descriptor()
+
+    def _read_header(self):
+        if len(self.buffer) < 4:
+            return False
+        if self.buffer[:4] != b"PK\x03\x04":
+            # The central directory (or anything else) follows the last member.
+            self._stop("end of members" if self.buffer[:4] in (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06") else "unexpected data")
+            return False
+        if len(self.buffer) < self.LOCAL_HEADER.size:
+            return False
+        _, _, flags, method, _, _, crc, compressed_size, file_size, name_length, extra_length = self.LOCAL_HEADER.unpack_from(self.buffer)
+        header_size = self.LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_size:
+            return False
+
+        raw_name = bytes(self.buffer[self.LOCAL_HEADER.size:self.LOCAL_HEADER.size + name_length])
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        extra = bytes(self.buffer[self.LOCAL_HEADER.size + name_length:header_size])
+        zip64 = False
+        # Zip64 sizes live in extra field 0x0001 when the 32-bit fields are maxed out.
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_size = struct.unpack_from("<HH", extra, offset)
+            if field_id == 0x0001 and field_size >= 16:
+                zip64 = True
+                file_size, compressed_size = struct.unpack_from("<QQ", extra, offset + 4)
+            offset += 4 + field_size
+        del self.buffer[:header_size]
+
+        has_descriptor = bool(flags & 0x08)
+        if flags & 0x01:
+            self._stop(f"{name} is encrypted")
+            return False
+        if has_descriptor and method != zipfile.ZIP_DEFLATED:
+            self._stop(f"{name} has no size in its local header")
+            return False
+
+        wanted = not name.endswith("/") and self._wanted(name)
+        supported = method in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+        out = None
+        if wanted and supported:
+            target = _member_target(self.extract_dir, name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            out = open(target, "wb")
+        self.member = {
+            "name": name,
+            "state": "data",
+            "method": method,
+            "remaining": None if has_descriptor else compressed_size,
+            "has_descriptor": has_descriptor,
+            "zip64": zip64,
+            "out": out,
+            "inflate": zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED and (out is not None or has_descriptor) else None,
+            "crc": 0,
+            "size": 0,
+        }
+        return True
+
+    def _write(self, data):
+        if self.member["out"] is not None and data:
+            self.member["out"].write(data)
+            self.member["crc"] = zlib.crc32(data, self.member["crc"])
+            self.member["size"] += len(data)
+
+    def _read_data(self):
+        member = self.member
+        if member["remaining"] is not None:
+            take = min(member["remaining"], len(self.buffer))
+            if take == 0 and member["remaining"] > 0:
+                return False
+            data = bytes(self.buffer[:take])
+            del self.buffer[:take]
+            member["remaining"] -= take
+            if member["inflate"] is not None:
+                self._write(member["inflate"].decompress(data))
+            elif member["method"] == zipfile.ZIP_STORED:
+                self._write(data)
+            if member["remaining"] == 0:
+                if member["inflate"] is not None:
+                    self._write(member["inflate"].flush())
+                self._end_member()
+            return take > 0 or member["remaining"] == 0
+
+        # Size unknown: the deflate stream ends itself, and whatever follows it is the data descriptor.
+        if not self.buffer:
+            return False
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        self._write(member["inflate"].decompress(data))
+        if member["inflate"].eof:
+            self.buffer += member["inflate"].unused_data
+            member["state"] = "descriptor"
+        return True
+
+    def _read_descriptor(self):
+        size_bytes = 8 if self.member["zip64"] else 4
+        needed = 4 + 2 * size_bytes
+        if len(self.buffer) < 4:
+            return False
+        if self.buffer[:4] == b"PK\x07\x08":
+            needed += 4
+        if len(self.buffer) < needed:
+            return False
+        del self.buffer[:needed]
+        self._end_member()
+        return True
+
+    def _end_member(self):
+        member = self.member
+        if member["out"] is not None:
+            member["out"].close()
+            self.extracted[member["name"]] = (member["crc"] & 0xFFFFFFFF, member["size"])
+        self.member = None
+
+    def finish(self, zip_path):
+        '''
+        Checks the streamed members against the archive's central directory once the download is complete.
+        Members that were not streamed, or whose CRC-32 or size do not match, are extracted from zip_path the
+        normal way. The members selected (including the whole-archive fallback when no member matches the
+        patterns) are the same as in extract_archive. Returns (members extracted, uncompressed bytes extracted).
+        '''
+        if self.member is not None and self.member["out"] is not None:
+            self.member["out"].close()
+        with zipfile.ZipFile(zip_path) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            selected = [info for info in members if self._wanted(info.filename)] if self.compiled else members
+            if not selected:
+                print(f"{YELLOW}Glucose-ML{R}: No members of {Path(zip_path).name} matched {self.patterns}. Extracting the whole archive.")
+                selected = members
+            selected_names = {info.filename for info in selected}
+
+            # A streamed file that is not in the central directory is not part of the archive.
+            for name in set(self.extracted) - selected_names:
+                _member_target(self.extract_dir, name).unlink(missing_ok=True)
+
+            leftover = [info for info in selected if self.extracted.get(info.filename) != (info.CRC, info.file_size)]
+            for info in leftover:
+                zf.extract(info, self.extract_dir)
+
+        extracted_bytes = sum(info.file_size for info in selected)
+        streamed = len(selected) - len(leftover)
+        print(
+            f"{LIME_GREEN}Glucose-ML{R}: Unzipped {streamed} of {len(selected)} selected files from {LIGHT_RED}{Path(zip_path).name}{R} "
+            f"while downloading" + (f", {len(leftover)} after the download ({self.stopped})" if leftover and self.stopped else
+                                    f", {len(leftover)} after the download" if leftover else "") +
+            f" ({extracted_bytes/1e6:.1f} MB of {len(members)} files in the archive)."
+        )
+        return len(selected), extracted_bytes
+
+
+FIGSHARE_API = "https://api.figshare.com/v2"
 
 
 def figshare_list_article_files(article_id, headers, timeout=(10, 60)):
@@ -44,7 +406,8 @@ def figshare_list_article_files(article_id, headers, timeout=(10, 60)):
     Helper function for the PhysioCGM dataset. Returns a list of dicts: [{"name": ..., "download_url": ..., "size": ...}, ...]
     for a public Figshare article.
     """
-    api_url = f"https://api.figshare.com/v2/articles/{article_id}"
+    import requests
+    api_url = f"{FIGSHARE_API}/articles/{article_id}"
     with requests.Session() as s:
         r = s.get(api_url, headers=headers, timeout=timeout)
         r.raise_for_status()
@@ -56,60 +419,978 @@ def figshare_list_article_files(article_id, headers, timeout=(10, 60)):
             "name": f.get("name"),
             "download_url": f.get("download_url"), 
             "size": f.get("size", 0) or 0,
+            "md5": f.get("computed_md5"),
         })
     return files
 
 
-def download_stream_to_path(url, dst_path, headers, timeout, raw_size_fallback=None, progress_prefix=""):
+def _content_range(resp):
+    '''
+    Reads a Content-Range header such as "bytes 100-199/1000" or "bytes */1000".
+    Returns (first_byte, total_bytes); either value is None if the server did not send it.
+    '''
+    value = resp.headers.get("Content-Range", "")
+    if not value.startswith("bytes "):
+        return None, None
+    byte_range, _, total = value[len("bytes "):].partition("/")
+    first_byte = byte_range.split("-")[0]
+    first_byte = int(first_byte) if first_byte.isdigit() else None
+    total = int(total) if total.isdigit() else None
+    return first_byte, total
+
+
+def _download_is_complete(part_path, bytes_on_disk, total_bytes, expected_size):
+    '''
+    Decides whether a finished .part file holds the whole download.
+    Prefers the server's length, then a known exact size (expected_size) and, for zip archives
+    without either, checks that the end-of-archive record is present.
+    '''
+    if total_bytes:
+        return bytes_on_disk == total_bytes
+    if expected_size:
+        return bytes_on_disk == expected_size
+    if part_path.name.lower().endswith(".zip.part"):
+        return zipfile.is_zipfile(part_path)
+    return bytes_on_disk > 0
+
+
+CACHE_LOCK = threading.Lock()
+
+
+def _sha256_file(path, hasher=None):
+    '''
+    Feeds a file into a SHA-256 hasher (a new one unless given) and returns the hasher.
+    '''
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher
+
+
+def _load_json(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(src, dst):
+    '''
+    Places src at dst as a hard link (no extra disk space) or, across filesystems, as a copy.
+    '''
+    tmp_path = Path(dst).with_name(Path(dst).name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def remember_verified(path, digest, cache_dir):
+    '''
+    Records a file's SHA-256 with its size and mtime in <cache_dir>/verified.json.
+    '''
+    stat = Path(path).stat()
+    records_path = Path(cache_dir) / "verified.json"
+    with CACHE_LOCK:
+        records = _load_json(records_path)
+        records[str(Path(path).resolve())] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        _save_json(records_path, records)
+
+
+def verified_sha256(path, cache_dir):
+    '''
+    Returns the SHA-256 of a file. A digest recorded by remember_verified is reused without
+    reading the file again as long as the file's size and mtime have not changed.
+    '''
+    stat = Path(path).stat()
+    with CACHE_LOCK:
+        record = _load_json(Path(cache_dir) / "verified.json").get(str(Path(path).resolve()))
+    if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+        return record["sha256"]
+    digest = _sha256_file(path).hexdigest()
+    remember_verified(path, digest, cache_dir)
+    return digest
+
+
+def cache_store(cache_dir, download_request, file_path, digest):
+    '''
+    Adds a downloaded file to the content-addressed cache:
+      - the bytes are kept once under <cache_dir>/objects/<sha256>
+      - <cache_dir>/manifest.json maps the dataset key and file name to the digest and size.
+    '''
+    cache_dir = Path(cache_dir)
+    file_path = Path(file_path)
+    object_path = cache_dir / "objects" / digest
+    object_path.parent.mkdir(parents=True, exist_ok=True)
+    if not object_path.exists():
+        _link_or_copy(file_path, object_path)
+        remember_verified(object_path, digest, cache_dir)
+    remember_verified(file_path, digest, cache_dir)
+
+    with CACHE_LOCK:
+        manifest = _load_json(cache_dir / "manifest.json")
+        files = manifest.setdefault("datasets", {}).setdefault(download_request, {})
+        files[file_path.name] = {"sha256": digest, "size": file_path.stat().st_size}
+        _save_json(cache_dir / "manifest.json", manifest)
+
+
+def restore_from_cache(cache_dir, download_request, dst_path):
+    '''
+    Returns True if dst_path now holds the cached copy of a dataset file: either the file on disk
+    already matches the manifest digest, or it was placed there from <cache_dir>/objects.
+    '''
+    dst_path = Path(dst_path)
+    with CACHE_LOCK:
+        manifest = _load_json(Path(cache_dir) / "manifest.json")
+    entry = manifest.get("datasets", {}).get(download_request, {}).get(dst_path.name)
+    if not entry:
+        return False
+
+    if dst_path.exists() and dst_path.stat().st_size == entry["size"] and verified_sha256(dst_path, cache_dir) == entry["sha256"]:
+        return True
+
+    object_path = Path(cache_dir) / "objects" / entry["sha256"]
+    if object_path.exists() and verified_sha256(object_path, cache_dir) == entry["sha256"]:
+        _link_or_copy(object_path, dst_path)
+        remember_verified(dst_path, entry["sha256"], cache_dir)
+        return True
+    return False
+
+
+def _is_url(location):
+    return urlparse(str(location)).scheme in ("http", "https")
+
+
+def read_mirror_manifest(mirror, headers, timeout):
+    '''
+    Reads manifest.json from a mirror: another node's cache directory on a shared filesystem,
+    or the same directory served over HTTP.
+    '''
+    import requests
+    if _is_url(mirror):
+        resp = requests.get(mirror.rstrip("/") + "/manifest.json", headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+    manifest_path = Path(mirror) / "manifest.json"
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No manifest.json found in mirror {mirror}")
+    return _load_json(manifest_path)
+
+
+def _copy_with_sha256(src, dst_path):
+    '''
+    Copies a file through "<dst_path>.part", hashing the bytes as they are copied. Returns the hex digest.
+    '''
+    dst_path = Path(dst_path)
+    part_path = dst_path.with_name(dst_path.name + ".part")
+    hasher = hashlib.sha256()
+    with open(src, "rb") as fin, open(part_path, "wb") as fout:
+        for chunk in iter(lambda: fin.read(4 * 1024 * 1024), b""):
+            fout.write(chunk)
+            hasher.update(chunk)
+    os.replace(part_path, dst_path)
+    return hasher.hexdigest()
+
+
+def fill_from_mirror(download_request, output_path, mirror, headers, timeout, cache_dir=None, progress=None, progress_key=None):
+    '''
+    Fills a raw-data directory with a dataset's files from a mirror instead of the original host.
+    Every file is checked against the mirror manifest's SHA-256 (computed while copying or streaming).
+    Files already on disk that match the manifest are kept. Returns the paths of the dataset files.
+    '''
+    manifest = read_mirror_manifest(mirror, headers, timeout)
+    files = manifest.get("datasets", {}).get(download_request)
+    if not files:
+        raise RuntimeError(f"The mirror {mirror} has no files for {download_request}.")
+    if progress is not None:
+        progress.register(progress_key, sum(entry["size"] for entry in files.values()))
+
+    placed = []
+    for name, entry in sorted(files.items()):
+        dst_path = Path(output_path) / name
+        if cache_dir and dst_path.exists() and dst_path.stat().st_size == entry["size"] and verified_sha256(dst_path, cache_dir) == entry["sha256"]:
+            print(f"{LIME_GREEN}Glucose-ML{R}: {name} already matches the mirror copy.")
+        elif _is_url(mirror):
+            digest = {}
+            download_stream_to_path(
+                f"{mirror.rstrip('/')}/objects/{entry['sha256']}", dst_path, headers=headers, timeout=timeout,
+                expected_size=entry["size"], progress_prefix=f"[{name}] ", progress=progress, progress_key=progress_key,
+                digest_out=digest,
+            )
+            if digest["sha256"] != entry["sha256"]:
+                dst_path.unlink()
+                raise ValueError(f"{LIGHT_RED}Glucose-ML{R}: {name} from the mirror does not match its SHA-256 checksum.")
+            print(f"{LIME_GREEN}Glucose-ML{R}: Copied {LIGHT_RED}{name}{R} from the mirror.")
+        else:
+            digest = _copy_with_sha256(Path(mirror) / "objects" / entry["sha256"], dst_path)
+            if digest != entry["sha256"]:
+                dst_path.unlink()
+                raise ValueError(f"{LIGHT_RED}Glucose-ML{R}: {name} from the mirror does not match its SHA-256 checksum.")
+            if progress is not None:
+                progress.add(progress_key, entry["size"])
+            print(f"{LIME_GREEN}Glucose-ML{R}: Copied {LIGHT_RED}{name}{R} from the mirror.")
+
+        if cache_dir:
+            cache_store(cache_dir, download_request, dst_path, entry["sha256"])
+        placed.append(dst_path)
+    return placed
+
+
+def response_validators(resp, total_bytes=None):
+    '''
+    Returns the headers that identify the version of a file on the server: ETag, Last-Modified and length.
+    '''
+    length = total_bytes or resp.headers.get("Content-Length")
+    return {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "content_length": int(length) if str(length or "").isdigit() else None,
+    }
+
+
+def _validators_path(download_request):
+    output_string = dataset_library(download_request)[2]
+    return Path(f"Original-Glucose-ML-datasets/{output_string}_raw_data/.validators.json")
+
+
+def save_validators(download_request, file_name, validators):
+    '''
+    Records the validators of a downloaded file in <Dataset>_raw_data/.validators.json, for --check-updates.
+    '''
+    validators_path = _validators_path(download_request)
+    records = _load_json(validators_path)
+    records[file_name] = {**validators, "checked": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    _save_json(validators_path, records)
+
+
+def _same_version(stored, current):
+    '''
+    Compares stored and current validators, strongest first. Returns None if no validator can be compared.
+    '''
+    for key in ("etag", "last_modified", "content_length"):
+        if stored.get(key) and current.get(key):
+            return stored[key] == current[key]
+    return None
+
+
+def _if_range(validators):
+    '''
+    Returns the If-Range header value that makes a server resume only the file version the validators describe:
+    its strong ETag, else its Last-Modified date (None if it has neither; weak ETags cannot be used for ranges).
+    '''
+    etag = validators.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("last_modified")
+
+
+def check_dataset_update(download_request, headers, timeout):
+    '''
+    Asks the dataset's host whether the download changed since it was last fetched, without downloading it.
+    Sends a conditional GET (If-None-Match / If-Modified-Since from the stored validators) and closes it as
+    soon as the headers arrive; PhysioCGM is compared file by file against the Figshare file list.
+    Returns a dict with "status" (missing, changed, unchanged, baseline or unknown), the changed file names
+    and the current validators.
+    '''
+    import requests
+    download_url, output_file, output_string, file_size_bytes, raw_size_bytes = dataset_library(download_request)
+    output_path = Path(f"Original-Glucose-ML-datasets/{output_string}_raw_data")
+    stored = _load_json(_validators_path(download_request))
+
+    if download_request == "physiocgm":
+        files = figshare_list_article_files(28136294, headers=headers, timeout=timeout)
+        current = {
+            f["name"]: {"etag": f.get("md5"), "last_modified": None, "content_length": f.get("size") or None}
+            for f in files if (f.get("name") or "").lower().endswith("_raw.zip")
+        }
+        if not any((output_path / name).exists() for name in current):
+            return {"status": "missing", "files": sorted(current), "validators": current}
+        if not stored:
+            return {"status": "baseline", "files": [], "validators": current}
+        changed = sorted(name for name in current if name not in stored or _same_version(stored[name], current[name]) is not True)
+        return {"status": "changed" if changed else "unchanged", "files": changed, "validators": current}
+
+    # Datasets fetched with --remote-extract keep no archive on disk, only its validators.
+    if not (output_path / output_file).exists() and output_file not in stored:
+        return {"status": "missing", "files": [output_file], "validators": {}}
+
+    stored = stored.get(output_file, {})
+    request_headers = {**headers, "Accept-Encoding": "identity"}
+    if stored.get("etag"):
+        request_headers["If-None-Match"] = stored["etag"]
+    if stored.get("last_modified"):
+        request_headers["If-Modified-Since"] = stored["last_modified"]
+
+    with requests.Session() as session:
+        resp = _get_with_retries(session, download_url, headers=request_headers, timeout=timeout, max_tries=6)
+        if resp is None:
+            raise RuntimeError("No response received from server.")
+        resp.close() # Only the headers are needed.
+    if resp.status_code == 304:
+        return {"status": "unchanged", "files": [], "validators": {output_file: stored}}
+    resp.raise_for_status()
+
+    current = response_validators(resp)
+    if not stored:
+        status = "baseline"
+    else:
+        same = _same_version(stored, current)
+        status = "unknown" if same is None else ("unchanged" if same else "changed")
+    return {"status": status, "files": [output_file] if status == "changed" else [], "validators": {output_file: current}}
+
+
+def check_for_updates(download_requests, jobs=None):
+    '''
+    Checks every dataset for a new upstream version at the same time (one request per dataset, PhysioCGM
+    uses the Figshare API). Datasets checked for the first time have their current validators recorded as
+    the baseline. Returns a dict mapping each dataset to the result of check_dataset_update (or an "error" status).
+    '''
+    headers = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
+    timeout = (10, 60)
+    print(f"{LIME_GREEN}Glucose-ML{R}: Checking {LIGHT_RED}{len(download_requests)}{R} dataset(s) for upstream changes...")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(download_requests)) as pool:
+        futures = {pool.submit(check_dataset_update, download_request, headers, timeout): download_request for download_request in download_requests}
+        for future in as_completed(futures):
+            download_request = futures[future]
+            try:
+                results[download_request] = future.result()
+            except Exception as e:
+                results[download_request] = {"status": "error", "files": [], "validators": {}, "error": e}
+
+    messages = {
+        "missing": f"{YELLOW}not downloaded yet{R}",
+        "changed": f"{YELLOW}changed upstream{R}",
+        "unchanged": f"{LIME_GREEN}up to date{R}",
+        "baseline": f"{LIME_GREEN}validators recorded{R} (first check, not re-downloaded)",
+        "unknown": f"{YELLOW}cannot tell{R} (the server sends no ETag, Last-Modified or length)",
+    }
+    print(f"{LIME_GREEN}Glucose-ML{R}: Update check:")
+    for download_request in download_requests:
+        result = results[download_request]
+        if result["status"] == "baseline":
+            for file_name, validators in result["validators"].items():
+                save_validators(download_request, file_name, validators)
+        if result["status"] == "error":
+            print(f"  {LIGHT_RED}ERROR{R}   {download_request}: {result['error']}")
+        elif result["status"] == "changed" and download_request == "physiocgm":
+            print(f"  {download_request}: {messages['changed']} ({len(result['files'])} file(s))")
+        else:
+            print(f"  {download_request}: {messages[result['status']]}")
+    return results
+
+
+def prepare_update(download_request, file_names, cache_dir=None):
+    '''
+    Removes the outdated copies of changed files before they are downloaded again: the file on disk,
+    any .part left over, its unpacked subject folder (PhysioCGM), and its entry in the download cache
+    manifest, so the old version is not restored from the cache.
+    '''
+    output_string = dataset_library(download_request)[2]
+    output_path = Path(f"Original-Glucose-ML-datasets/{output_string}_raw_data")
+    for file_name in file_names:
+        (output_path / file_name).unlink(missing_ok=True)
+        (output_path / (file_name + ".part")).unlink(missing_ok=True)
+        (output_path / (file_name + ".part.segments")).unlink(missing_ok=True)
+        (output_path / (file_name + ".part.validators")).unlink(missing_ok=True)
+        if download_request == "physiocgm":
+            shutil.rmtree(output_path / Path(file_name).stem, ignore_errors=True)
+    if cache_dir:
+        with CACHE_LOCK:
+            manifest = _load_json(Path(cache_dir) / "manifest.json")
+            files = manifest.get("datasets", {}).get(download_request, {})
+            for file_name in file_names:
+                files.pop(file_name, None)
+            _save_json(Path(cache_dir) / "manifest.json", manifest)
+
+
+TRANSFER_LOG = Path("Original-Glucose-ML-datasets/.transfer-log.jsonl")
+
+
+def _abort_response(resp):
+    '''
+    Shuts down the socket under a streaming response, so a read blocked on it in another thread returns at once.
+    '''
+    try:
+        sock = resp.raw._fp.fp.raw._sock
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except (AttributeError, OSError):
+        resp.close()
+
+
+class TransferMonitor:
+    '''
+    Watches the transfer of one dataset, over all of its connections:
+      - the transfer rate over a moving window of the last `window` seconds,
+      - stalls: a watchdog thread cuts any connection that has delivered no data for `stall_timeout`
+        seconds, so the download reconnects and resumes instead of waiting on the read timeout,
+      - the read size: about `chunk_seconds` worth of data at the current rate, between min_chunk and max_chunk,
+      - transfer stats (bytes, rates, stalls, retries, 202 waits), appended to a JSON-lines log by write_log.
+    '''
+
+    def __init__(self, name, window=30, stall_timeout=60, chunk_seconds=0.5, min_chunk=64 * 1024, max_chunk=8 * 1024 * 1024):
+        self.name = name
+        self.window = window
+        self.stall_timeout = stall_timeout
+        self.chunk_seconds = chunk_seconds
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.chunk_size = 1024 * 1024
+        self.lock = threading.Lock()
+        self.samples = collections.deque()
+        self.connections = {}
+        self.next_token = 0
+        self.stats = {"bytes": 0, "stalls": 0, "retries": 0, "waits_202": 0, "wait_seconds_202": 0, "peak_bytes_per_second": 0}
+        self.started = time.time()
+        self.finished = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def watch(self, resp):
+        '''
+        Starts watching a streaming response for stalls. Returns a token for add() and release().
+        '''
+        with self.lock:
+            token = self.next_token
+            self.next_token += 1
+            self.connections[token] = {"resp": resp, "last_data": time.time(), "stalled": False}
+        return token
+
+    def release(self, token):
+        '''
+        Stops watching a response. Returns True if the watchdog cut it because it stalled.
+        '''
+        with self.lock:
+            connection = self.connections.pop(token, None)
+        return bool(connection and connection["stalled"])
+
+    def add(self, token, nbytes):
+        now = time.time()
+        with self.lock:
+            if token in self.connections:
+                self.connections[token]["last_data"] = now
+            self.samples.append((now, nbytes))
+            self.stats["bytes"] += nbytes
+            rate = self._rate(now)
+            self.stats["peak_bytes_per_second"] = max(self.stats["peak_bytes_per_second"], rate)
+            # Read about chunk_seconds of data per call, rounded down to a power of two.
+            target = min(self.max_chunk, max(self.min_chunk, int(rate * self.chunk_seconds)))
+            self.chunk_size = 1 << (target.bit_length() - 1)
+
+    def retry(self):
+        with self.lock:
+            self.stats["retries"] += 1
+
+    def waited_202(self, seconds):
+        with self.lock:
+            self.stats["waits_202"] += 1
+            self.stats["wait_seconds_202"] += seconds
+
+    def _rate(self, now):
+        while self.samples and self.samples[0][0] < now - self.window:
+            self.samples.popleft()
+        # At least one second, so the first chunks of a transfer do not show as a burst.
+        span = min(self.window, max(1.0, now - self.started))
+        return sum(nbytes for _, nbytes in self.samples) / span
+
+    def rate(self):
+        '''
+        Returns the transfer rate over the moving window in bytes per second.
+        '''
+        with self.lock:
+            return self._rate(time.time())
+
+    def _watch(self):
+        while not self.stop_event.wait(min(5, self.stall_timeout / 4)):
+            now = time.time()
+            with self.lock:
+                stalled = [c for c in self.connections.values() if not c["stalled"] and now - c["last_data"] >= self.stall_timeout]
+                for connection in stalled:
+                    connection["stalled"] = True
+                    self.stats["stalls"] += 1
+            for connection in stalled:
+                print(f"{YELLOW}Glucose-ML{R}: [{self.name}] No data received for {self.stall_timeout}s. Reconnecting...")
+                _abort_response(connection["resp"])
+
+    def start(self):
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.finished = time.time()
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def write_log(self, log_path=TRANSFER_LOG, **fields):
+        '''
+        Appends this transfer's stats, plus any extra fields (dataset, host, status, ...), as one JSON line to log_path.
+        '''
+        seconds = (self.finished or time.time()) - self.started
+        with self.lock:
+            record = {
+                **fields,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": round(seconds, 3),
+                **self.stats,
+                "average_bytes_per_second": round(self.stats["bytes"] / seconds) if seconds > 0 else 0,
+                "peak_bytes_per_second": round(self.stats["peak_bytes_per_second"]),
+                "final_chunk_size": self.chunk_size,
+            }
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with THROUGHPUT_LOCK, open(log_path, "a") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def _iter_body(resp, monitor=None, token=None):
+    '''
+    Yields the body of a streaming response. Without a monitor it is read in 1 MiB chunks; with one,
+    in chunks sized to the observed bandwidth, and each chunk is reported to the monitor.
+    '''
+    import requests
+    from urllib3.exceptions import ProtocolError, ReadTimeoutError
+    if monitor is None:
+        yield from resp.iter_content(chunk_size=1024 * 1024)
+        return
+    while True:
+        try:
+            chunk = resp.raw.read(monitor.chunk_size, decode_content=True)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        except (ProtocolError, OSError) as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        if not chunk:
+            return
+        monitor.add(token, len(chunk))
+        yield chunk
+
+
+def download_stream_to_path(url, dst_path, headers, timeout, raw_size_fallback=None, progress_prefix="", progress=None, progress_key=None, expected_size=None, max_resumes=5, digest_out=None, monitor=None, sink=None, progress_total=False):
     """
     Streams a URL to dst_path. Prints progress every 90s.
     Uses Content-Length if available; otherwise uses raw_size_fallback.
+    If a ProgressBoard is given, bytes are reported to it under progress_key instead of being printed here.
+    With progress_total (the file is the whole of progress_key), the board's total is replaced by the size the
+    server reports (Content-Length or Content-Range) once the response arrives.
+
+    Bytes are written to "<dst_path>.part" and the file is only renamed to dst_path once it is complete.
+    If a .part file is left over from an interrupted run, or the connection drops mid-download, the download
+    resumes from the end of the .part file with a "Range: bytes=N-" request (when the server supports it).
+    The validators of the response the .part file was started from are kept in "<dst_path>.part.validators" and
+    sent as If-Range, so a server whose file changed since sends the new file whole (200) and the download restarts
+    instead of appending new bytes to old ones. A .part file without that record is not resumed.
+    Completeness is checked against Content-Length, or expected_size when the server does not send a length.
+    The SHA-256 of the file is computed from the chunks as they are written; if digest_out is a dict,
+    the hex digest is stored in it under "sha256", and the server's validators (ETag, Last-Modified,
+    length) under "validators".
+    With a TransferMonitor, reads are sized to the observed bandwidth and a stalled connection is cut by the
+    monitor's watchdog and resumed like a dropped one.
+    If sink is given (e.g. a StreamingZipExtractor), every byte of the file is also passed to sink.feed() in
+    order; sink.reset() is called when the download restarts from the beginning.
     """
-    session = requests.Session()
-    resp = session.get(url, stream=True, headers=headers, timeout=timeout, allow_redirects=True)
-    resp.raise_for_status()
+    import requests
+    dst_path = Path(dst_path)
+    part_path = dst_path.with_name(dst_path.name + ".part")
+    validators_path = dst_path.with_name(dst_path.name + ".part.validators")
+    hasher = None
+    hashed_bytes = 0
 
-    total_bytes = resp.headers.get("Content-Length")
-    try:
-        total_bytes = int(total_bytes) if total_bytes is not None else None
-    except ValueError:
-        total_bytes = None
+    # Ask for the raw bytes so Range offsets line up with what is written to disk.
+    request_headers = dict(headers)
+    request_headers.setdefault("Accept-Encoding", "identity")
 
+    session = requests.Session()
     bytes_downloaded = 0
+    total_bytes = None
+    resumes = 0
     last_print_time = time.time()
     update_interval = 90
 
-    with open(dst_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=1024 * 1024):
-            if not chunk:
-                continue
-            f.write(chunk)
-            bytes_downloaded += len(chunk)
+    while True:
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        validators = _load_json(validators_path) if offset else {}
+        if offset and not any(validators.values()):
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Partial file has no record of the server copy it came from. Restarting download.")
+            part_path.unlink()
+            offset = 0
+        request_headers.pop("If-Range", None)
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            if _if_range(validators):
+                request_headers["If-Range"] = _if_range(validators)
+        else:
+            request_headers.pop("Range", None)
+
+        resp = _get_with_retries(session, url, headers=request_headers, timeout=timeout, max_tries=6, monitor=monitor)
+        if resp is None:
+            raise RuntimeError("No response received from server.")
+
+        if offset and resp.status_code == 416:
+            # The range starts at (or past) the end of the file, so the .part file may already be complete.
+            _, total_bytes = _content_range(resp)
+            resp.close()
+            if total_bytes == offset and _same_version(validators, response_validators(resp, total_bytes)) is not False:
+                if hasher is None or hashed_bytes != offset:
+                    hasher = _sha256_file(part_path)
+                if sink is not None and sink.position != offset:
+                    sink.reset()
+                    sink.feed_file(part_path)
+                break
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Partial file does not match the server copy. Restarting download.")
+            part_path.unlink()
+            continue
+        resp.raise_for_status()
 
-            now = time.time()
-            if now - last_print_time >= update_interval:
-                denom = total_bytes or raw_size_fallback or 0
-                percent = (bytes_downloaded / denom) * 100 if denom else 0
-                print(
-                    f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}{progress_prefix}Download progress:{R} "
-                    f"{bytes_downloaded/1e9:.2f} / {(denom/1e9 if denom else 0):.2f} GB "
-                    f"({percent:.1f}%)"
-                )
-                last_print_time = now
+        if offset and resp.status_code == 206:
+            first_byte, total_bytes = _content_range(resp)
+            if first_byte != offset:
+                resp.close()
+                part_path.unlink()
+                continue
+            # Servers that ignore If-Range still give themselves away by a different ETag, date or length.
+            if _same_version(validators, response_validators(resp, total_bytes)) is False:
+                resp.close()
+                print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}The file changed on the server since the partial download. Restarting download.")
+                part_path.unlink()
+                continue
+            mode = "ab"
+            print(f"{LIME_GREEN}Glucose-ML{R}: {progress_prefix}Resuming download at {offset/1e9:.2f} GB.")
+            # Bytes left by an earlier run have to be hashed once; after a drop in this run the hash is already up to date.
+            if hasher is None or hashed_bytes != offset:
+                hasher = _sha256_file(part_path)
+                hashed_bytes = offset
+            if sink is not None and sink.position != offset:
+                sink.reset()
+                sink.feed_file(part_path)
+        else:
+            if offset and "If-Range" in request_headers:
+                print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}The file changed on the server since the partial download (or it cannot be resumed). Restarting download from the beginning.")
+            elif offset:
+                print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Server does not support resuming. Restarting download from the beginning.")
+            offset = 0
+            mode = "wb"
+            hasher = hashlib.sha256()
+            hashed_bytes = 0
+            if sink is not None:
+                sink.reset()
+            total_bytes = resp.headers.get("Content-Length")
+            try:
+                total_bytes = int(total_bytes) if total_bytes is not None else None
+            except ValueError:
+                total_bytes = None
+            # Later resumes of this .part file must come from the same version of the file.
+            validators = response_validators(resp, total_bytes)
+            _save_json(validators_path, validators)
+            if progress is not None and bytes_downloaded:
+                # Bytes from the earlier attempt are being fetched again.
+                progress.add(progress_key, -bytes_downloaded)
+                bytes_downloaded = 0
+        if progress is not None and progress_total and total_bytes:
+            progress.register(progress_key, total_bytes)
+
+        token = monitor.watch(resp) if monitor is not None else None
+        try:
+            with open(part_path, mode) as f:
+                for chunk in _iter_body(resp, monitor, token):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    hashed_bytes += len(chunk)
+                    if sink is not None:
+                        sink.feed(chunk)
+                    bytes_downloaded += len(chunk)
+
+                    if progress is not None:
+                        progress.add(progress_key, len(chunk))
+                        continue
+
+                    now = time.time()
+                    if now - last_print_time >= update_interval:
+                        done = f.tell()
+                        denom = total_bytes or raw_size_fallback or 0
+                        percent = (done / denom) * 100 if denom else 0
+                        print(
+                            f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}{progress_prefix}Download progress:{R} "
+                            f"{done/1e9:.2f} / {(denom/1e9 if denom else 0):.2f} GB "
+                            f"({percent:.1f}%" + (f", {monitor.rate()/1e6:.1f} MB/s)" if monitor is not None else ")")
+                        )
+                        last_print_time = now
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout) as e:
+            resumes += 1
+            if resumes > max_resumes:
+                raise RuntimeError(
+                    f"{LIGHT_RED}Glucose-ML{R}: {progress_prefix}Download failed after {max_resumes} resume attempts. "
+                    f"The partial download is kept at {part_path} and will resume on the next run."
+                ) from e
+            if monitor is not None:
+                monitor.retry()
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Connection dropped ({type(e).__name__}). Resuming download...")
+            continue
+        finally:
+            if monitor is not None:
+                monitor.release(token)
+
+        bytes_on_disk = part_path.stat().st_size if part_path.exists() else 0
+        if total_bytes and bytes_on_disk < total_bytes and resumes < max_resumes:
+            # The server closed the connection early without raising an error.
+            resumes += 1
+            if monitor is not None:
+                monitor.retry()
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Download ended early. Resuming download...")
+            continue
+        break
 
-    if bytes_downloaded == 0:
+    bytes_on_disk = part_path.stat().st_size if part_path.exists() else 0
+    if bytes_on_disk == 0:
         raise ValueError(
             f"{LIGHT_RED}Glucose-ML{R}: Downloaded 0 bytes (empty file). "
             f"status={resp.status_code}, content-type={resp.headers.get('Content-Type')}, final_url={resp.url}"
         )
+    if not _download_is_complete(part_path, bytes_on_disk, total_bytes, expected_size):
+        expected = total_bytes or expected_size
+        raise IOError(
+            f"{LIGHT_RED}Glucose-ML{R}: {progress_prefix}Download is incomplete "
+            f"({bytes_on_disk} of {expected if expected else 'unknown'} bytes). "
+            f"The partial download is kept at {part_path} and will resume on the next run."
+        )
 
+    os.replace(part_path, dst_path)
+    validators_path.unlink(missing_ok=True)
+    if digest_out is not None:
+        digest_out["sha256"] = hasher.hexdigest()
+        digest_out["validators"] = validators
     return bytes_downloaded
 
 
-def _get_with_retries(session, url, headers, timeout, max_tries=6):
+def _write_at(fd, data, position, file_lock):
+    '''
+    Writes data at an absolute file position. Uses os.pwrite where available so segments
+    can write without sharing a file offset; otherwise falls back to a locked seek + write.
+    '''
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, position)
+            data = data[written:]
+            position += written
+    else:
+        with file_lock:
+            os.lseek(fd, position, os.SEEK_SET)
+            os.write(fd, data)
+
+
+def download_segmented(url, dst_path, headers, timeout, segments, raw_size_fallback=None, progress_prefix="", progress=None, progress_key=None, expected_size=None, max_resumes=5, digest_out=None, monitor=None, progress_total=False):
+    """
+    Downloads a URL over several parallel connections, one byte range ("segment") per connection.
+    The output is preallocated as "<dst_path>.part" and each segment writes its bytes at their
+    position in the file. Segment progress is saved next to it in "<dst_path>.part.segments"
+    so an interrupted download resumes each segment where it stopped. The state also keeps the validators of the
+    file version being downloaded: it is only reused while the server still reports them, and every segment request
+    sends them as If-Range so a file that changes mid-download is never mixed into the .part.
+
+    Falls back to download_stream_to_path when the server does not support Range requests,
+    does not report the file size, or a single-stream .part file is already waiting to be resumed.
+    Segments arrive out of order, so when digest_out is given the SHA-256 is computed in one pass over
+    the finished file. A TransferMonitor, if given, watches every segment connection.
+    With progress_total, the ProgressBoard's total for progress_key is replaced by the size the probe reports.
+    """
+    import requests
+    dst_path = Path(dst_path)
+    part_path = dst_path.with_name(dst_path.name + ".part")
+    state_path = dst_path.with_name(dst_path.name + ".part.segments")
+
+    def single_stream():
+        return download_stream_to_path(
+            url, dst_path, headers=headers, timeout=timeout, raw_size_fallback=raw_size_fallback,
+            progress_prefix=progress_prefix, progress=progress, progress_key=progress_key,
+            expected_size=expected_size, max_resumes=max_resumes, digest_out=digest_out, monitor=monitor,
+            progress_total=progress_total,
+        )
+
+    if part_path.exists() and not state_path.exists():
+        return single_stream()
+
+    request_headers = dict(headers)
+    request_headers["Accept-Encoding"] = "identity"
+
+    # Probe with a 1-byte range request to learn whether ranges are supported and how large the file is.
+    session = requests.Session()
+    probe = _get_with_retries(session, url, headers={**request_headers, "Range": "bytes=0-0"}, timeout=timeout, max_tries=6, monitor=monitor)
+    if probe is None:
+        raise RuntimeError("No response received from server.")
+    probe.raise_for_status()
+    _, total_bytes = _content_range(probe)
+    segment_url = probe.url
+    validators = response_validators(probe, total_bytes)
+    probe.close()
+
+    # A 206 answer to the probe is what tells us the server really honours byte ranges.
+    if probe.status_code != 206 or not total_bytes:
+        print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Server does not support segmented downloads. Using a single connection.")
+        return single_stream()
+    if progress is not None and progress_total:
+        progress.register(progress_key, total_bytes)
+
+    state = None
+    if state_path.exists() and part_path.exists():
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("total_bytes") != total_bytes or part_path.stat().st_size != total_bytes:
+            state = None
+        elif not state.get("validators"):
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Partial file has no record of the server copy it came from. Restarting download.")
+            state = None
+        elif _same_version(state["validators"], validators) is False:
+            print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}The file changed on the server since the partial download. Restarting download.")
+            state = None
+
+    if state is None:
+        segments = max(1, min(segments, total_bytes))
+        segment_size = -(-total_bytes // segments)
+        state = {
+            "total_bytes": total_bytes,
+            "validators": validators,
+            "segments": [
+                {"start": start, "end": min(start + segment_size, total_bytes) - 1, "done": 0}
+                for start in range(0, total_bytes, segment_size)
+            ],
+        }
+        # Preallocate the full file so every segment can write at its own position.
+        with open(part_path, "wb") as f:
+            f.truncate(total_bytes)
+        with open(state_path, "w") as f:
+            json.dump(state, f)
+    else:
+        done = sum(segment["done"] for segment in state["segments"])
+        print(f"{LIME_GREEN}Glucose-ML{R}: {progress_prefix}Resuming segmented download at {done/1e9:.2f} GB.")
+        if progress is not None:
+            progress.add(progress_key, done)
+
+    print(
+        f"{LIME_GREEN}Glucose-ML{R}: {progress_prefix}Downloading {total_bytes/1e9:.2f} GB "
+        f"over {len(state['segments'])} connections."
+    )
+
+    state_lock = threading.Lock()
+    file_lock = threading.Lock()
+    save_interval = 64 * 1024 * 1024
+    counters = {"downloaded": 0, "since_save": 0, "last_print": time.time()}
+
+    def save_state():
+        tmp_path = state_path.with_name(state_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    if_range = _if_range(state["validators"])
+
+    def fetch_segment(segment, fd):
+        segment_session = requests.Session()
+        attempts = 0
+        while segment["start"] + segment["done"] <= segment["end"]:
+            position = segment["start"] + segment["done"]
+            range_headers = {**request_headers, "Range": f"bytes={position}-{segment['end']}"}
+            if if_range:
+                range_headers["If-Range"] = if_range
+            resp = None
+            token = None
+            try:
+                resp = _get_with_retries(segment_session, segment_url, headers=range_headers, timeout=timeout, max_tries=6, monitor=monitor)
+                if resp is None:
+                    raise RuntimeError("No response received from server.")
+                resp.raise_for_status()
+                # A 200 answer to If-Range, or other validators from a server that ignores it, means a new file version.
+                if (resp.status_code == 200 and if_range) or (
+                    resp.status_code == 206 and _same_version(state["validators"], response_validators(resp, _content_range(resp)[1])) is False
+                ):
+                    raise RuntimeError("The file changed on the server during the download.")
+                if resp.status_code != 206 or _content_range(resp)[0] != position:
+                    raise RuntimeError(f"Server ignored the requested byte range (status={resp.status_code}).")
+
+                token = monitor.watch(resp) if monitor is not None else None
+                for chunk in _iter_body(resp, monitor, token):
+                    if not chunk:
+                        continue
+                    chunk = chunk[: segment["end"] + 1 - position]
+                    _write_at(fd, chunk, position, file_lock)
+                    position += len(chunk)
+
+                    with state_lock:
+                        segment["done"] += len(chunk)
+                        counters["downloaded"] += len(chunk)
+                        counters["since_save"] += len(chunk)
+                        if counters["since_save"] >= save_interval:
+                            counters["since_save"] = 0
+                            save_state()
+                        if progress is None and time.time() - counters["last_print"] >= 90:
+                            counters["last_print"] = time.time()
+                            done = sum(s["done"] for s in state["segments"])
+                            print(
+                                f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}{progress_prefix}Download progress:{R} "
+                                f"{done/1e9:.2f} / {total_bytes/1e9:.2f} GB ({(done / total_bytes) * 100:.1f}%)"
+                            )
+                    if progress is not None:
+                        progress.add(progress_key, len(chunk))
+                    if position > segment["end"]:
+                        break
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout) as e:
+                attempts += 1
+                if attempts > max_resumes:
+                    raise
+                if monitor is not None:
+                    monitor.retry()
+                print(f"{YELLOW}Glucose-ML{R}: {progress_prefix}Segment connection dropped ({type(e).__name__}). Resuming segment...")
+            finally:
+                if monitor is not None and token is not None:
+                    monitor.release(token)
+                if resp is not None:
+                    resp.close()
+
+    fd = os.open(part_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        with ThreadPoolExecutor(max_workers=len(state["segments"])) as pool:
+            futures = [pool.submit(fetch_segment, segment, fd) for segment in state["segments"]]
+            errors = [future.exception() for future in futures if future.exception() is not None]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+        with state_lock:
+            save_state()
+
+    if errors:
+        raise RuntimeError(
+            f"{LIGHT_RED}Glucose-ML{R}: {progress_prefix}Segmented download failed: {errors[0]}. "
+            f"The partial download is kept at {part_path} and will resume on the next run."
+        ) from errors[0]
+
+    state_path.unlink()
+    os.replace(part_path, dst_path)
+    if digest_out is not None:
+        digest_out["sha256"] = _sha256_file(dst_path).hexdigest()
+        digest_out["validators"] = validators
+    return counters["downloaded"]
+
+
+def _get_with_retries(session, url, headers, timeout, max_tries=6, monitor=None):
     """
     Handles occasional 202 Accepted responses by retrying with backoff.
     Returns a response that is not 202 (or raises for status later).
+    Waits are counted in the TransferMonitor, if one is given.
     """
     last_resp = None
     for attempt in range(max_tries):
@@ -120,6 +1401,8 @@ def _get_with_retries(session, url, headers, timeout, max_tries=6):
         if resp.status_code == 202:
             wait_s = 5 * (attempt + 1)
             print(f"{YELLOW}Glucose-ML{R}: Server returned 202 (preparing download). Retrying in {wait_s}s...")
+            if monitor is not None:
+                monitor.waited_202(wait_s)
             time.sleep(wait_s)
             continue
 
@@ -128,7 +1411,384 @@ def _get_with_retries(session, url, headers, timeout, max_tries=6):
     return last_resp
 
 
-def download_datasets(download_request):
+class HttpRangeReader(io.RawIOBase):
+    '''
+    Read-only, seekable file object for a file on an HTTP(S) server. Bytes are fetched on demand with
+    Range requests (in blocks of block_size, or a whole span at once with prefetch()), so zipfile can read
+    an archive's table of contents and single members without downloading the archive.
+    Raises ValueError if the server does not support Range requests, and IOError if the file changes on
+    the server (different ETag) while it is being read.
+    '''
+
+    def __init__(self, url, headers, timeout, block_size=1024 * 1024, max_tries=3):
+        import requests
+        super().__init__()
+        self.session = requests.Session()
+        self.headers = {**headers, "Accept-Encoding": "identity"}
+        self.timeout = timeout
+        self.block_size = block_size
+        self.max_tries = max_tries
+        self.bytes_fetched = 0
+        self.requests = 0
+
+        probe = _get_with_retries(self.session, url, headers={**self.headers, "Range": "bytes=0-0"}, timeout=timeout, max_tries=6)
+        if probe is None:
+            raise RuntimeError("No response received from server.")
+        probe.raise_for_status()
+        _, total_bytes = _content_range(probe)
+        probe.close()
+        if probe.status_code != 206 or not total_bytes:
+            raise ValueError(f"{url} does not support byte range requests.")
+
+        self.url = probe.url
+        self.validators = response_validators(probe, total_bytes)
+        self.size = total_bytes
+        self.position = 0
+        self.buffer_start = 0
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        self.position = max(0, self.position)
+        return self.position
+
+    def _fetch(self, start, end):
+        import requests
+        for attempt in range(self.max_tries):
+            resp = _get_with_retries(self.session, self.url, headers={**self.headers, "Range": f"bytes={start}-{end}"}, timeout=self.timeout, max_tries=6)
+            if resp is None:
+                raise RuntimeError("No response received from server.")
+            resp.raise_for_status()
+            if resp.status_code != 206 or _content_range(resp)[0] != start:
+                resp.close()
+                raise IOError(f"Server ignored the requested byte range (status={resp.status_code}).")
+            etag = resp.headers.get("ETag")
+            if etag and self.validators["etag"] and etag != self.validators["etag"]:
+                resp.close()
+                raise IOError(f"{self.url} changed on the server while it was being read.")
+            try:
+                data = resp.content
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == self.max_tries - 1:
+                    raise
+                print(f"{YELLOW}Glucose-ML{R}: Range request dropped ({type(e).__name__}). Retrying...")
+                continue
+            finally:
+                resp.close()
+            self.requests += 1
+            self.bytes_fetched += len(data)
+            return data
+
+    def prefetch(self, start, end):
+        '''
+        Fetches bytes start..end (inclusive) in one request, so reads inside that span need no further requests.
+        '''
+        self.buffer = self._fetch(start, min(end, self.size - 1))
+        self.buffer_start = start
+
+    def close(self):
+        self.session.close()
+        super().close()
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self.position)
+        if n <= 0:
+            return 0
+        buffer_end = self.buffer_start + len(self.buffer)
+        if not (self.buffer_start <= self.position and self.position + n <= buffer_end):
+            end = min(self.size, self.position + max(n, self.block_size)) - 1
+            self.buffer = self._fetch(self.position, end)
+            self.buffer_start = self.position
+        offset = self.position - self.buffer_start
+        data = self.buffer[offset:offset + n]
+        b[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def extract_remote_members(url, extract_dir, patterns, headers, timeout, max_prefetch=64 * 1024 * 1024):
+    '''
+    Extracts only the members of a remote zip archive that match patterns, without downloading the archive.
+    The end-of-central-directory record and the central directory are read with Range requests, then the
+    byte span of each matching member (local header, data and data descriptor, up to the next member) is
+    fetched, with neighbouring members fetched together in one request up to max_prefetch bytes.
+    zipfile checks each member's CRC-32 as it is written.
+    Raises ValueError if the server does not support Range requests or no member matches, so the caller
+    can fall back to a full download.
+    Returns a dict with the members and bytes extracted, the bytes fetched, the archive size and its validators.
+    '''
+    with HttpRangeReader(url, headers, timeout, block_size=8 * 1024 * 1024) as reader, zipfile.ZipFile(reader) as zf:
+        compiled = [glob_to_regex(pattern, recursive=True) for pattern in patterns]
+        selected = [info for info in zf.infolist() if not info.is_dir() and any(regex.fullmatch(info.filename) for regex in compiled)]
+        if not selected:
+            raise ValueError(f"No members of the remote archive matched {patterns}.")
+
+        # Each member's span ends where the next member (or the central directory) starts.
+        boundaries = sorted({info.header_offset for info in zf.infolist()} | {zf.start_dir})
+        span_end = {start: end for start, end in zip(boundaries, boundaries[1:])}
+        selected.sort(key=lambda info: info.header_offset)
+
+        i = 0
+        while i < len(selected):
+            # Group members that follow each other in the archive into one request.
+            start = selected[i].header_offset
+            end = span_end[start]
+            j = i + 1
+            while j < len(selected) and selected[j].header_offset == end and span_end[end] - start <= max_prefetch:
+                end = span_end[end]
+                j += 1
+            if end - start <= max_prefetch:
+                reader.prefetch(start, end - 1)
+            for info in selected[i:j]:
+                zf.extract(info, extract_dir)
+            i = j
+
+        return {
+            "members": len(selected),
+            "extracted_bytes": sum(info.file_size for info in selected),
+            "fetched_bytes": reader.bytes_fetched,
+            "requests": reader.requests,
+            "archive_bytes": reader.size,
+            "validators": reader.validators,
+        }
+
+
+class ProgressBoard:
+    '''
+    Collects byte counts from downloads running at the same time and prints one combined
+    progress line for all of them every 90 seconds.
+    '''
+
+    def __init__(self, update_interval=90):
+        self.update_interval = update_interval
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def register(self, key, total_bytes):
+        with self.lock:
+            self.entries.setdefault(key, [0, 0])[1] = total_bytes or 0
+
+    def add(self, key, nbytes):
+        with self.lock:
+            self.entries.setdefault(key, [0, 0])[0] += nbytes
+
+    def report(self):
+        with self.lock:
+            entries = {key: list(value) for key, value in self.entries.items()}
+        if not entries:
+            return
+
+        parts = []
+        for key, (done, total) in entries.items():
+            percent = (done / total) * 100 if total else 0
+            parts.append(f"{key} {done/1e9:.2f}/{total/1e9:.2f} GB ({percent:.1f}%)")
+        done_total = sum(done for done, _ in entries.values())
+        size_total = sum(total for _, total in entries.values())
+        percent_total = (done_total / size_total) * 100 if size_total else 0
+        print(
+            f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}Download progress:{R} " + " | ".join(parts) +
+            f" | {BOLD}Total{R} {done_total/1e9:.2f}/{size_total/1e9:.2f} GB ({percent_total:.1f}%)"
+        )
+
+    def _run(self):
+        while not self.stop_event.wait(self.update_interval):
+            self.report()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def download_subject_zips(raw_zip_files, output_path, output_string, headers, timeout, progress=None, download_workers=1, unpack_workers=1, members=None, cache_dir=None, dataset_key=None, subject_ready=None, monitor=None, extract_workers=1):
+    '''
+    Downloads per-subject zip files (PhysioCGM) and unpacks each one into its own subject folder.
+    Downloading and unpacking run as a pipeline: a pool of download workers hands finished zips
+    to a pool of unpack workers, so the next downloads continue while earlier zips are unpacked.
+    Zips already on disk with the expected size are not downloaded again; they are only unpacked
+    if their subject folder is missing or empty. With members, only matching files are unpacked.
+    With cache_dir, zips are taken from the download cache when possible and new downloads are added to it.
+    If subject_ready is given, it is called with each subject's zip path as soon as that subject is
+    unpacked (e.g. to standardize the subject while the remaining zips are still downloading).
+    A TransferMonitor, if given, watches all subject downloads.
+    Returns (bytes downloaded, seconds from the start until the last download finished).
+    '''
+    subject_count = len(raw_zip_files)
+    status = {"downloaded": 0, "unpacked": 0, "standardized": 0, "bytes": 0, "last_download": None}
+    status_lock = threading.Lock()
+    failures = {}
+
+    def report(i, name, message):
+        with status_lock:
+            print(
+                f"{LIME_GREEN}Glucose-ML{R}: [{i}/{subject_count}] {LIGHT_RED}{name}{R}: {message} "
+                f"(overall: {status['downloaded']}/{subject_count} downloaded, "
+                f"{status['unpacked']}/{subject_count} unpacked, "
+                + (f"{status['standardized']}/{subject_count} standardized, " if subject_ready else "")
+                + f"{status['bytes']/1e9:.2f} GB transferred)"
+            )
+
+    def download_subject(i, fmeta):
+        name = fmeta.get("name") or f"raw_{i}.zip"
+        url = fmeta.get("download_url")
+        size = fmeta.get("size", 0) or 0
+        dst_file = output_path / name
+        subject_dir = output_path / Path(name).stem
+
+        reused = None
+        if cache_dir and restore_from_cache(cache_dir, dataset_key, dst_file):
+            reused = "using cached zip"
+        elif dst_file.exists() and size > 0 and dst_file.stat().st_size == size:
+            reused = "skipping existing zip (size matches)"
+            if cache_dir:
+                cache_store(cache_dir, dataset_key, dst_file, verified_sha256(dst_file, cache_dir))
+
+        if reused:
+            with status_lock:
+                status["downloaded"] += 1
+            if progress is not None:
+                progress.add(output_string, size)
+            if subject_dir.is_dir() and any(subject_dir.iterdir()):
+                with status_lock:
+                    status["unpacked"] += 1
+                report(i, name, f"{reused}, already unpacked")
+                return dst_file, False
+            report(i, name, reused)
+            return dst_file, True
+
+        digest = {}
+        downloaded = download_stream_to_path(
+            url,
+            dst_file,
+            headers=headers,
+            timeout=timeout,
+            raw_size_fallback=size,
+            expected_size=size or None,
+            progress_prefix=f"[{name}] ",
+            progress=progress,
+            progress_key=output_string,
+            digest_out=digest,
+            monitor=monitor,
+        )
+        if cache_dir:
+            cache_store(cache_dir, dataset_key, dst_file, digest["sha256"])
+        with status_lock:
+            status["downloaded"] += 1
+            status["bytes"] += downloaded
+            status["last_download"] = time.time()
+        report(i, name, "downloaded")
+        return dst_file, True
+
+    def unpack_subject(i, dst_file, needs_unpack):
+        name = dst_file.name
+        subject_dir = output_path / dst_file.stem
+
+        if needs_unpack:
+            subject_dir.mkdir(exist_ok=True)
+            if not zipfile.is_zipfile(dst_file):
+                raise ValueError(f"{LIGHT_RED}Glucose-ML{R}: {name} was downloaded but is not a valid ZIP archive.")
+            extract_archive(dst_file, subject_dir, patterns=members, name_prefix=f"{subject_dir.name}/", workers=extract_workers)
+            with status_lock:
+                status["unpacked"] += 1
+            report(i, name, f"unpacked into {subject_dir.name}/")
+
+        if subject_ready is not None:
+            subject_ready(dst_file)
+            with status_lock:
+                status["standardized"] += 1
+            report(i, name, "standardized")
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=download_workers) as download_pool, ThreadPoolExecutor(max_workers=unpack_workers) as unpack_pool:
+        download_futures = {}
+        for i, fmeta in enumerate(raw_zip_files, start=1):
+            name = fmeta.get("name") or f"raw_{i}.zip"
+            if not fmeta.get("download_url"):
+                print(f"{YELLOW}Glucose-ML{R}: Skipping {name} (no download_url)")
+                continue
+            print(f"{LIME_GREEN}Glucose-ML{R}: [{i}/{subject_count}] Queued {LIGHT_RED}{name}{R} for download.")
+            download_futures[download_pool.submit(download_subject, i, fmeta)] = (i, name)
+
+        # Hand each finished download straight to the unpack workers.
+        unpack_futures = {}
+        for future in as_completed(download_futures):
+            i, name = download_futures[future]
+            try:
+                dst_file, needs_unpack = future.result()
+            except Exception as e:
+                failures[name] = e
+                print(f"{LIGHT_RED}Glucose-ML{R}: [{i}/{subject_count}] Failed to download {name}: {e}")
+                continue
+            if needs_unpack or subject_ready is not None:
+                unpack_futures[unpack_pool.submit(unpack_subject, i, dst_file, needs_unpack)] = (i, name)
+
+        for future in as_completed(unpack_futures):
+            i, name = unpack_futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failures[name] = e
+                print(f"{LIGHT_RED}Glucose-ML{R}: [{i}/{subject_count}] Failed to unpack or standardize {name}: {e}")
+
+    print(
+        f"{LIME_GREEN}Glucose-ML{R}: Finished downloading {LIGHT_RED}{output_string}{R} raw zips. "
+        f"Total downloaded: {status['bytes']/1e9:.2f} GB."
+    )
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {subject_count} subject files failed: {', '.join(sorted(failures))}")
+    return status["bytes"], (status["last_download"] or start_time) - start_time
+
+
+_harmonizer = None
+_harmonizer_lock = threading.Lock()
+
+
+def load_harmonizer():
+    '''
+    Imports auto-harmonize-CGM-datasets.py from this folder (loaded by path because of the dashes in its name).
+    '''
+    global _harmonizer
+    with _harmonizer_lock:
+        if _harmonizer is None:
+            script_path = Path(__file__).resolve().parent / "auto-harmonize-CGM-datasets.py"
+            spec = importlib.util.spec_from_file_location("auto_harmonize_CGM_datasets", script_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _harmonizer = module
+        return _harmonizer
+
+
+def harmonize_download(download_request, metadata_only=False):
+    '''
+    Harmonizes the Glucose-ML dataset(s) contained in a finished download.
+    '''
+    harmonizer = load_harmonizer()
+    raw_root = Path("Original-Glucose-ML-datasets").resolve()
+    for harmonize_key in dataset_options(download_request).get("harmonize", [download_request]):
+        harmonizer.standardize_datasets(harmonize_key, raw_root=raw_root, metadata_only=metadata_only)
+
+
+def download_datasets(download_request, progress=None, segments=None, extract="selective", cache_dir=None, mirror=None, harmonize=False, extract_workers=1, stream_extract=False, remote_extract=False):
     download_url, output_file, output_string, file_size_bytes, raw_size_bytes = dataset_library(download_request)
 
     # Create raw_data directory for the dataset to live in.
@@ -140,6 +1800,25 @@ def download_datasets(download_request):
     headers = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
     timeout = (10, 60) 
 
+    options = dataset_options(download_request)
+    members = options.get("members") if extract == "selective" else None
+
+    if mirror: # Fill the raw_data directory from a mirror instead of the original host.
+        print(f"{LIME_GREEN}Glucose-ML{R}: Copying the {LIGHT_RED}{output_string}{R} dataset from mirror {mirror}...")
+        for file_path in fill_from_mirror(download_request, output_path, mirror, headers, timeout, cache_dir=cache_dir, progress=progress, progress_key=output_string):
+            if not file_path.name.lower().endswith(".zip"):
+                continue
+            if download_request == "physiocgm": # Per-subject zips unpack into their own subject folders.
+                subject_dir = output_path / file_path.stem
+                subject_dir.mkdir(exist_ok=True)
+                extract_archive(file_path, subject_dir, patterns=members, name_prefix=f"{subject_dir.name}/", workers=extract_workers)
+            else:
+                extract_archive(file_path, output_path, patterns=members, workers=extract_workers)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Success! Successfully copied and unpacked {LIGHT_RED}{output_string}{R}.\n")
+        if harmonize:
+            harmonize_download(download_request)
+        return
+
     if download_request == "physiocgm": # Special download case for the physiocgm dataset.
 
         article_id = 28136294
@@ -161,136 +1840,568 @@ def download_datasets(download_request):
             f"{LIME_GREEN}Glucose-ML{R}: Found {len(raw_zip_files)} '*_raw.zip' files "
             f"({LIGHT_RED}{total_expected/1e9:.2f} GB{R} expected). Downloading..."
         )
+        if progress is not None:
+            progress.register(output_string, total_expected)
 
-        total_downloaded = 0
-        for i, fmeta in enumerate(raw_zip_files, start=1):
-            name = fmeta.get("name") or f"raw_{i}.zip"
-            url = fmeta.get("download_url")
-            size = fmeta.get("size", 0) or 0
-
-            if not url:
-                print(f"{YELLOW}Glucose-ML{R}: Skipping {name} (no download_url)")
-                continue
-
-            dst_file = output_path / name
-
-            if dst_file.exists() and size > 0 and dst_file.stat().st_size == size:
-                print(f"{YELLOW}Glucose-ML{R}: [{i}/{len(raw_zip_files)}] Skipping existing {name} (size matches).")
-                continue
-
-            print(f"{LIME_GREEN}Glucose-ML{R}: [{i}/{len(raw_zip_files)}] Downloading {LIGHT_RED}{name}{R} ...")
-            downloaded = download_stream_to_path(
-                url,
-                dst_file,
+        monitor = TransferMonitor(output_string)
+        monitor.start()
+        transfer_status = "failed"
+        try:
+            downloaded, seconds = download_subject_zips(
+                raw_zip_files,
+                output_path,
+                output_string,
                 headers=headers,
                 timeout=timeout,
-                raw_size_fallback=size,
-                progress_prefix=f"[{name}] ",
+                progress=progress,
+                download_workers=options.get("download_workers", 1),
+                unpack_workers=options.get("unpack_workers", 1),
+                members=members,
+                cache_dir=cache_dir,
+                dataset_key=download_request,
+                # Standardize each subject as soon as its zip is on disk; the metadata needs every subject, so it runs last.
+                subject_ready=(lambda dst_file: load_harmonizer().standardize_subject(download_request, dst_file)) if harmonize else None,
+                monitor=monitor,
+                extract_workers=extract_workers,
             )
-            total_downloaded += downloaded
-
-            subject_name = Path(name).stem
-            subject_dir = output_path / subject_name  
-            subject_dir.mkdir(exist_ok=True)
+            transfer_status = "finished"
+        finally:
+            monitor.stop()
+            monitor.write_log(dataset=download_request, host=urlparse(raw_zip_files[0]["download_url"]).netloc, mode="per-subject", status=transfer_status)
+        for f in raw_zip_files:
+            save_validators(download_request, f["name"], {"etag": f.get("md5"), "last_modified": None, "content_length": f.get("size") or None})
+        record_throughput(urlparse(raw_zip_files[0]["download_url"]).netloc, downloaded, seconds)
+        if harmonize:
+            harmonize_download(download_request, metadata_only=True)
+        return
 
-            if zipfile.is_zipfile(dst_file):
-                print(
-                    f"{LIME_GREEN}Glucose-ML{R}: Unzipping {LIGHT_RED}{name}{R} "
-                    f"into {subject_dir.name}/"
+    streaming = None
+    restored = bool(cache_dir) and restore_from_cache(cache_dir, download_request, output_zip)
+    if restored:
+        print(f"{LIME_GREEN}Glucose-ML{R}: {LIGHT_RED}{output_file}{R} matches the download cache. Skipping download.")
+    elif remote_extract and members and output_file.lower().endswith(".zip") and not output_zip.exists():
+        # Fetch only the selected members out of the remote archive; the archive itself is not kept.
+        print(f"{LIME_GREEN}Glucose-ML{R}: Reading the table of contents of the remote {LIGHT_RED}{output_file}{R}...")
+        start_time = time.time()
+        try:
+            fetched = extract_remote_members(download_url, output_path, members, headers, timeout)
+        except ValueError as e:
+            print(f"{YELLOW}Glucose-ML{R}: Cannot fetch single members: {e} Downloading the whole archive instead.")
+        else:
+            record_throughput(urlparse(download_url).netloc, fetched["fetched_bytes"], time.time() - start_time)
+            save_validators(download_request, output_file, fetched["validators"])
+            print(
+                f"{LIME_GREEN}Glucose-ML{R}: Success! Unpacked {fetched['members']} selected files ({_format_bytes(fetched['extracted_bytes'])}) of "
+                f"{LIGHT_RED}{output_file}{R}, fetching {_format_bytes(fetched['fetched_bytes'])} of {_format_bytes(fetched['archive_bytes'])} "
+                f"in {fetched['requests']} requests.\n"
+            )
+            if harmonize:
+                harmonize_download(download_request)
+            return
+
+    if not restored:
+        if stream_extract and output_file.lower().endswith(".zip"):
+            if segments and segments > 1:
+                # Segments arrive out of order, so the archive cannot be read front to back while downloading.
+                print(f"{YELLOW}Glucose-ML{R}: Segmented downloads cannot be unzipped while downloading. Unzipping after the download.")
+            else:
+                streaming = StreamingZipExtractor(output_path, patterns=members)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Downloading the {LIGHT_RED}{output_string}{R} dataset... May take a while.")
+        if progress is None:
+            print(f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}Download progress will be reported below every {BOLD}90 seconds.")
+        else:
+            # The download size; corrected from the server's Content-Length once the download starts.
+            progress.register(output_string, raw_size_bytes)
+
+        digest = {}
+        start_time = time.time()
+        monitor = TransferMonitor(output_string)
+        monitor.start()
+        transfer_status = "failed"
+        try:
+            if segments and segments > 1:
+                downloaded = download_segmented(
+                    download_url,
+                    output_zip,
+                    headers=headers,
+                    timeout=timeout,
+                    segments=segments,
+                    raw_size_fallback=raw_size_bytes,
+                    progress_prefix=f"[{output_string}] ",
+                    progress=progress,
+                    progress_key=output_string,
+                    progress_total=True,
+                    digest_out=digest,
+                    monitor=monitor,
                 )
-                shutil.unpack_archive(str(dst_file), str(subject_dir))
-                print(f"{LIME_GREEN}Glucose-ML{R}: Successfully unpacked {LIGHT_RED}{name}{R}")
-
-                #dst_file.unlink()
             else:
-                raise ValueError(f"{LIGHT_RED}Glucose-ML{R}: {name} was downloaded but is not a valid ZIP archive.")
+                downloaded = download_stream_to_path(
+                    download_url,
+                    output_zip,
+                    headers=headers,
+                    timeout=timeout,
+                    raw_size_fallback=raw_size_bytes,
+                    progress=progress,
+                    progress_key=output_string,
+                    progress_total=True,
+                    digest_out=digest,
+                    monitor=monitor,
+                    sink=streaming,
+                )
+            transfer_status = "finished"
+        finally:
+            monitor.stop()
+            monitor.write_log(dataset=download_request, host=urlparse(download_url).netloc, mode="segmented" if segments and segments > 1 else "stream", status=transfer_status)
+
+        record_throughput(urlparse(download_url).netloc, downloaded, time.time() - start_time)
+        save_validators(download_request, output_file, digest["validators"])
+        print(f"{LIME_GREEN}Glucose-ML{R}: Successfully downloaded {LIGHT_RED}{output_file}{R}.")
+        if cache_dir:
+            cache_store(cache_dir, download_request, output_zip, digest["sha256"])
+        time.sleep(1)
+
+    if output_file.lower().endswith(".zip"):
+        # Validate it's truly a zip before unpacking
+        if not zipfile.is_zipfile(output_zip):
+            raise ValueError(f"Downloaded file is not a valid ZIP archive: {output_zip}")
+        print(f"{LIME_GREEN}Glucose-ML{R}: Unzipping {LIGHT_RED}{output_file}{R}...")
+        if streaming is not None:
+            streaming.finish(output_zip)
+        else:
+            extract_archive(output_zip, output_path, patterns=members, workers=extract_workers)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Success! Successfully unpacked {LIGHT_RED}{output_file}{R}.\n")
+    else:
+        print(f"{LIME_GREEN}Glucose-ML{R}: No need to unzip.\n")
 
+    if harmonize:
+        harmonize_download(download_request)
 
-        print(
-            f"{LIME_GREEN}Glucose-ML{R}: Finished downloading {LIGHT_RED}{output_string}{R} raw zips. "
-            f"Total downloaded: {total_downloaded/1e9:.2f} GB."
-        )
+
+def download_with_host_slot(download_request, host_slots, progress, download_kwargs):
+    '''
+    Waits for a free connection slot on the dataset's host, then downloads the dataset.
+    '''
+    download_url = dataset_library(download_request)[0]
+    with host_slots[urlparse(download_url).netloc]:
+        download_datasets(download_request, progress=progress, **download_kwargs)
+
+
+def download_concurrently(download_requests, jobs, per_host, download_kwargs=None):
+    '''
+    Downloads several datasets at the same time using up to `jobs` worker threads.
+    - At most `per_host` downloads run against the same host at once.
+    - Progress for every running download is combined into one line.
+    - A failure in one dataset does not stop the others.
+    download_kwargs optionally maps a dataset to extra keyword arguments for download_datasets.
+    Returns a dict mapping each dataset to its error (None if it downloaded successfully).
+    '''
+    host_slots = {}
+    for download_request in download_requests:
+        host = urlparse(dataset_library(download_request)[0]).netloc
+        host_slots.setdefault(host, threading.BoundedSemaphore(per_host))
+
+    print(
+        f"{LIME_GREEN}Glucose-ML{R}: Downloading {LIGHT_RED}{len(download_requests)}{R} datasets with "
+        f"{BOLD}{jobs}{R} jobs (max {per_host} per host)."
+    )
+    print(f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}Combined download progress will be reported below every {BOLD}90 seconds.")
+
+    progress = ProgressBoard()
+    progress.start()
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    download_with_host_slot, download_request, host_slots, progress, (download_kwargs or {}).get(download_request, {})
+                ): download_request
+                for download_request in download_requests
+            }
+            for future in as_completed(futures):
+                download_request = futures[future]
+                try:
+                    future.result()
+                    results[download_request] = None
+                except Exception as e:
+                    results[download_request] = e
+                    print(f"{LIGHT_RED}Glucose-ML{R}: Failed to download the following dataset {LIGHT_RED}{download_request}{R}: {e}")
+    finally:
+        progress.stop()
+
+    # Final status in the order the datasets were requested.
+    print(f"{LIME_GREEN}Glucose-ML{R}: Download summary:")
+    for download_request in download_requests:
+        error = results.get(download_request)
+        if error is None:
+            print(f"  {LIME_GREEN}OK{R}      {download_request}")
+        else:
+            print(f"  {LIGHT_RED}FAILED{R}  {download_request}: {error}")
+
+    return results
+
+
+THROUGHPUT_HISTORY = Path("Original-Glucose-ML-datasets/.throughput-history.json")
+THROUGHPUT_LOCK = threading.Lock()
+PLAN_HEADROOM_BYTES = 512 * 1024 * 1024  # Space left free on the target filesystem by a plan.
+
+
+def record_throughput(host, bytes_transferred, seconds, history_path=THROUGHPUT_HISTORY, keep=20):
+    '''
+    Adds a measured download rate for a host to the throughput history used by --plan.
+    Only the last `keep` samples per host are kept. Transfers under 1 MB say little about a host's rate and are ignored.
+    '''
+    if bytes_transferred < 1e6 or seconds <= 0:
         return
+    with THROUGHPUT_LOCK:
+        history = _load_json(history_path)
+        samples = history.setdefault(host, [])
+        samples.append({"bytes": bytes_transferred, "seconds": round(seconds, 3), "time": int(time.time())})
+        del samples[:-keep]
+        _save_json(history_path, history)
 
-    session = requests.Session()
-    response = _get_with_retries(session, download_url, headers=headers, timeout=timeout, max_tries=6)
 
-    if response is None:
-        raise RuntimeError("No response received from server.")
-    response.raise_for_status()
+def estimated_throughput(host, history_path=THROUGHPUT_HISTORY):
+    '''
+    Returns the average measured download rate for a host in bytes per second (total bytes over total time
+    of the recorded samples), or None if nothing has been downloaded from the host yet.
+    '''
+    with THROUGHPUT_LOCK:
+        samples = _load_json(history_path).get(host, [])
+    seconds = sum(sample["seconds"] for sample in samples)
+    if not samples or seconds <= 0:
+        return None
+    return sum(sample["bytes"] for sample in samples) / seconds
 
-    bytes_downloaded = 0
-    last_print_time = time.time()
-    update_interval = 90  # seconds
 
-    print(f"{LIME_GREEN}Glucose-ML{R}: Downloading the {LIGHT_RED}{output_string}{R} dataset... May take a while.")
-    print(f"{LIME_GREEN}Glucose-ML{R}: {YELLOW}Download progress will be reported below every {BOLD}90 seconds.")
+def archive_extracted_sizes(archive, extract_dir, patterns=None, name_prefix=""):
+    '''
+    Reads an archive's central directory (from a path or a seekable file object such as HttpRangeReader)
+    and returns the uncompressed bytes that full and selective extraction would write into extract_dir,
+    following the same member selection as extract_archive. Members already on disk with the same size
+    are not counted.
+    '''
+    with zipfile.ZipFile(archive) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
 
-    with open(output_zip, "wb") as f:
-        for chunk in response.iter_content(chunk_size=1024 * 1024):
-            if not chunk:
-                continue
-            f.write(chunk)
-            bytes_downloaded += len(chunk)
+    def pending_bytes(infos):
+        total = 0
+        for info in infos:
+            target = Path(extract_dir) / info.filename
+            if not (target.is_file() and target.stat().st_size == info.file_size):
+                total += info.file_size
+        return total
 
-            now = time.time()
-            if now - last_print_time >= update_interval:
-                # Prefer Content-Length if aval. otherwise fall back to raw_size_bytes
-                total_bytes = response.headers.get("Content-Length")
-                if total_bytes is not None:
-                    try:
-                        total_bytes = int(total_bytes)
-                    except ValueError:
-                        total_bytes = None
-
-                if total_bytes and total_bytes > 0:
-                    percent = (bytes_downloaded / total_bytes) * 100
-                    downloaded_gb = bytes_downloaded / 1e9
-                    total_gb = total_bytes / 1e9
-                else:
-                    percent = (bytes_downloaded / raw_size_bytes) * 100 if raw_size_bytes else 0
-                    downloaded_gb = bytes_downloaded / 1e9
-                    total_gb = (raw_size_bytes / 1e9) if raw_size_bytes else 0
-
-                print(
-                    f"{YELLOW}Download progress:{R} "
-                    f"{downloaded_gb:.2f} / {total_gb:.2f} GB "
-                    f"({percent:.1f}%)"
-                )
-                last_print_time = now
+    selected = members
+    if patterns:
+        compiled = [glob_to_regex(pattern, recursive=True) for pattern in patterns]
+        selected = [info for info in members if any(regex.fullmatch(name_prefix + info.filename) for regex in compiled)] or members
+    return pending_bytes(members), pending_bytes(selected)
 
-    if bytes_downloaded == 0:
-        raise ValueError(
-            f"{LIGHT_RED}Glucose-ML{R}: Downloaded 0 bytes (empty file). "
-            f"status={response.status_code}, content-type={response.headers.get('Content-Type')}, final_url={response.url}"
+
+def _cached_object(cache_dir, download_request, file_name):
+    '''
+    Returns the path of a file's object in the download cache, or None if it is not cached.
+    '''
+    if not cache_dir:
+        return None
+    with CACHE_LOCK:
+        entry = _load_json(Path(cache_dir) / "manifest.json").get("datasets", {}).get(download_request, {}).get(file_name)
+    if entry and (Path(cache_dir) / "objects" / entry["sha256"]).exists():
+        return Path(cache_dir) / "objects" / entry["sha256"]
+    return None
+
+
+def plan_archive(download_request, file_name, url, download_size, extract_dir, headers, timeout, cache_dir=None, name_prefix=""):
+    '''
+    Plans one downloaded file: bytes still to download, and bytes written by full and selective extraction.
+    Extraction sizes are read from the archive's central directory: from the file on disk or in the cache
+    if there is one, otherwise from the server with Range requests (only the end of the archive is fetched).
+    Returns a dict; "full"/"selective" are None when the sizes could not be read.
+    '''
+    output_path = extract_dir if not name_prefix else Path(extract_dir).parent
+    dst_path = Path(output_path) / file_name
+    part_path = dst_path.with_name(dst_path.name + ".part")
+    cached = _cached_object(cache_dir, download_request, file_name)
+    patterns = dataset_options(download_request).get("members")
+
+    if cached is not None:
+        download_bytes = 0
+    elif name_prefix and dst_path.exists() and dst_path.stat().st_size == download_size:
+        download_bytes = 0 # Subject zips already on disk are not downloaded again.
+    elif part_path.exists() and not dst_path.with_name(dst_path.name + ".part.segments").exists():
+        download_bytes = max(0, download_size - part_path.stat().st_size)
+    else:
+        download_bytes = download_size
+
+    plan = {"download": download_bytes, "full": None, "selective": None, "sizes_from": "catalog"}
+    if not file_name.lower().endswith(".zip"):
+        plan.update(full=0, selective=0, sizes_from="not an archive")
+        return plan
+
+    for local_archive in (cached, dst_path):
+        if local_archive is not None and local_archive.exists() and zipfile.is_zipfile(local_archive):
+            plan["full"], plan["selective"] = archive_extracted_sizes(local_archive, extract_dir, patterns, name_prefix)
+            plan["sizes_from"] = "local archive"
+            return plan
+    try:
+        with HttpRangeReader(url, headers, timeout) as remote_archive:
+            plan["full"], plan["selective"] = archive_extracted_sizes(remote_archive, extract_dir, patterns, name_prefix)
+            if download_bytes == download_size: # The server's size is exact; the catalog size is approximate.
+                plan["download"] = remote_archive.size
+        plan["sizes_from"] = "remote archive"
+    except Exception:
+        pass # No Range support (e.g. archives generated on the fly); fall back to the catalog sizes.
+    return plan
+
+
+def plan_dataset(download_request, cache_dir=None, mirror=None):
+    '''
+    Plans the download of one dataset: host, bytes to download, and bytes written by full and selective
+    extraction. Sizes that cannot be read from an archive fall back to the sizes in dataset_library
+    (full extraction) or stay unknown (selective extraction).
+    '''
+    import requests
+    download_url, output_file, output_string, file_size_bytes, raw_size_bytes = dataset_library(download_request)
+    output_path = Path(f"Original-Glucose-ML-datasets/{output_string}_raw_data")
+    headers = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
+    timeout = (10, 60)
+
+    raw_zip_files = []
+    if download_request == "physiocgm":
+        try:
+            files = figshare_list_article_files(28136294, headers=headers, timeout=timeout)
+            raw_zip_files = [f for f in files if (f.get("name") or "").lower().endswith("_raw.zip") and f.get("download_url")]
+        except requests.RequestException as e:
+            print(f"{YELLOW}Glucose-ML{R}: Could not list the {output_string} files ({e}). Using catalog sizes.")
+
+    if raw_zip_files:
+        host = urlparse(raw_zip_files[0]["download_url"]).netloc
+        with ThreadPoolExecutor(max_workers=dataset_options(download_request).get("download_workers", 1)) as pool:
+            file_plans = list(pool.map(
+                lambda f: plan_archive(
+                    download_request, f["name"], f["download_url"], f.get("size", 0) or 0, output_path / Path(f["name"]).stem,
+                    headers, timeout, cache_dir=cache_dir, name_prefix=f"{Path(f['name']).stem}/",
+                ),
+                raw_zip_files,
+            ))
+    else:
+        host = urlparse(download_url).netloc
+        file_plans = [plan_archive(download_request, output_file, download_url, raw_size_bytes, output_path, headers, timeout, cache_dir=cache_dir)]
+
+    plan = {
+        "dataset": download_request,
+        "host": host,
+        "download": sum(file_plan["download"] for file_plan in file_plans),
+        "sizes_from": sorted(set(file_plan["sizes_from"] for file_plan in file_plans)),
+    }
+    if all(file_plan["full"] is not None for file_plan in file_plans):
+        plan["full"] = sum(file_plan["full"] for file_plan in file_plans)
+        plan["selective"] = sum(file_plan["selective"] for file_plan in file_plans)
+    else:
+        plan["full"] = file_size_bytes
+        plan["selective"] = file_size_bytes if not dataset_options(download_request).get("members") else None
+
+    if mirror:
+        plan["host"] = urlparse(mirror).netloc if _is_url(mirror) else "local mirror"
+    return plan
+
+
+def plan_downloads(download_requests, extract="selective", cache_dir=None, mirror=None, jobs=1):
+    '''
+    Builds a download plan without downloading anything:
+      - bytes to download and bytes written by extraction for every dataset,
+      - free space on the filesystem holding Original-Glucose-ML-datasets,
+      - estimated download time from the throughput measured on earlier downloads from each host.
+    With extract="auto", datasets are extracted in full if everything fits; otherwise datasets switch to
+    selective extraction, largest saving first, until the plan fits.
+    Returns a dict with the per-dataset plans, the totals and whether the plan fits on disk.
+    '''
+    print(f"{LIME_GREEN}Glucose-ML{R}: Planning {LIGHT_RED}{len(download_requests)}{R} dataset download(s)...")
+    datasets = [plan_dataset(download_request, cache_dir=cache_dir, mirror=mirror) for download_request in download_requests]
+    free_bytes = shutil.disk_usage("Original-Glucose-ML-datasets").free
+    available = max(0, free_bytes - PLAN_HEADROOM_BYTES)
+
+    def extracted_bytes(dataset_plan):
+        if dataset_plan["extract"] == "selective" and dataset_plan["selective"] is not None:
+            return dataset_plan["selective"]
+        return dataset_plan["full"] # Unknown selective sizes are at most the full size.
+
+    def needed_bytes():
+        return sum(dataset_plan["download"] + extracted_bytes(dataset_plan) for dataset_plan in datasets)
+
+    for dataset_plan in datasets:
+        dataset_plan["extract"] = "full" if extract == "auto" else extract
+    if extract == "auto":
+        savings = sorted(datasets, key=lambda d: d["full"] - (d["selective"] if d["selective"] is not None else d["full"]), reverse=True)
+        for dataset_plan in savings:
+            if needed_bytes() <= available:
+                break
+            dataset_plan["extract"] = "selective"
+
+    # Datasets from different hosts download side by side with --jobs; the same host is shared.
+    host_seconds = {}
+    for dataset_plan in datasets:
+        rate = estimated_throughput(dataset_plan["host"])
+        dataset_plan["seconds"] = dataset_plan["download"] / rate if rate else (0 if not dataset_plan["download"] else None)
+        if dataset_plan["seconds"] is not None:
+            host_seconds[dataset_plan["host"]] = host_seconds.get(dataset_plan["host"], 0) + dataset_plan["seconds"]
+    seconds = (max(host_seconds.values(), default=0) if jobs > 1 else sum(host_seconds.values()))
+    if not host_seconds and any(dataset_plan["download"] for dataset_plan in datasets):
+        seconds = None
+
+    return {
+        "datasets": datasets,
+        "download": sum(dataset_plan["download"] for dataset_plan in datasets),
+        "extracted": sum(extracted_bytes(dataset_plan) for dataset_plan in datasets),
+        "needed": needed_bytes(),
+        "free": free_bytes,
+        "fits": needed_bytes() <= available,
+        "seconds": seconds,
+        "time_complete": all(dataset_plan["seconds"] is not None for dataset_plan in datasets),
+    }
+
+
+def _format_bytes(num_bytes):
+    if num_bytes is None:
+        return "unknown"
+    for unit, scale in (("GB", 1e9), ("MB", 1e6), ("KB", 1e3)):
+        if num_bytes >= scale:
+            return f"{num_bytes/scale:.2f} {unit}"
+    return f"{num_bytes} B"
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "unknown (no earlier downloads from this host)"
+    hours, rest = divmod(int(round(seconds)), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m {seconds:02d}s" if hours else f"{minutes}m {seconds:02d}s"
+
+
+def print_plan(plan):
+    '''
+    Prints a download plan from plan_downloads.
+    '''
+    print(f"{LIME_GREEN}Glucose-ML{R}: Download plan:")
+    for dataset_plan in plan["datasets"]:
+        print(
+            f"  {BOLD}{dataset_plan['dataset']}{R} ({dataset_plan['host']}): download {_format_bytes(dataset_plan['download'])}, "
+            f"extracted full {_format_bytes(dataset_plan['full'])} / selective "
+            f"{_format_bytes(dataset_plan['selective']) if dataset_plan['selective'] is not None else 'unknown (at most full)'}, "
+            f"extract: {BOLD}{dataset_plan['extract']}{R}, est. time {_format_seconds(dataset_plan['seconds'])} "
+            f"[sizes from {', '.join(dataset_plan['sizes_from'])}]"
+        )
+    print(
+        f"{LIME_GREEN}Glucose-ML{R}: Total: download {BOLD}{_format_bytes(plan['download'])}{R}, "
+        f"extracted {BOLD}{_format_bytes(plan['extracted'])}{R}, needs {BOLD}{_format_bytes(plan['needed'])}{R} of "
+        f"{BOLD}{_format_bytes(plan['free'])}{R} free."
+    )
+    print(
+        f"{LIME_GREEN}Glucose-ML{R}: Estimated download time: {BOLD}{_format_seconds(plan['seconds'])}{R}"
+        + ("" if plan["time_complete"] or plan["seconds"] is None else f" {YELLOW}(not counting datasets from hosts without measured throughput){R}")
+    )
+    if plan["fits"]:
+        print(f"{LIME_GREEN}Glucose-ML{R}: The plan fits on the target filesystem.")
+    else:
+        print(
+            f"{LIGHT_RED}Glucose-ML{R}: The plan does not fit: {_format_bytes(plan['needed'])} needed, "
+            f"{_format_bytes(max(0, plan['free'] - PLAN_HEADROOM_BYTES))} usable "
+            f"({_format_bytes(PLAN_HEADROOM_BYTES)} kept free)."
         )
 
-    print(f"{LIME_GREEN}Glucose-ML{R}: Successfully downloaded {LIGHT_RED}{output_file}{R}.")
-    time.sleep(1)
 
-    if output_file.lower().endswith(".zip"):
-        # Validate it's truly a zip before unpacking
-        if not zipfile.is_zipfile(output_zip):
-            raise ValueError(
-                "Downloaded file is not a valid ZIP archive. "
-                f"content-type={response.headers.get('Content-Type')}, final_url={response.url}"
-            )
-        print(f"{LIME_GREEN}Glucose-ML{R}: Unzipping {LIGHT_RED}{output_file}{R}...")
-        shutil.unpack_archive(str(output_zip), str(output_path))
-        print(f"{LIME_GREEN}Glucose-ML{R}: Success! Successfully unpacked {LIGHT_RED}{output_file}{R}.\n")
+def print_datasets():
+    '''
+    Prints the dataset keys this script can download, with their folder names and catalog sizes.
+    '''
+    for download_request, (download_url, output_file, output_string, file_size_bytes, raw_size_bytes) in DATA_SETS.items():
+        print(f"{download_request:<14} {output_string:<22} download {_format_bytes(raw_size_bytes):>10}, unzipped {_format_bytes(file_size_bytes):>10}")
+
+
+def dry_run_dataset(download_request, cache_dir=None, mirror=None):
+    '''
+    Resolves where a dataset would come from and where it would be written, without using the network:
+    the source URL (or mirror), the downloaded file, the raw-data directory, and what is already on disk.
+    Sizes come from dataset_library; use --plan to read them from the archives themselves.
+    '''
+    download_url, output_file, output_string, file_size_bytes, raw_size_bytes = dataset_library(download_request)
+    output_path = Path(f"Original-Glucose-ML-datasets/{output_string}_raw_data")
+    output_zip = output_path / output_file
+
+    if download_request == "physiocgm":
+        output_zip = output_path / "*_raw.zip"
+        state = "per-subject zips are listed by Figshare at download time"
+    elif output_zip.exists():
+        state = "downloaded"
+    elif output_zip.with_name(output_zip.name + ".part").exists():
+        state = "partly downloaded (resumes)"
+    elif _cached_object(cache_dir, download_request, output_file) is not None:
+        state = "in the download cache"
     else:
-        print(f"{LIME_GREEN}Glucose-ML{R}: No need to unzip.\n")
+        state = "to download"
+    if output_path.exists() and any(path.name != output_file and not path.name.endswith((".part", ".segments", ".validators")) for path in output_path.iterdir()):
+        state += ", raw data present"
+
+    return {
+        "dataset": download_request,
+        "source": mirror if mirror else download_url,
+        "file": str(output_zip),
+        "raw_data_path": str(output_path),
+        "state": state,
+        "download": raw_size_bytes,
+        "unzipped": file_size_bytes,
+        "harmonize": dataset_options(download_request).get("harmonize", [download_request]),
+    }
+
+
+def print_dry_run(download_requests, cache_dir=None, mirror=None, harmonize=False):
+    '''
+    Prints dry_run_dataset for every requested dataset.
+    '''
+    print(f"{LIME_GREEN}Glucose-ML{R}: Dry run (nothing is downloaded):")
+    for download_request in download_requests:
+        dry_run = dry_run_dataset(download_request, cache_dir=cache_dir, mirror=mirror)
+        print(f"  {BOLD}{dry_run['dataset']}{R}: {dry_run['state']}")
+        print(f"    from {dry_run['source']}")
+        print(f"    to   {dry_run['file']} ({_format_bytes(dry_run['download'])}, unzipped {_format_bytes(dry_run['unzipped'])})")
+        print(f"    raw data in {dry_run['raw_data_path']}")
+        if harmonize:
+            print(f"    then harmonized as {', '.join(dry_run['harmonize'])}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="This script downloads glucose datasets that can be standardized with our script. Dataset options: d1namo, bigideas, shanghai, uchtt1dm, hupa-ucm, cgmacros, t1dm-uom, bris-t1d_open, azt1d, park_2025, physiocgm")
-    parser.add_argument("datasets", nargs="+", type=str,help="Specify the dataset(s) to download. Speparate datasets with spaces if downloading more than 1.")
+    parser.add_argument("datasets", nargs="*", type=str,help="Specify the dataset(s) to download. Speparate datasets with spaces if downloading more than 1.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of datasets to download at the same time (default: 1, one after another).")
+    parser.add_argument("--per-host", type=int, default=2, help="Maximum number of simultaneous downloads from the same host when --jobs > 1 (default: 2).")
+    parser.add_argument("--segmented", action="store_true", help="Download large single archives over several parallel connections (number of connections is set per dataset).")
+    parser.add_argument("--extract", choices=["selective", "full", "auto"], default="selective", help="'selective' (default) only unzips the files the harmonization scripts read; 'full' unzips whole archives; 'auto' unzips whole archives when they fit on disk and falls back to selective per dataset when they do not.")
+    parser.add_argument("--extract-workers", type=int, default=min(8, os.cpu_count() or 1), help="Number of threads used to unzip large archives (default: number of CPU cores, up to 8).")
+    parser.add_argument("--stream-extract", action="store_true", help="Unzip archives while they are downloading instead of afterwards (single-connection downloads only).")
+    parser.add_argument("--remote-extract", action="store_true", help="Fetch only the selected files out of remote archives with byte range requests instead of downloading whole archives (selective extraction only; the archive is not kept).")
+    parser.add_argument("--segments", type=int, default=None, help="Number of parallel connections per archive for segmented downloads. Implies --segmented and overrides the per-dataset setting.")
+    parser.add_argument("--cache", type=str, default="Original-Glucose-ML-datasets/.cache", help="Content-addressed download cache directory (default: Original-Glucose-ML-datasets/.cache).")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use or fill the download cache.")
+    parser.add_argument("--harmonize", action="store_true", help="Harmonize each dataset as soon as it is downloaded. PhysioCGM subjects are standardized one by one as their zips arrive.")
+    parser.add_argument("--mirror", type=str, default=None, help="Fill the raw-data directories from a mirror (another node's cache directory, or an http(s) URL serving it) instead of the original hosts.")
+    parser.add_argument("--plan", action="store_true", help="Print the download plan (bytes to download and extract, free space, estimated time) and exit without downloading or prompting. Exits with status 1 if the plan does not fit on disk.")
+    parser.add_argument("--yes", "-y", action="store_true", help="Do not ask for confirmation before downloading (for batch jobs).")
+    parser.add_argument("--check-updates", action="store_true", help="Ask each host whether the requested datasets (all datasets if none are given) changed since they were downloaded, and download only the ones that changed or are missing.")
+    parser.add_argument("--list", action="store_true", help="Print the dataset keys that can be downloaded and exit.")
+    parser.add_argument("--dry-run", action="store_true", help="Print where each requested dataset (all datasets if none are given) would be downloaded from and written to, and what is already on disk, then exit. Does not use the network; use --plan for sizes read from the archives.")
 
     input_args = parser.parse_args()
-
-    # Create output directory "Original-Glucose-ML-datasets" to store downloads.
-    output_directory = "Original-Glucose-ML-datasets"
-    os.makedirs(output_directory, exist_ok=True)
+    if input_args.list:
+        print_datasets()
+        sys.exit(0)
+    if not input_args.datasets and not input_args.check_updates and not input_args.dry_run:
+        parser.error("Specify at least one dataset (or use --check-updates to check all of them).")
+    if input_args.jobs < 1 or input_args.per_host < 1:
+        parser.error("--jobs and --per-host must be at least 1.")
+    if input_args.segments is not None and input_args.segments < 1:
+        parser.error("--segments must be at least 1.")
+    if input_args.extract_workers < 1:
+        parser.error("--extract-workers must be at least 1.")
 
     dataset_aliases = {
         "cgmacros_libre": "cgmacros",
@@ -299,7 +2410,8 @@ def main():
         "shanghait1dm": "shanghai",
     }
 
-    organized_args = [dataset_aliases.get(arg.lower(), arg.lower()) for arg in input_args.datasets]
+    # Aliases can point several keys at the same download, so only keep the first occurrence of each.
+    organized_args = list(dict.fromkeys(dataset_aliases.get(arg.lower(), arg.lower()) for arg in input_args.datasets))
 
     file_size_bytes_total = 0
     file_size_converted = 0
@@ -310,7 +2422,39 @@ def main():
             print(f"{LIGHT_RED}Glucose-ML{R}: {LIGHT_RED}Unknown dataset: {arg}{R}")
             sys.exit(1)
 
-    if file_size_bytes_total > 1e9:
+    if input_args.dry_run:
+        print_dry_run(organized_args or list(DATA_SETS), cache_dir=None if input_args.no_cache else input_args.cache, mirror=input_args.mirror, harmonize=input_args.harmonize)
+        sys.exit(0)
+
+    # Create output directory "Original-Glucose-ML-datasets" to store downloads.
+    output_directory = "Original-Glucose-ML-datasets"
+    os.makedirs(output_directory, exist_ok=True)
+
+    cache_dir = None if input_args.no_cache else input_args.cache
+    updates = {}
+    if input_args.check_updates:
+        update_results = check_for_updates(organized_args or list(DATA_SETS))
+        # Datasets that are not downloaded yet are only fetched when they were asked for by name.
+        wanted = ("missing", "changed") if input_args.datasets else ("changed",)
+        organized_args = [arg for arg, result in update_results.items() if result["status"] in wanted]
+        organized_args.sort(key=list(DATA_SETS).index)
+        updates = {arg: update_results[arg]["files"] for arg in organized_args if update_results[arg]["status"] == "changed"}
+        if not organized_args:
+            print(f"{LIME_GREEN}Glucose-ML{R}: Nothing to download.")
+            sys.exit(1 if any(result["status"] == "error" for result in update_results.values()) else 0)
+        file_size_bytes_total = sum(file_size(arg) for arg in organized_args)
+    extract_choice = {arg: input_args.extract for arg in organized_args}
+    if input_args.plan or input_args.extract == "auto":
+        plan = plan_downloads(organized_args, extract=input_args.extract, cache_dir=cache_dir, mirror=input_args.mirror, jobs=input_args.jobs)
+        print_plan(plan)
+        if input_args.plan or not plan["fits"]:
+            sys.exit(0 if plan["fits"] else 1)
+        extract_choice = {dataset_plan["dataset"]: dataset_plan["extract"] for dataset_plan in plan["datasets"]}
+        file_size_bytes_total = plan["download"] + plan["extracted"]
+
+    if input_args.yes:
+        response = "y"
+    elif file_size_bytes_total > 1e9:
         file_size_converted = round(file_size_bytes_total / 1e9, 2)  # gigs
         response = input(f"{LIME_GREEN}Glucose-ML{R}: You are about to download approximately {BOLD}{LIGHT_RED}{file_size_converted} GB{R} of data. Would you like to proceed? {BOLD}Enter (y/n){R}:")
     elif file_size_bytes_total > 1e6:
@@ -328,9 +2472,34 @@ def main():
         print(f"{LIGHT_RED}Glucose-ML{R}: Terminating auto-download-open-datasets.py")
         sys.exit(0)
 
+    # Outdated files of datasets that changed upstream are removed so they are downloaded again.
+    for arg, file_names in updates.items():
+        prepare_update(arg, file_names, cache_dir=cache_dir)
+
+    # Extra download settings for each dataset.
+    download_kwargs = {}
+    for arg in organized_args:
+        download_kwargs[arg] = {
+            "extract": extract_choice[arg],
+            "cache_dir": cache_dir,
+            "mirror": input_args.mirror,
+            "harmonize": input_args.harmonize,
+            "extract_workers": input_args.extract_workers,
+            "stream_extract": input_args.stream_extract,
+            "remote_extract": input_args.remote_extract,
+        }
+        if input_args.segments is not None:
+            download_kwargs[arg]["segments"] = input_args.segments
+        elif input_args.segmented:
+            download_kwargs[arg]["segments"] = dataset_options(arg).get("segments")
+
+    if input_args.jobs > 1 and len(organized_args) > 1:
+        download_concurrently(organized_args, input_args.jobs, input_args.per_host, download_kwargs)
+        return
+
     for arg in organized_args:
         try:
-            download_datasets(arg)
+            download_datasets(arg, **download_kwargs[arg])
         except KeyError:
             print(f"{LIGHT_RED}Glucose-ML{R}: Unknown dataset provided {LIGHT_RED}{arg}{R}.")
         except Exception as e:
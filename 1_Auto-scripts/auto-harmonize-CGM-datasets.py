@@ -1,95 +1,376 @@
-import subprocess
 import argparse
 from pathlib import Path
 import sys
+import io
+import os
+import time
+import contextlib
+import importlib.util
+import threading
+import json
 
+# harmonize_utils.py lives in 2_Harmonize-cgm-datasets, next to the dataset scripts.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "2_Harmonize-cgm-datasets"))
+from harmonize_utils import RunReport, report_stage, dry_run_dataset, REPORT_NAME, SUBJECT_JOBS_ENV
 
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
 R = "\033[0m"
 
+# Harmonize script key: dataset folder name (in 2_Harmonize-cgm-datasets).
+DATASETS = {"hall_2018": "Hall_2018",
+    "d1namo": "D1NAMO",
+    "colas_2019": "Colas_2019",
+    "ohiot1dm": "OhioT1DM",
+    "t1dexi": "T1DEXI",
+    "t1dexip": "T1DEXIP",
+    "bigideas": "BIGIDEAs",
+    "diatrend": "DiaTrend",
+    "shanghait1dm": "ShanghaiT1DM", 
+    "shanghait2dm": "ShanghaiT2DM",
+    "t1diabetesgranada": "T1DiabetesGranada", 
+    "ai-readi": "AI-READI",
+    "uchtt1dm": "UCHTT1DM",
+    "hupa-ucm": "HUPA-UCM",
+    "cgmacros_dexcom": "CGMacros_Dexcom",
+    "cgmacros_libre": "CGMacros_Libre",
+    "t1d-uom": "T1D-UOM",
+    "bris-t1d_open": "Bris-T1D_Open",
+    "azt1d": "AZT1D",
+    "park_2025": "Park_2025",
+    "physiocgm": "PhysioCGM"
+}
+
+
 def dataset_library(arg):
-    datasets = {"hall_2018": "Hall_2018",
-            "d1namo": "D1NAMO",
-            "colas_2019": "Colas_2019",
-            "ohiot1dm": "OhioT1DM",
-            "t1dexi": "T1DEXI",
-            "t1dexip": "T1DEXIP",
-            "bigideas": "BIGIDEAs",
-            "diatrend": "DiaTrend",
-            "shanghait1dm": "ShanghaiT1DM", 
-            "shanghait2dm": "ShanghaiT2DM",
-            "t1diabetesgranada": "T1DiabetesGranada", 
-            "ai-readi": "AI-READI",
-            "uchtt1dm": "UCHTT1DM",
-            "hupa-ucm": "HUPA-UCM",
-            "cgmacros_dexcom": "CGMacros_Dexcom",
-            "cgmacros_libre": "CGMacros_Libre",
-            "t1d-uom": "T1D-UOM",
-            "bris-t1d_open": "Bris-T1D_Open",
-            "azt1d": "AZT1D",
-            "park_2025": "Park_2025",
-            "physiocgm": "PhysioCGM"
-            }
-    return datasets[arg]
-
-
-def standardize_datasets(arg):
-    
-    dataset_string = dataset_library(arg)
+    return DATASETS[arg]
 
-    print(f"{LIME_GREEN}Glucose-ML{R}: Harmonizing the {LIGHT_RED}{dataset_string}{R} dataset.")
 
-    #base_dir points to ../Glucose-ML/Auto-scripts
+def harmonize_paths(arg, raw_root=None):
+    '''
+    Returns (harmonize_dir, raw_data_path) for a dataset.
+    raw_root is the "Original-Glucose-ML-datasets" folder (default: the one next to this script).
+    '''
+    dataset_string = dataset_library(arg)
+
+    #base_dir points to ../Glucose-ML/1_Auto-scripts
     base_dir = Path(__file__).resolve().parent
-    #harmonize_dir points to ../Glucose-ML/harmonize-CGM-datasets/Bris-T1D_Open
-    harmonize_dir = base_dir.parent / "harmonize-CGM-datasets" / dataset_string
+    raw_root = Path(raw_root) if raw_root is not None else base_dir / "Original-Glucose-ML-datasets"
+    #harmonize_dir points to ../Glucose-ML/2_Harmonize-cgm-datasets/Bris-T1D_Open
+    harmonize_dir = base_dir.parent / "2_Harmonize-cgm-datasets" / dataset_string
     #Handels dataset downloads that contain more than 1 Glucose-ML dataset and splits them,
     if dataset_string == "CGMacros_Dexcom" or dataset_string == "CGMacros_Libre":
-        raw_data_path = (base_dir / "Original-Glucose-ML-datasets" / f"CGMacros_raw_data")
+        raw_data_path = (raw_root / f"CGMacros_raw_data")
     elif dataset_string == "ShanghaiT1DM":
-        raw_data_path = (base_dir / "Original-Glucose-ML-datasets" / f"Shanghai_raw_data" / "diabetes_datasets" / "Shanghai_T1DM")
+        raw_data_path = (raw_root / f"Shanghai_raw_data" / "diabetes_datasets" / "Shanghai_T1DM")
     elif dataset_string == "ShanghaiT2DM":
-        raw_data_path = (base_dir / "Original-Glucose-ML-datasets" / f"Shanghai_raw_data" / "diabetes_datasets" / "Shanghai_T2DM")
+        raw_data_path = (raw_root / f"Shanghai_raw_data" / "diabetes_datasets" / "Shanghai_T2DM")
     else:
-        raw_data_path = (base_dir / "Original-Glucose-ML-datasets" / f"{dataset_string}_raw_data")
-    #raw_data_path = Path(f"Original-Glucose-ML-datasets/{dataset_string}_raw_data")
-    call_script_1 = harmonize_dir / f"{dataset_string}_extract-glucose-data.py"
-    call_script_2 = harmonize_dir / f"{dataset_string}_metadata.py"
+        raw_data_path = (raw_root / f"{dataset_string}_raw_data")
+    return harmonize_dir, raw_data_path
+
+
+def output_paths(arg):
+    '''
+    Returns (output_dir, metadata_dir) of a dataset, relative to the working directory.
+    '''
+    return Path(f"Standardized-datasets/{dataset_library(arg)}"), Path("Standardized-metadata")
+
+
+# Scripts that make up a dataset's harmonizer, by role.
+HARMONIZER_SCRIPTS = {
+    "extract": "{dataset}_extract-glucose-data.py",
+    "metadata": "{dataset}_metadata.py",
+}
+
+_harmonizer_modules = {}
+_harmonizer_modules_lock = threading.Lock()
+
+
+def load_harmonizer_script(arg, role):
+    '''
+    Imports one of a dataset's harmonizer scripts (role is a key of HARMONIZER_SCRIPTS) so its functions
+    can be called directly. The file names contain dashes, so the scripts are loaded by path.
+    Modules are loaded once per process.
+    '''
+    dataset_string = dataset_library(arg)
+    with _harmonizer_modules_lock:
+        if (dataset_string, role) not in _harmonizer_modules:
+            harmonize_dir, _ = harmonize_paths(arg)
+            script_path = harmonize_dir / HARMONIZER_SCRIPTS[role].format(dataset=dataset_string)
+            module_name = script_path.stem.replace("-", "_")
+            spec = importlib.util.spec_from_file_location(module_name, script_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _harmonizer_modules[(dataset_string, role)] = module
+        return _harmonizer_modules[(dataset_string, role)]
+
+
+def load_extract_script(arg):
+    return load_harmonizer_script(arg, "extract")
+
+
+_registry = {}
+
+
+def harmonizer_registry(arg):
+    '''
+    Returns the harmonization functions of a dataset, imported from its scripts:
+      - "extract": extract_glucose_data(input_path, output_dir), standardizes the raw data and writes
+        Standardized-metadata/<Dataset>_metadata_calcs.csv in the same pass
+      - "metadata": generate_metadata(input_path), recomputes the metadata from the standardized CSVs
+      - "spec": the dataset's SPEC, which describes its raw data (see harmonize_utils.SPEC_DEFAULTS)
+      - "compute_metadata": clean_and_compute_metadata(df, subject_id)
+      - "extract_subject": extract_subject(raw_path, output_dir), or None if the dataset cannot be
+        standardized one subject at a time
+    '''
+    dataset_string = dataset_library(arg)
+    if dataset_string not in _registry:
+        extract_module = load_harmonizer_script(arg, "extract")
+        metadata_module = load_harmonizer_script(arg, "metadata")
+        _registry[dataset_string] = {
+            "extract": extract_module.extract_glucose_data,
+            "metadata": metadata_module.generate_metadata,
+            "spec": extract_module.SPEC,
+            "compute_metadata": metadata_module.clean_and_compute_metadata,
+            "extract_subject": getattr(extract_module, "extract_subject", None),
+        }
+    return _registry[dataset_string]
+
+
+def standardize_datasets(arg, raw_root=None, metadata_only=False):
+    '''
+    Runs a dataset's extraction, which also computes its metadata, in this process (see harmonizer_registry).
+    With metadata_only, the extraction is skipped because the subjects were already standardized
+    one by one (see standardize_subject), and the metadata is computed from the standardized CSVs.
+    Each run appends a report of its stages (time, rows, bytes and peak memory, see harmonize_utils.RunReport)
+    to harmonize-report.jsonl.
+    Returns True if both steps finished, False if the dataset failed (the error is printed).
+    '''
+    dataset_string = dataset_library(arg)
+
+    print(f"{LIME_GREEN}Glucose-ML{R}: Harmonizing the {LIGHT_RED}{dataset_string}{R} dataset.")
 
-    call_script_2_input = f"Standardized-datasets/{dataset_string}"
+    _, raw_data_path = harmonize_paths(arg, raw_root)
+    output_dir, meta_output_path = output_paths(arg)
+    output_dir = str(output_dir)
 
-    meta_output_path = Path(f"Standardized-metadata")
     meta_output_path.mkdir(parents=True, exist_ok=True)
 
+    report = RunReport(dataset_string)
+    status = "ok"
     try:
-        # Run script 1
-        subprocess.run([sys.executable, str(call_script_1), str(raw_data_path)],check=True)
-        # Run script 2 but only if script 1 goes through.
-        subprocess.run([sys.executable, str(call_script_2), call_script_2_input],check=True)
+        harmonizer = harmonizer_registry(arg)
+        with report.track():
+            # Extract the glucose data. The metadata of each subject is computed before its CSV is written.
+            if not metadata_only:
+                harmonizer["extract"](raw_data_path, output_dir)
+            else:
+                with report_stage("metadata") as stats:
+                    stats["rows_out"] += len(harmonizer["metadata"](output_dir))
 
-    except subprocess.CalledProcessError as e:
+    except (Exception, SystemExit) as e:
         print(f"{LIGHT_RED}Glucose-ML{R}: Error while processing {dataset_string}: {e}")
+        status = "failed"
+    entry = report.save(status)
+    peak = f", peak memory {entry['peak_rss_bytes'] / 1e6:.0f} MB" if entry["peak_rss_bytes"] else ""
+    print(f"{LIME_GREEN}Glucose-ML{R}: {dataset_string} took {entry['wall_s']:.1f} s{peak} (stages in {REPORT_NAME}).")
+    return status == "ok"
 
 
+def standardize_subject(arg, raw_path):
+    '''
+    Standardizes a single subject of a dataset that is published as one file per subject (PhysioCGM),
+    so subjects can be harmonized while the rest of the dataset is still downloading.
+    The dataset's extract script must define extract_subject(raw_path, output_dir).
+    Returns the subject ID.
+    '''
+    dataset_string = dataset_library(arg)
+    extract_subject = harmonizer_registry(arg)["extract_subject"]
+    if extract_subject is None:
+        raise ValueError(f"{dataset_string} cannot be standardized one subject at a time.")
+
+    output_dir = Path(f"Standardized-datasets/{dataset_string}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return extract_subject(raw_path, output_dir)
+
+
+
+def harmonize_captured(arg, raw_root=None):
+    '''
+    Runs standardize_datasets in a worker process of harmonize_parallel with its output captured,
+    so the output of datasets harmonized at the same time does not interleave.
+    Returns (status, captured output, seconds).
+    '''
+    output = io.StringIO()
+    started = time.time()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            status = "ok" if standardize_datasets(arg, raw_root=raw_root) else "failed"
+        except Exception as e:
+            print(f"{LIGHT_RED}Glucose-ML{R}: Failed to standardize the following dataset {arg}: {e}")
+            status = "failed"
+    return status, output.getvalue(), time.time() - started
+
+
+def harmonize_parallel(args, jobs, raw_root=None):
+    '''
+    Harmonizes several datasets at once on a pool of jobs worker processes. Each dataset writes to its
+    own Standardized-datasets/<Dataset> folder. A dataset's output is printed in one block, each line
+    prefixed with the dataset name, as soon as that dataset is done.
+    A dataset that fails, or whose worker process dies, does not stop the others.
+    Returns {arg: (status, seconds)}.
+    '''
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(harmonize_captured, arg, raw_root): arg for arg in args}
+        for future in as_completed(futures):
+            arg = futures[future]
+            dataset_string = dataset_library(arg)
+            try:
+                status, output, seconds = future.result()
+            except Exception as e: # The worker process itself died (e.g. killed for using too much memory).
+                status, output, seconds = "failed", f"{LIGHT_RED}Glucose-ML{R}: Worker process failed: {e!r}\n", 0.0
+            for line in output.splitlines():
+                print(f"[{dataset_string}] {line}")
+            sys.stdout.flush()
+            results[arg] = (status, seconds)
+    return results
+
+
+def print_summary(args, results):
+    '''
+    Prints one status line per requested dataset, in the order they were requested.
+    '''
+    print(f"\n{LIME_GREEN}Glucose-ML{R}: Harmonization summary:")
+    for arg in args:
+        status, seconds = results[arg]
+        if status == "ok":
+            print(f"  {LIME_GREEN}ok{R}      {arg} ({seconds:.1f} s)")
+        elif status == "unknown":
+            print(f"  {LIGHT_RED}unknown{R} {arg} (not a dataset key)")
+        else:
+            print(f"  {LIGHT_RED}failed{R}  {arg} ({seconds:.1f} s)")
+
+
+def dataset_plan(arg, raw_root=None):
+    '''
+    Resolves the scripts, raw data and outputs a dataset would be harmonized with, without running anything.
+    '''
+    dataset_string = dataset_library(arg)
+    harmonize_dir, raw_data_path = harmonize_paths(arg, raw_root)
+    output_dir, metadata_dir = output_paths(arg)
+    return {
+        "dataset": arg,
+        "folder": dataset_string,
+        "extract_script": str(harmonize_dir / HARMONIZER_SCRIPTS["extract"].format(dataset=dataset_string)),
+        "raw_data_path": str(raw_data_path),
+        # Folders inside a download's archive (e.g. Shanghai_T1DM) are read from the archive, so the download's folder is enough.
+        "raw_data_found": next(path for path in (raw_data_path, *raw_data_path.parents) if path.name.endswith("_raw_data")).exists(),
+        "output_dir": str(output_dir),
+        "metadata_dir": str(metadata_dir),
+    }
 
 
+def dry_run(arg, raw_root=None):
+    '''
+    Prints what harmonizing a dataset would do (see harmonize_utils.dry_run_dataset): the raw files found, and the
+    subjects unchanged since the last run and to be standardized. Only the dataset's extract script is loaded.
+    Returns True if the raw data was found.
+    '''
+    plan = dataset_plan(arg, raw_root)
+    print(f"{LIME_GREEN}Glucose-ML{R}: {LIGHT_RED}{plan['folder']}{R}: {plan['raw_data_path']} -> {plan['output_dir']}")
+    try:
+        found = dry_run_dataset(plan["extract_script"], load_extract_script(arg).SPEC, plan["raw_data_path"], plan["output_dir"])
+    except (Exception, SystemExit) as e:
+        print(f"  {e}")
+        return False
+    if not found["raw_files"]:
+        print(f"  {LIGHT_RED}No raw files found.{R}")
+        return False
+    print(f"  {found['raw_files']} raw file(s), {found['raw_bytes'] / 1e6:.1f} MB")
+    if found["subjects"] is None:
+        print(f"  one table of all subjects, {'to standardize' if found['pending'] else 'unchanged since the last run'}")
+    else:
+        print(f"  {found['subjects']} subject(s), {found['subjects'] - len(found['pending'])} unchanged since the last run, {len(found['pending'])} to standardize")
+    return True
+
 
 def main():
 
     #standardize_datasets("hall_2018")
     parser = argparse.ArgumentParser(description="This script standardizes a Glucose-ML-friendly datasets & generates some metadata. Dataset options: ")
-    parser.add_argument("datasets", nargs="+", type=str, help="Specify the dataset(s) to standardize. Speparate datasets with spaces if standardizing more than 1.")  # Initializes 'datasets' Argument.
+    parser.add_argument("datasets", nargs="*", type=str, help="Specify the dataset(s) to standardize. Speparate datasets with spaces if standardizing more than 1.")  # Initializes 'datasets' Argument.
+    parser.add_argument("--jobs", type=int, default=1, help=f"Number of datasets to harmonize at the same time, each in its own process (default: 1, this machine has {os.cpu_count()} CPUs).")
+    parser.add_argument("--hash-inputs", action="store_true", help="Detect changed raw files by their SHA-256 instead of their size and modification time (slower, but survives re-downloads that only touch the files).")
+    parser.add_argument("--rebuild", action="store_true", help="Standardize every subject again, even those unchanged since the last run.")
+    parser.add_argument("--subject-jobs", type=int, default=None, help="Number of processes that standardize the subjects of one dataset (default: one per CPU, or 1 with --jobs).")
+    parser.add_argument("--raw-root", type=str, default=None, help="Folder holding the raw datasets, laid out like Original-Glucose-ML-datasets (default: the Original-Glucose-ML-datasets folder next to this script).")
+
+    parser.add_argument("--list", action="store_true", help="Print the dataset keys and their folder names, then exit.")
+    parser.add_argument("--plan", action="store_true", help="Print one JSON line per requested dataset (all datasets if none are given) with its extract script, raw data path and output paths, then exit. No dataset script is loaded.")
+    parser.add_argument("--dry-run", action="store_true", help="Print, for each requested dataset (all datasets if none are given), the raw files found and how many subjects are unchanged since the last run or would be standardized, then exit. Exits with status 1 if a dataset or its raw data is missing.")
 
     input_args = parser.parse_args()
+    if input_args.list:
+        for arg, dataset_string in DATASETS.items():
+            print(f"{arg:<18} {dataset_string}")
+        sys.exit(0)
+    if not input_args.datasets and not (input_args.plan or input_args.dry_run):
+        parser.error("Specify at least one dataset (or use --list to see them).")
+
+    # Subjects unchanged since the last run are skipped (see harmonize_utils.HarmonizeManifest). The options are
+    # passed through the environment so the worker processes of --jobs see them too.
+    if input_args.hash_inputs:
+        os.environ["GLUCOSE_ML_HASH_INPUTS"] = "1"
+    if input_args.rebuild:
+        os.environ["GLUCOSE_ML_REBUILD"] = "1"
+    # Datasets published as one file per subject spread their subjects over processes (see harmonize_utils.standardize_subjects),
+    # unless --jobs already runs several datasets at once.
+    if input_args.subject_jobs is not None:
+        os.environ[SUBJECT_JOBS_ENV] = str(input_args.subject_jobs)
+    elif input_args.jobs > 1:
+        os.environ[SUBJECT_JOBS_ENV] = "1"
 
-    for arg in input_args.datasets:
+    # Each dataset is harmonized once, even if it is requested twice.
+    args = list(dict.fromkeys(input_args.datasets))
+    results = {}
+    known_args = []
+    for arg in args:
         try:
-            standardize_datasets(arg)
+            dataset_library(arg)
+            known_args.append(arg)
         except KeyError:
             print(f"{LIGHT_RED}Glucose-ML{R}: Unknown dataset provided: {arg}")
-        except Exception as e:
-            print(f"{LIGHT_RED}Glucose-ML{R}: Failed to standardize the following dataset {arg}: {e}")
+            results[arg] = ("unknown", 0.0)
+
+    # --plan and --dry-run only need the standard library (pandas is imported when a dataset is standardized).
+    if input_args.plan or input_args.dry_run:
+        planned = known_args if input_args.datasets else list(DATASETS)
+        if input_args.plan:
+            for arg in planned:
+                print(json.dumps(dataset_plan(arg, input_args.raw_root)))
+            sys.exit(1 if len(planned) < len(args) else 0)
+        found = [dry_run(arg, input_args.raw_root) for arg in planned]
+        sys.exit(0 if all(found) and len(planned) == len(args or planned) else 1)
+
+    if input_args.jobs > 1 and len(known_args) > 1:
+        print(f"{LIME_GREEN}Glucose-ML{R}: Harmonizing {len(known_args)} datasets, {min(input_args.jobs, len(known_args))} at a time.")
+        results.update(harmonize_parallel(known_args, input_args.jobs, input_args.raw_root))
+    else:
+        for arg in known_args:
+            started = time.time()
+            try:
+                status = "ok" if standardize_datasets(arg, raw_root=input_args.raw_root) else "failed"
+            except Exception as e:
+                print(f"{LIGHT_RED}Glucose-ML{R}: Failed to standardize the following dataset {arg}: {e}")
+                status = "failed"
+            results[arg] = (status, time.time() - started)
+
+    print_summary(args, results)
+    if any(status != "ok" for status, _ in results.values()):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
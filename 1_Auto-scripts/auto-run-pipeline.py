@@ -0,0 +1,489 @@
+import argparse
+from pathlib import Path
+import sys
+import os
+import io
+import csv
+import json
+import time
+import hashlib
+import zipfile
+import subprocess
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+YELLOW = "\033[93m"
+R = "\033[0m"
+
+# base_dir points to ../Glucose-ML/1_Auto-scripts, repo_dir to ../Glucose-ML
+base_dir = Path(__file__).resolve().parent
+repo_dir = base_dir.parent
+
+# Records, per stage, the hashes of the inputs and outputs of its last successful run.
+STATE_FILE = base_dir / ".pipeline-state.json"
+
+# Datasets used by 6_Case-study (same list as open_projects in 1_split_participants.py).
+CASE_STUDY_DATASETS = ["AZT1D", "BIGIDEAs", "Bris-T1D_Open", "CGMacros_Dexcom", "Colas_2019", "D1NAMO", "Hall_2018", "HUPA-UCM", "PhysioCGM", "ShanghaiT1DM", "ShanghaiT2DM", "T1D-UOM", "UCHTT1DM"]
+
+# Metadata columns computed by the <Dataset>_metadata.py scripts. The other columns of the collection's
+# <Dataset>-metadata.csv (diabetes type, age, ...) are curated by hand and never overwritten.
+COMPUTED_METADATA_COLUMNS = ["glucose_level_record_count", "average_glucose_level_mg_dl", "count_days_with_CGM_data"]
+
+# Datasets whose metadata script writes Standardized-metadata/<name>_metadata_calcs.csv under another name.
+METADATA_CALCS_NAMES = {"Bris-T1D_Open": "Bris-T1D", "UCHTT1DM": "UCHT1DM"}
+
+
+_auto_scripts = {}
+
+
+def load_auto_script(file_name):
+    '''
+    Imports one of the other auto-scripts (their file names contain dashes, so they are loaded by path), once.
+    '''
+    if file_name not in _auto_scripts:
+        script_path = base_dir / file_name
+        spec = importlib.util.spec_from_file_location(script_path.stem.replace("-", "_"), script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _auto_scripts[file_name] = module
+    return _auto_scripts[file_name]
+
+
+def raw_folder(key):
+    '''
+    Returns the raw-data folder of the whole download a dataset comes from (e.g. Shanghai_raw_data for ShanghaiT1DM).
+    '''
+    harmonizer = load_auto_script("auto-harmonize-CGM-datasets.py")
+    raw_root = base_dir / "Original-Glucose-ML-datasets"
+    _, raw_data_path = harmonizer.harmonize_paths(key, raw_root)
+    return raw_root / raw_data_path.relative_to(raw_root).parts[0]
+
+
+def python_stage(name, script, args=(), cwd=None, inputs=(), outputs=(), after=()):
+    '''
+    Returns a stage that runs script (a path relative to the repository) with this Python interpreter.
+    inputs and outputs are paths or glob patterns relative to the repository; a directory stands for every
+    file below it. The script itself is always an input, so editing it reruns the stage.
+    '''
+    return {
+        "name": name,
+        "command": [sys.executable, str(repo_dir / script), *args],
+        "signature": [script, *args],
+        "cwd": repo_dir / (cwd or Path(script).parent),
+        "inputs": [script, *inputs],
+        "outputs": list(outputs),
+        "after": list(after),
+    }
+
+
+def pipeline_stages(harmonize_keys, download=False):
+    '''
+    Declares the stages of the Glucose-ML workflow, in an order where every stage comes after the stages it
+    depends on ("after"):
+      download:<key> -> harmonize:<key> -> package:<Dataset> -> figure-3
+                                                             -> split -> preprocess -> features -> models
+    Only the requested datasets are downloaded and harmonized. package, figure-3 and the case study always
+    read 3_Glucose-ML-collection, so they also run (once) on their own.
+    '''
+    harmonizer = load_auto_script("auto-harmonize-CGM-datasets.py")
+    stages = []
+
+    download_stages = {}
+    if download:
+        downloader = load_auto_script("auto-download-open-datasets.py")
+        for key in harmonize_keys:
+            # Some downloads hold more than one dataset (e.g. "cgmacros" for CGMacros Dexcom and Libre).
+            download_key = next((name for name in downloader.DATA_SETS if key in downloader.dataset_options(name).get("harmonize", [name])), None)
+            if download_key is None:
+                continue
+            if download_key not in download_stages:
+                stage = python_stage(f"download:{download_key}", "1_Auto-scripts/auto-download-open-datasets.py", [download_key, "--check-updates", "--yes"])
+                # The hosts are asked whether the dataset changed, so a download stage always runs.
+                stage["always"] = True
+                stages.append(stage)
+                download_stages[download_key] = stage["name"]
+            download_stages[key] = download_stages[download_key]
+
+    package_stages = []
+    for key in harmonize_keys:
+        dataset_string = harmonizer.dataset_library(key)
+        harmonize_dir = f"2_Harmonize-cgm-datasets/{dataset_string}"
+        calcs_name = METADATA_CALCS_NAMES.get(dataset_string, dataset_string)
+        stages.append(python_stage(
+            f"harmonize:{key}", "1_Auto-scripts/auto-harmonize-CGM-datasets.py", [key],
+            inputs=[str(raw_folder(key).relative_to(repo_dir)),
+                    f"{harmonize_dir}/{dataset_string}_extract-glucose-data.py",
+                    f"{harmonize_dir}/{dataset_string}_metadata.py",
+                    "2_Harmonize-cgm-datasets/harmonize_utils.py"],
+            outputs=[f"1_Auto-scripts/Standardized-datasets/{dataset_string}/*.csv",
+                     f"1_Auto-scripts/Standardized-metadata/{calcs_name}_metadata_calcs.csv"],
+            after=[download_stages[key]] if key in download_stages else [],
+        ))
+
+        # Only open-access datasets are published in 3_Glucose-ML-collection.
+        collection_dir = f"3_Glucose-ML-collection/{dataset_string}"
+        if (repo_dir / collection_dir / f"{dataset_string}-metadata.csv").exists():
+            stages.append({
+                "name": f"package:{dataset_string}",
+                "function": package_dataset,
+                "args": (dataset_string,),
+                "signature": ["package_dataset", dataset_string],
+                "inputs": [f"1_Auto-scripts/Standardized-datasets/{dataset_string}/*.csv",
+                           f"1_Auto-scripts/Standardized-metadata/{calcs_name}_metadata_calcs.csv"],
+                "outputs": [f"{collection_dir}/{dataset_string}-extracted-glucose-files/*.csv",
+                            f"{collection_dir}/{dataset_string}-metadata.csv",
+                            f"{collection_dir}/{dataset_string}-from-Glucose-ML.zip"],
+                "after": [f"harmonize:{key}"],
+            })
+            package_stages.append(f"package:{dataset_string}")
+
+    stages.append(python_stage(
+        "figure-3", "4_Figures-from-paper/Generate_figure-3.py",
+        inputs=["3_Glucose-ML-collection/*/*metadata.csv", "5_Tables-from-paper/Table_3.csv"],
+        outputs=["4_Figures-from-paper/Figures/Figure_3?.png"],
+        after=package_stages,
+    ))
+
+    case_study_metadata = [f"3_Glucose-ML-collection/{dataset}/{dataset}-metadata.csv" for dataset in CASE_STUDY_DATASETS]
+    case_study_files = [f"3_Glucose-ML-collection/{dataset}/{dataset}-extracted-glucose-files/*.csv" for dataset in CASE_STUDY_DATASETS]
+    case_study_packages = [name for name in package_stages if name.split(":", 1)[1] in CASE_STUDY_DATASETS]
+    stages.append(python_stage("split", "6_Case-study/1_split_participants.py", inputs=case_study_metadata, outputs=["6_Case-study/participant_splits.csv"], after=case_study_packages))
+    stages.append(python_stage("preprocess", "6_Case-study/2_preprocess_data.py", inputs=["6_Case-study/participant_splits.csv", *case_study_files], outputs=["6_Case-study/Processed-Data"], after=["split", *case_study_packages]))
+    stages.append(python_stage("features", "6_Case-study/3_calculate_features.py", inputs=["6_Case-study/Processed-Data"], outputs=["6_Case-study/feature_calcs.csv"], after=["preprocess"]))
+    stages.append(python_stage("models", "6_Case-study/4_machine_learning.py", inputs=["6_Case-study/feature_calcs.csv"],
+                               outputs=["6_Case-study/Logistic-regression-results", "6_Case-study/Random-forest-results", "6_Case-study/XGBoost-results"], after=["features"]))
+    return stages
+
+
+def _read_csv_rows(path):
+    '''
+    Reads a CSV as a list of rows of strings, remembering its encoding (BOM), line endings and whether it ends
+    with a newline, so it can be written back unchanged except for the edited cells.
+    '''
+    data = path.read_bytes()
+    encoding = "utf-8-sig" if data.startswith(b"\xef\xbb\xbf") else "utf-8"
+    newline = "\r\n" if b"\r\n" in data else "\n"
+    rows = list(csv.reader(io.StringIO(data.decode(encoding), newline="")))
+    return rows, encoding, newline, data.endswith(b"\n")
+
+
+def _same_number(old, new):
+    '''
+    Returns True if two metadata cells hold the same number (e.g. "168" and "168.0"), so unchanged values keep their formatting.
+    '''
+    try:
+        return float(old) == float(new)
+    except ValueError:
+        return old == new
+
+
+def package_dataset(dataset_string):
+    '''
+    Publishes a harmonized dataset to 3_Glucose-ML-collection/<Dataset>:
+      - <Dataset>-extracted-glucose-files/ is made identical to Standardized-datasets/<Dataset>/
+      - the computed columns of <Dataset>-metadata.csv are updated from Standardized-metadata
+      - <Dataset>-from-Glucose-ML.zip is rebuilt from both
+    Files whose content did not change are not rewritten. Returns a one-line summary.
+    '''
+    collection_dir = repo_dir / "3_Glucose-ML-collection" / dataset_string
+    files_dir = collection_dir / f"{dataset_string}-extracted-glucose-files"
+    standardized_dir = base_dir / "Standardized-datasets" / dataset_string
+    calcs_path = base_dir / "Standardized-metadata" / f"{METADATA_CALCS_NAMES.get(dataset_string, dataset_string)}_metadata_calcs.csv"
+
+    # Copy the standardized subject files and remove the ones of subjects that are gone.
+    files_dir.mkdir(parents=True, exist_ok=True)
+    standardized = {path.name: path for path in standardized_dir.glob("*.csv")}
+    if not standardized:
+        raise FileNotFoundError(f"No standardized files in {standardized_dir}")
+    copied = 0
+    for name, path in standardized.items():
+        data = path.read_bytes()
+        target = files_dir / name
+        if not target.exists() or target.read_bytes() != data:
+            target.write_bytes(data)
+            copied += 1
+    removed = [path for path in files_dir.glob("*.csv") if path.name not in standardized]
+    for path in removed:
+        path.unlink()
+
+    # Update the computed metadata columns of the subjects listed in the collection metadata.
+    metadata_path = collection_dir / f"{dataset_string}-metadata.csv"
+    rows, encoding, newline, ends_with_newline = _read_csv_rows(metadata_path)
+    header = rows[0]
+    calcs_rows = _read_csv_rows(calcs_path)[0]
+    calcs = {row[0]: dict(zip(calcs_rows[0], row)) for row in calcs_rows[1:] if row}
+    updated = []
+    for row in rows[1:]:
+        if row and row[0] in calcs:
+            for column in COMPUTED_METADATA_COLUMNS:
+                if column in header and column in calcs[row[0]] and not _same_number(row[header.index(column)], calcs[row[0]][column]):
+                    row[header.index(column)] = calcs[row[0]][column]
+        updated.append(row)
+    output = io.StringIO(newline="")
+    csv.writer(output, lineterminator=newline).writerows([header, *updated])
+    metadata_text = output.getvalue() if ends_with_newline else output.getvalue()[:-len(newline)]
+    metadata_data = metadata_text.encode(encoding)
+    if metadata_path.read_bytes() != metadata_data:
+        metadata_path.write_bytes(metadata_data)
+    unlisted = sorted(set(calcs) - {row[0] for row in rows[1:] if row})
+
+    # Rebuild the zip with fixed timestamps, so the same files always give the same archive.
+    zip_path = collection_dir / f"{dataset_string}-from-Glucose-ML.zip"
+    tmp_path = zip_path.with_name(zip_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in [metadata_path, *sorted(files_dir.glob("*.csv"))]:
+            info = zipfile.ZipInfo(str(path.relative_to(collection_dir)).replace(os.sep, "/"), date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, path.read_bytes())
+    if zip_path.exists() and zip_path.read_bytes() == tmp_path.read_bytes():
+        tmp_path.unlink()
+    else:
+        os.replace(tmp_path, zip_path)
+
+    summary = f"{len(standardized)} subject files ({copied} changed, {len(removed)} removed)."
+    if unlisted:
+        summary += f" Not in {metadata_path.name}, add their demographics by hand: {', '.join(unlisted)}"
+    return summary
+
+
+def _expand(pattern):
+    '''
+    Returns the files a stage input/output pattern stands for, sorted. Hidden files (manifests, caches) are ignored.
+    '''
+    path = repo_dir / pattern
+    if any(char in pattern for char in "*?["):
+        matches = sorted(repo_dir.glob(pattern))
+    elif path.is_dir():
+        matches = sorted(path.rglob("*"))
+    else:
+        matches = [path] if path.exists() else []
+    return [match for match in matches if match.is_file() and not any(part.startswith(".") for part in match.relative_to(repo_dir).parts)]
+
+
+class HashCache:
+    '''
+    SHA-256 of files, remembered by (size, modification time) so unchanged files are not read again.
+    '''
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def sha256(self, path):
+        stat = path.stat()
+        key = str(path.relative_to(repo_dir))
+        entry = self.entries.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self.entries[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def digest(self, patterns, extra=()):
+        '''
+        Returns one hash over the names and contents of all files matched by patterns (and the strings in extra),
+        and the number of files.
+        '''
+        digest = hashlib.sha256()
+        for value in extra:
+            digest.update(f"{value}\n".encode())
+        count = 0
+        for pattern in patterns:
+            digest.update(f"[{pattern}]\n".encode())
+            for path in _expand(pattern):
+                digest.update(f"{path.relative_to(repo_dir)} {self.sha256(path)}\n".encode())
+                count += 1
+        return digest.hexdigest(), count
+
+
+def run_stage(stage):
+    '''
+    Runs one stage and returns (ok, output, seconds). Command stages run as a child process with their output
+    captured; function stages return their summary line.
+    '''
+    started = time.time()
+    if "function" in stage:
+        try:
+            return True, stage["function"](*stage.get("args", ())) + "\n", time.time() - started
+        except Exception as e:
+            return False, f"{LIGHT_RED}Glucose-ML{R}: {e}\n", time.time() - started
+    process = subprocess.run(stage["command"], cwd=stage["cwd"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+    return process.returncode == 0, process.stdout, time.time() - started
+
+
+def run_pipeline(stages, jobs=1, force=False):
+    '''
+    Runs the stages in dependency order, up to jobs at the same time. A stage is skipped ("fresh") when the hash
+    of its inputs (and command) matches its last successful run and its outputs are still what that run wrote.
+    Only the stages downstream of a change run again: a stage that reruns but writes the same outputs as before
+    does not make its dependents stale. Stages after a failed stage are not run.
+    Returns {stage name: (status, seconds)} with status "ran", "fresh", "failed" or "blocked".
+    '''
+    try:
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    stage_state = state.get("stages", {})
+    hashes = HashCache(state.get("hashes", {}))
+
+    def save_state():
+        tmp_path = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"stages": stage_state, "hashes": hashes.entries}, f, indent=1)
+        os.replace(tmp_path, STATE_FILE)
+
+    known = {stage["name"] for stage in stages}
+    pending = list(stages)
+    results = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for stage in list(pending):
+                after = [name for name in stage["after"] if name in known]
+                if not all(name in results for name in after):
+                    continue
+                pending.remove(stage)
+                name = stage["name"]
+                if any(results[dependency][0] in ("failed", "blocked") for dependency in after):
+                    results[name] = ("blocked", 0.0)
+                    continue
+                input_hash, _ = hashes.digest(stage["inputs"], extra=stage["signature"])
+                previous = stage_state.get(name, {})
+                if not force and not stage.get("always") and previous.get("inputs") == input_hash:
+                    output_hash, output_count = hashes.digest(stage["outputs"])
+                    if output_count and previous.get("outputs") == output_hash:
+                        results[name] = ("fresh", 0.0)
+                        continue
+                print(f"{LIME_GREEN}Glucose-ML{R}: Running {LIGHT_RED}{name}{R}.")
+                running[pool.submit(run_stage, stage)] = (stage, input_hash)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, input_hash = running.pop(future)
+                ok, output, seconds = future.result()
+                for line in output.splitlines():
+                    print(f"[{stage['name']}] {line}")
+                if ok:
+                    output_hash, _ = hashes.digest(stage["outputs"])
+                    if stage_state.get(stage["name"], {}).get("outputs") == output_hash:
+                        print(f"{YELLOW}Glucose-ML{R}: {stage['name']} wrote the same outputs as last time.")
+                    stage_state[stage["name"]] = {"inputs": input_hash, "outputs": output_hash}
+                    save_state()
+                    results[stage["name"]] = ("ran", seconds)
+                else:
+                    print(f"{LIGHT_RED}Glucose-ML{R}: {stage['name']} failed.")
+                    results[stage["name"]] = ("failed", seconds)
+                sys.stdout.flush()
+    save_state()
+    return results
+
+
+def dry_run_pipeline(stages, force=False):
+    '''
+    Works out which stages run_pipeline would run, without running anything or saving the pipeline state.
+    A stage whose inputs or outputs changed since its last successful run is "stale"; a stage after a stale one
+    is "maybe", since it only runs if that stage writes different outputs; the others are "fresh".
+    Returns {stage name: status}.
+    '''
+    try:
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    stage_state = state.get("stages", {})
+    hashes = HashCache(state.get("hashes", {}))
+
+    known = {stage["name"] for stage in stages}
+    results = {}
+    for stage in stages: # Stages are declared after the stages they depend on (see pipeline_stages).
+        previous = stage_state.get(stage["name"], {})
+        input_hash, _ = hashes.digest(stage["inputs"], extra=stage["signature"])
+        output_hash, output_count = hashes.digest(stage["outputs"])
+        if force or stage.get("always") or previous.get("inputs") != input_hash or not output_count or previous.get("outputs") != output_hash:
+            results[stage["name"]] = "stale"
+        elif any(results[name] != "fresh" for name in stage["after"] if name in known):
+            results[stage["name"]] = "maybe"
+        else:
+            results[stage["name"]] = "fresh"
+    return results
+
+
+def stage_plan(stage):
+    '''
+    Returns what a stage runs, where, and the files it reads and writes, as a JSON-serializable dict.
+    '''
+    return {
+        "name": stage["name"],
+        "command": stage["command"] if "command" in stage else [stage["function"].__name__, *stage.get("args", ())],
+        "cwd": str(stage.get("cwd", repo_dir)),
+        "inputs": stage["inputs"],
+        "outputs": stage["outputs"],
+        "after": stage["after"],
+    }
+
+
+def print_summary(stages, results):
+    '''
+    Prints one status line per stage, in pipeline order.
+    '''
+    print(f"\n{LIME_GREEN}Glucose-ML{R}: Pipeline summary:")
+    colors = {"ran": LIME_GREEN, "fresh": YELLOW, "failed": LIGHT_RED, "blocked": LIGHT_RED}
+    for stage in stages:
+        status, seconds = results[stage["name"]]
+        detail = f" ({seconds:.1f} s)" if status in ("ran", "failed") else ""
+        print(f"  {colors[status]}{status:<7}{R} {stage['name']}{detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the Glucose-ML workflow (download, harmonize, package into 3_Glucose-ML-collection, Figure 3, case study) and only reruns the steps whose inputs changed.")
+    parser.add_argument("datasets", nargs="*", type=str, help="Harmonize script keys of the datasets to (re)harmonize and package (default: every dataset with raw data in Original-Glucose-ML-datasets).")
+    parser.add_argument("--download", action="store_true", help="Also download the datasets, or update them if their hosts report a change.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of independent stages to run at the same time (default: 1).")
+    parser.add_argument("--force", action="store_true", help="Run every stage, even those whose inputs did not change.")
+    parser.add_argument("--list", action="store_true", help="Print the names of the stages that would be declared, then exit.")
+    parser.add_argument("--plan", action="store_true", help="Print one JSON line per stage with its command, working directory, inputs, outputs and the stages it runs after, then exit.")
+    parser.add_argument("--dry-run", action="store_true", help="Print which stages would run (stale), might run (after a stale stage) or are fresh, then exit without running anything.")
+    input_args = parser.parse_args()
+
+    keys = list(load_auto_script("auto-harmonize-CGM-datasets.py").DATASETS)
+    if input_args.datasets:
+        harmonize_keys = list(dict.fromkeys(input_args.datasets))
+        unknown = [key for key in harmonize_keys if key not in keys]
+        if unknown:
+            print(f"{LIGHT_RED}Glucose-ML{R}: Unknown dataset provided: {', '.join(unknown)}")
+            sys.exit(1)
+    else:
+        harmonize_keys = [key for key in keys if input_args.download or raw_folder(key).exists()]
+
+    stages = pipeline_stages(harmonize_keys, download=input_args.download)
+    if input_args.list:
+        for stage in stages:
+            print(stage["name"])
+        sys.exit(0)
+    if input_args.plan:
+        for stage in stages:
+            print(json.dumps(stage_plan(stage)))
+        sys.exit(0)
+    if input_args.dry_run:
+        colors = {"stale": LIGHT_RED, "maybe": YELLOW, "fresh": LIME_GREEN}
+        print(f"{LIME_GREEN}Glucose-ML{R}: Dry run (nothing is run):")
+        for name, status in dry_run_pipeline(stages, force=input_args.force).items():
+            print(f"  {colors[status]}{status:<7}{R} {name}")
+        sys.exit(0)
+
+    results = run_pipeline(stages, jobs=max(1, input_args.jobs), force=input_args.force)
+    print_summary(stages, results)
+    if any(status in ("failed", "blocked") for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
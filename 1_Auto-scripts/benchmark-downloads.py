@@ -0,0 +1,184 @@
+import os
+import io
+import json
+import time
+import zipfile
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+from pathlib import Path
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+BOLD = "\033[1m"
+YELLOW = "\033[93m"
+R = "\033[0m"
+
+# Download modes of auto-download-open-datasets.py: (name, dataset key, extra download_datasets arguments).
+MODES = [
+    ("stream", None, {}),
+    ("stream-unzip", None, {"stream_extract": True}),
+    ("segmented", None, {"segments": 4}),
+    ("remote-extract", None, {"remote_extract": True}),
+    ("per-subject", "physiocgm", {}),
+]
+
+
+def load_test_server():
+    '''
+    Imports download-test-server.py from this folder (loaded by path because of the dashes in its name).
+    '''
+    script_path = Path(__file__).resolve().parent / "download-test-server.py"
+    spec = importlib.util.spec_from_file_location("download_test_server", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scenarios(test_server, rate):
+    '''
+    Returns the fault scenarios as (name, FaultConfig, server stat that counts the injected fault) tuples.
+    Disconnects happen a third of the way into each response, so whole files, segments and zip members are all cut.
+    '''
+    return [
+        ("clean", test_server.FaultConfig(), None),
+        ("202-accepted", test_server.FaultConfig(accepted_202=1), "responses_202"),
+        ("no-length", test_server.FaultConfig(no_length=True), None),
+        ("disconnects", test_server.FaultConfig(disconnect_fraction=1 / 3, max_disconnects=2), "disconnects"),
+        ("disconnects-no-ranges", test_server.FaultConfig(disconnect_fraction=1 / 3, max_disconnects=2, ranges=False), "disconnects"),
+        ("throttled", test_server.FaultConfig(rate=rate), None),
+    ]
+
+
+def verify_extracted(downloader, datasets, key, raw_dir):
+    '''
+    Compares every extracted file in raw_dir with the member of the same name in the archive the test server
+    served, so a fault that corrupts a file is caught. Returns (members compared, members that differ).
+    '''
+    if key == "physiocgm":
+        archives = [(name, raw_dir / name[:-len(".zip")]) for name in datasets.physiocgm_names()]
+    else:
+        archives = [(downloader.DATA_SETS[key][1], raw_dir)]
+    compared, different = 0, 0
+    for name, folder in archives:
+        if not name.lower().endswith(".zip"):
+            continue
+        with zipfile.ZipFile(io.BytesIO(datasets.get(key, name))) as zf:
+            for info in zf.infolist():
+                target = folder / info.filename
+                if info.is_dir() or not target.is_file():
+                    continue
+                compared += 1
+                different += target.read_bytes() != zf.read(info)
+    return compared, different
+
+
+def run_download(downloader, datasets, server, key, download_kwargs, verbose=False):
+    '''
+    Downloads one dataset from the test server into a fresh temporary folder and returns its measurements:
+    wall time, bytes the server sent, whether the download finished, and how many extracted files match the
+    served archive (see verify_extracted). A download whose extracted files do not all match counts as failed.
+    '''
+    server.reset_stats()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        output = io.StringIO()
+        error = None
+        started = time.time()
+        try:
+            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(output):
+                downloader.download_datasets(key, cache_dir=None, **download_kwargs)
+        except Exception as e:
+            error = e
+        seconds = time.time() - started
+        raw_dir = Path(f"Original-Glucose-ML-datasets/{downloader.dataset_library(key)[2]}_raw_data").resolve()
+        compared, different = verify_extracted(downloader, datasets, key, raw_dir)
+        os.chdir(cwd)
+    if error is None and (compared == 0 or different):
+        error = RuntimeError(f"{different} of {compared} extracted files differ from the served archive")
+    return {"seconds": seconds, "error": error, "members_verified": compared - different, **server.stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the download modes of auto-download-open-datasets.py against a local test server with injected faults (see download-test-server.py).")
+    parser.add_argument("--dataset", type=str, default="cgmacros", help="Dataset served for the single-archive modes (default: cgmacros).")
+    parser.add_argument("--scale", type=float, default=0.005, help="Size of the synthetic downloads relative to the real ones (default: 0.005).")
+    parser.add_argument("--rate", type=float, default=4e6, help="Bandwidth of each response in the throttled scenario, in bytes per second (default: 4000000).")
+    parser.add_argument("--modes", nargs="+", default=[mode[0] for mode in MODES], help="Download modes to run (default: all).")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the downloader's output.")
+    input_args = parser.parse_args()
+
+    test_server = load_test_server()
+    downloader = test_server.load_downloader()
+    datasets = test_server.SyntheticDatasets(downloader, scale=input_args.scale)
+    server = test_server.TestServer(datasets).start()
+    test_server.point_downloader_at(downloader, server)
+
+    results = []
+    try:
+        for mode, mode_key, download_kwargs in MODES:
+            if mode not in input_args.modes:
+                continue
+            key = mode_key or input_args.dataset
+            if key == "physiocgm":
+                archive_size = sum(len(datasets.get(key, name)) for name in datasets.physiocgm_names())
+            else:
+                archive_size = len(datasets.get(key, downloader.DATA_SETS[key][1]))
+            clean_seconds = None
+
+            for scenario, faults, injected in scenarios(test_server, input_args.rate):
+                print(f"{LIME_GREEN}Glucose-ML{R}: Benchmarking {BOLD}{mode}{R} ({key}, {archive_size/1e6:.1f} MB) with {BOLD}{scenario}{R}...")
+                server.faults = faults
+                measured = run_download(downloader, datasets, server, key, download_kwargs, verbose=input_args.verbose)
+                if scenario == "clean":
+                    clean_seconds = measured["seconds"]
+                if measured["error"] is not None:
+                    status = f"failed: {measured['error']}"
+                elif injected is not None and measured[injected] == 0:
+                    # The download never met the fault, so the run says nothing about recovering from it.
+                    status = "fault not injected"
+                else:
+                    status = "ok"
+                results.append({
+                    "mode": mode,
+                    "scenario": scenario,
+                    "dataset": key,
+                    "archive_bytes": archive_size,
+                    "status": status,
+                    "seconds": round(measured["seconds"], 3),
+                    "bytes_per_second": round(archive_size / measured["seconds"]) if measured["seconds"] > 0 else None,
+                    # Time lost to the fault, compared with the clean run of the same mode.
+                    "recovery_seconds": round(max(0, measured["seconds"] - clean_seconds), 3) if clean_seconds is not None and scenario != "clean" else 0,
+                    "bytes_refetched": max(0, measured["bytes_sent"] - archive_size),
+                    "requests": measured["requests"],
+                    "responses_202": measured["responses_202"],
+                    "disconnects": measured["disconnects"],
+                    "members_verified": measured["members_verified"],
+                })
+    finally:
+        server.stop()
+
+    print(f"\n{LIME_GREEN}Glucose-ML{R}: Download benchmark results:")
+    print(f"  {'mode':<14} {'scenario':<22} {'MB/s':>8} {'seconds':>8} {'recovery s':>10} {'re-fetched MB':>13} {'requests':>8}  status")
+    for result in results:
+        rate = f"{result['bytes_per_second']/1e6:.2f}" if result["bytes_per_second"] else "-"
+        status = f"{LIME_GREEN}ok{R}" if result["status"] == "ok" else f"{LIGHT_RED}{result['status']}{R}"
+        print(
+            f"  {result['mode']:<14} {result['scenario']:<22} {rate:>8} {result['seconds']:>8.2f} {result['recovery_seconds']:>10.2f} "
+            f"{result['bytes_refetched']/1e6:>13.2f} {result['requests']:>8}  {status}"
+        )
+
+    if any(result["status"] == "fault not injected" for result in results):
+        print(f"{YELLOW}Glucose-ML{R}: Some fault scenarios never injected their fault; their timings are not recovery results.")
+
+    if input_args.json:
+        with open(input_args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Results written to {LIGHT_RED}{input_args.json}{R}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import io
+import json
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+from pathlib import Path
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+BOLD = "\033[1m"
+YELLOW = "\033[93m"
+R = "\033[0m"
+
+
+def load_synthetic_datasets():
+    '''
+    Imports synthetic-raw-datasets.py from this folder (loaded by path because of the dashes in its name).
+    '''
+    script_path = Path(__file__).resolve().parent / "synthetic-raw-datasets.py"
+    spec = importlib.util.spec_from_file_location("synthetic_raw_datasets", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_extractor(key, raw_root, subject_jobs, verbose=False):
+    '''
+    Harmonizes one dataset from raw_root into a fresh temporary folder and returns its report entry (see
+    harmonize_utils.RunReport) plus the memory the process used before the extraction started.
+    Runs in its own worker process, so the peak memory of the report belongs to this extractor alone.
+    '''
+    synthetic = load_synthetic_datasets()
+    harmonizer = synthetic.load_harmonizer()
+    os.environ[harmonizer.SUBJECT_JOBS_ENV] = str(subject_jobs)
+    # Importing the harmonizer's scripts and pandas is not part of the extraction.
+    harmonizer.harmonizer_registry(key)
+    import pandas  # noqa: F401
+    from harmonize_utils import REPORT_NAME, peak_rss_bytes
+    baseline = peak_rss_bytes()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                harmonizer.standardize_datasets(key, raw_root=raw_root)
+            with open(REPORT_NAME) as f:
+                entry = json.loads(f.readlines()[-1])
+        finally:
+            os.chdir(cwd)
+    return entry, baseline
+
+
+def measure(key, raw_root, subject_jobs, verbose=False):
+    '''
+    Runs run_extractor in a new worker process and returns (report entry, baseline memory).
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(run_extractor, key, raw_root, subject_jobs, verbose).result()
+
+
+def main():
+    synthetic = load_synthetic_datasets()
+    parser = argparse.ArgumentParser(description="Benchmarks the extract scripts of the harmonization step on synthetic raw data (see synthetic-raw-datasets.py) of growing size, reporting rows per second and peak memory for each dataset.")
+    parser.add_argument("datasets", nargs="*", type=str, help="Harmonize script keys of the datasets to benchmark (default: all).")
+    parser.add_argument("--subjects", type=int, default=5, help="Subjects per dataset (default: 5).")
+    parser.add_argument("--readings", type=int, nargs="+", default=[500, 2000, 8000], help="CGM readings per subject, one benchmark per size (default: 500 2000 8000).")
+    parser.add_argument("--subject-jobs", type=int, default=1, help="Processes the extract scripts may use for subjects (default: 1, so the results do not depend on the machine's CPUs).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic readings (default: 0).")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the harmonizer's output.")
+    input_args = parser.parse_args()
+
+    keys = list(dict.fromkeys(input_args.datasets)) or list(synthetic.GENERATORS)
+    unknown = [key for key in keys if key not in synthetic.GENERATORS]
+    if unknown:
+        print(f"{LIGHT_RED}Glucose-ML{R}: Unknown dataset provided: {', '.join(unknown)}")
+        raise SystemExit(1)
+
+    harmonizer = synthetic.load_harmonizer()
+    results = []
+    for readings in sorted(set(input_args.readings)):
+        with tempfile.TemporaryDirectory() as raw_root:
+            for key in keys:
+                generated = synthetic.generate_dataset(key, raw_root, input_args.subjects, readings, input_args.seed, harmonizer)
+                print(f"{LIME_GREEN}Glucose-ML{R}: Benchmarking {BOLD}{key}{R} ({input_args.subjects} subjects, {readings} readings each)...")
+                try:
+                    entry, baseline = measure(key, raw_root, input_args.subject_jobs, verbose=input_args.verbose)
+                except Exception as e:
+                    entry, baseline = {"status": f"failed: {e}", "wall_s": 0, "peak_rss_bytes": None, "stages": {}}, None
+                stages = entry["stages"]
+                peak = entry["peak_rss_bytes"]
+                results.append({
+                    "dataset": key,
+                    "subjects": input_args.subjects,
+                    "readings_per_subject": readings,
+                    "status": entry["status"],
+                    "rows_generated": generated,
+                    "rows_written": stages.get("write", {}).get("rows_out", 0),
+                    "bytes_read": stages.get("read", {}).get("bytes_read", 0),
+                    "seconds": entry["wall_s"],
+                    # Raw readings extracted per second, counted from the generated data so every layout is measured the same way.
+                    "rows_per_second": round(generated / entry["wall_s"]) if entry["wall_s"] else None,
+                    "peak_rss_bytes": peak,
+                    # Memory the extraction added on top of the interpreter, pandas and the extract script.
+                    "extraction_rss_bytes": peak - baseline if peak and baseline else None,
+                    "stage_seconds": {name: stage["wall_s"] for name, stage in stages.items()},
+                })
+
+    print(f"\n{LIME_GREEN}Glucose-ML{R}: Harmonizer benchmark results:")
+    print(f"  {'dataset':<18} {'readings':>8} {'rows':>9} {'written':>9} {'raw MB':>7} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'+MB':>6}  status")
+    for result in results:
+        rate = f"{result['rows_per_second']:,}" if result["rows_per_second"] else "-"
+        peak = f"{result['peak_rss_bytes']/1e6:.0f}" if result["peak_rss_bytes"] else "-"
+        extra = f"{result['extraction_rss_bytes']/1e6:.0f}" if result["extraction_rss_bytes"] is not None else "-"
+        status = f"{LIME_GREEN}ok{R}" if result["status"] == "ok" else f"{LIGHT_RED}{result['status']}{R}"
+        print(
+            f"  {result['dataset']:<18} {result['readings_per_subject']:>8} {result['rows_generated']:>9} {result['rows_written']:>9} {result['bytes_read']/1e6:>7.1f} "
+            f"{result['seconds']:>8.2f} {rate:>9} {peak:>8} {extra:>6}  {status}"
+        )
+    if any(result["status"] == "ok" and result["rows_written"] < 0.8 * result["rows_generated"] for result in results):
+        print(f"{YELLOW}Glucose-ML{R}: Some datasets wrote far fewer rows than were generated; run them with --verbose.")
+
+    if input_args.json:
+        with open(input_args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Results written to {LIGHT_RED}{input_args.json}{R}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import io
+import re
+import json
+import time
+import random
+import zlib
+import zipfile
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+BOLD = "\033[1m"
+YELLOW = "\033[93m"
+R = "\033[0m"
+
+# Example archive members for each download key, laid out like the real downloads so the
+# selective-extraction patterns in dataset_options() match them. {i} is the subject number.
+SAMPLE_MEMBERS = {
+    "d1namo": ["diabetes_subset_pictures-glucose-food-insulin/{i:03d}/glucose.csv", "diabetes_subset_pictures-glucose-food-insulin/{i:03d}/food.csv"],
+    "bigideas": ["big-ideas-glycemic-wearable-1.1.2/{i:03d}/Dexcom_{i:03d}.csv", "big-ideas-glycemic-wearable-1.1.2/{i:03d}/ACC_{i:03d}.csv"],
+    "shanghai": ["Shanghai_T1DM/10{i:02d}_0_20210730.xlsx", "Shanghai_T2DM/20{i:02d}_0_20201230.xlsx"],
+    "uchtt1dm": ["UC_HT_T1DM-main/Patient {i}/Glucose.xlsx", "UC_HT_T1DM-main/Patient {i}/Insulin.xlsx"],
+    "hupa-ucm": ["HUPA-UCM Diabetes Dataset/Preprocessed/HUPA{i:04d}P.csv", "HUPA-UCM Diabetes Dataset/Raw_Data/HUPA{i:04d}P/free_style_sensor.csv"],
+    "cgmacros": ["cgmacros-1.0.0/CGMacros_dateshifted365/CGMacros-{i:03d}/CGMacros-{i:03d}.csv", "cgmacros-1.0.0/CGMacros_dateshifted365/CGMacros-{i:03d}/photos.txt"],
+    "t1d-uom": ["ManchesterCSCoordinatedDiabetesStudy/Glucose Data/UoMGlucose{i:04d}.csv", "ManchesterCSCoordinatedDiabetesStudy/Sleep Data/UoMSleep{i:04d}.csv"],
+    "bris-t1d_open": ["T1D_Open/processed_state/{i}.csv", "T1D_Open/raw_state/{i}.csv"],
+    "azt1d": ["AZT1D Diabetes/AZT1D 2025/CGM Records/Subject {i}/Subject {i}.csv", "AZT1D Diabetes/AZT1D 2025/Notes/Subject {i}.txt"],
+    "physiocgm": ["cgm.csv", "ecg.csv"],
+}
+FIGSHARE_ARTICLE_ID = 28136294
+
+
+def load_downloader():
+    '''
+    Imports auto-download-open-datasets.py from this folder (loaded by path because of the dashes in its name).
+    '''
+    script_path = Path(__file__).resolve().parent / "auto-download-open-datasets.py"
+    spec = importlib.util.spec_from_file_location("auto_download_open_datasets", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_csv(rnd, rows):
+    '''
+    Returns CGM-like CSV text (timestamp, glucose) with `rows` readings 5 minutes apart.
+    '''
+    start = 1_600_000_000
+    lines = ["timestamp,glucose_value_mg_dl"]
+    for row in range(rows):
+        lines.append(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + row * 300))},{rnd.randint(40, 400)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def synthetic_zip(members, target_size, seed):
+    '''
+    Builds a zip archive holding the given member names (filled with synthetic CGM readings) plus an
+    incompressible filler member that brings the archive to about target_size bytes.
+    '''
+    rnd = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in members:
+            zf.writestr(name, synthetic_csv(rnd, 2000))
+        filler = max(0, target_size - buffer.tell() - 200)
+        if filler:
+            zf.writestr("filler/filler.bin", rnd.randbytes(filler), compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
+
+
+class SyntheticDatasets:
+    '''
+    Synthetic stand-ins for every dataset_library entry, built on first use and kept in memory.
+    Each download is scaled to `scale` times the real download size (at least min_size bytes) and holds
+    `subjects` subjects. PhysioCGM is served as one zip per subject plus a Figshare-style file list.
+    '''
+
+    def __init__(self, downloader, scale=0.001, subjects=4, min_size=256 * 1024):
+        self.downloader = downloader
+        self.scale = scale
+        self.subjects = subjects
+        self.min_size = min_size
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def size_of(self, key):
+        return max(self.min_size, int(self.downloader.DATA_SETS[key][4] * self.scale))
+
+    def physiocgm_names(self):
+        return [f"c1s{i:02d}_raw.zip" for i in range(1, self.subjects + 1)]
+
+    def get(self, key, name):
+        '''
+        Returns the bytes served at /<key>/<name>, or None if there is no such file.
+        '''
+        with self.lock:
+            if (key, name) in self.files:
+                return self.files[(key, name)]
+            data = None
+            if key == "physiocgm" and name in self.physiocgm_names():
+                data = synthetic_zip(SAMPLE_MEMBERS[key], self.size_of(key) // self.subjects, seed=name)
+            elif key in self.downloader.DATA_SETS and name == self.downloader.DATA_SETS[key][1]:
+                if name.lower().endswith(".zip"):
+                    members = [member.format(i=i) for i in range(1, self.subjects + 1) for member in SAMPLE_MEMBERS[key]]
+                    data = synthetic_zip(members, self.size_of(key), seed=key)
+                else:
+                    data = synthetic_csv(random.Random(key), max(1, self.size_of(key) // 26))
+            if data is not None:
+                self.files[(key, name)] = data
+            return data
+
+
+class FaultConfig:
+    '''
+    Faults injected by the test server. All of them apply to every download response:
+      - accepted_202: answer each path with this many "202 Accepted" responses before serving it,
+      - no_length: send no Content-Length (the body ends when the connection closes),
+      - disconnect_after / max_disconnects: close the connection after this many body bytes, up to
+        max_disconnects times in total,
+      - disconnect_fraction: like disconnect_after, but cut each response after this fraction of its own body,
+        so short range responses (segments, zip members) are cut as well as whole files,
+      - rate: throttle each response to this many bytes per second,
+      - ranges: honour "Range: bytes=N-M" requests (206 responses) or ignore them (full 200 responses).
+        A range sent with an If-Range header that does not name the current ETag (a CRC-32 of the contents) gets the whole file.
+    '''
+
+    def __init__(self, accepted_202=0, no_length=False, disconnect_after=None, max_disconnects=3, rate=None, ranges=True, disconnect_fraction=None):
+        self.accepted_202 = accepted_202
+        self.no_length = no_length
+        self.disconnect_after = disconnect_after
+        self.disconnect_fraction = disconnect_fraction
+        self.max_disconnects = max_disconnects
+        self.rate = rate
+        self.ranges = ranges
+
+
+class TestServer:
+    '''
+    Local HTTP stand-in for the dataset hosts, running in a background thread.
+    Routes:
+      - /<key>/<output file>: a dataset download (see SyntheticDatasets),
+      - /physiocgm/<subject>_raw.zip: a PhysioCGM subject zip,
+      - /figshare/v2/articles/<id>: the Figshare article JSON listing the PhysioCGM subject zips.
+    Counts requests and body bytes sent so benchmarks can measure re-fetched bytes.
+    '''
+
+    def __init__(self, datasets, faults=None, host="127.0.0.1", port=0):
+        self.datasets = datasets
+        self.faults = faults or FaultConfig()
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"requests": 0, "bytes_sent": 0, "responses_202": 0, "disconnects": 0}
+            self.accepted_counts = {}
+
+    def count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def dataset_urls(self):
+        '''
+        Returns {key: download URL on this server} for every dataset_library entry.
+        '''
+        return {key: f"{self.url}/{key}/{entry[1]}" for key, entry in self.datasets.downloader.DATA_SETS.items()}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.handle_request(send_body=False)
+
+            def do_GET(self):
+                self.handle_request(send_body=True)
+
+            def handle_request(self, send_body):
+                server.count("requests")
+                path = urlparse(self.path).path
+                faults = server.faults
+
+                if path == f"/figshare/v2/articles/{FIGSHARE_ARTICLE_ID}":
+                    files = [
+                        {"name": name, "download_url": f"{server.url}/physiocgm/{name}", "size": len(server.datasets.get("physiocgm", name))}
+                        for name in server.datasets.physiocgm_names()
+                    ]
+                    body = json.dumps({"id": FIGSHARE_ARTICLE_ID, "files": files}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                parts = path.strip("/").split("/", 1)
+                data = server.datasets.get(parts[0], parts[1]) if len(parts) == 2 else None
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                with server.stats_lock:
+                    accepted = server.accepted_counts.get(path, 0)
+                    if accepted < faults.accepted_202:
+                        server.accepted_counts[path] = accepted + 1
+                        server.stats["responses_202"] += 1
+                if accepted < faults.accepted_202:
+                    self.send_response(202)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                start, end, status = 0, len(data) - 1, 200
+                etag = f"\"{parts[0]}-{zlib.crc32(data):08x}\""
+                match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+                # A range is only served from the version If-Range names; a changed file is sent whole.
+                if_range = self.headers.get("If-Range")
+                if match and faults.ranges and if_range in (None, etag):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), len(data) - 1) if match.group(2) else len(data) - 1
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    status = 206
+                body = data[start:end + 1]
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/zip" if parts[1].endswith(".zip") else "text/csv")
+                self.send_header("ETag", etag)
+                if faults.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                if not faults.no_length:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.send_body(body)
+
+            def send_body(self, body):
+                faults = server.faults
+                limit = len(body)
+                cut = faults.disconnect_after
+                if faults.disconnect_fraction is not None:
+                    # Bodies too short to cut (such as a 1-byte probe) are sent whole.
+                    cut = int(len(body) * faults.disconnect_fraction) or None
+                with server.stats_lock:
+                    if cut is not None and server.stats["disconnects"] < faults.max_disconnects and len(body) > cut:
+                        limit = cut
+                        server.stats["disconnects"] += 1
+
+                block = 64 * 1024
+                started = time.time()
+                sent = 0
+                try:
+                    while sent < limit:
+                        chunk = body[sent:min(limit, sent + block)]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        server.count("bytes_sent", len(chunk))
+                        if faults.rate:
+                            # Sleep until this many bytes are due at the throttled rate.
+                            delay = sent / faults.rate - (time.time() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def point_downloader_at(downloader, server):
+    '''
+    Points a loaded downloader module at the test server: every dataset URL and the Figshare API.
+    '''
+    for key, url in server.dataset_urls().items():
+        downloader.DATA_SETS[key][0] = url
+    downloader.FIGSHARE_API = f"{server.url}/figshare/v2"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP stand-in for the dataset hosts used by auto-download-open-datasets.py. Serves synthetic archives shaped like each download, with optional injected faults.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000).")
+    parser.add_argument("--scale", type=float, default=0.001, help="Size of each synthetic download relative to the real one (default: 0.001).")
+    parser.add_argument("--subjects", type=int, default=4, help="Subjects per synthetic dataset (default: 4).")
+    parser.add_argument("--accepted-202", type=int, default=0, help="Answer each file with this many '202 Accepted' responses first.")
+    parser.add_argument("--no-length", action="store_true", help="Do not send Content-Length headers.")
+    parser.add_argument("--disconnect-after", type=int, default=None, help="Close connections after this many body bytes.")
+    parser.add_argument("--disconnect-fraction", type=float, default=None, help="Close connections after this fraction of each response's body.")
+    parser.add_argument("--max-disconnects", type=int, default=3, help="Maximum number of injected disconnects (default: 3).")
+    parser.add_argument("--rate", type=float, default=None, help="Throttle each response to this many bytes per second.")
+    parser.add_argument("--no-ranges", action="store_true", help="Ignore Range requests.")
+    input_args = parser.parse_args()
+
+    datasets = SyntheticDatasets(load_downloader(), scale=input_args.scale, subjects=input_args.subjects)
+    faults = FaultConfig(
+        accepted_202=input_args.accepted_202, no_length=input_args.no_length, disconnect_after=input_args.disconnect_after,
+        max_disconnects=input_args.max_disconnects, rate=input_args.rate, ranges=not input_args.no_ranges,
+        disconnect_fraction=input_args.disconnect_fraction,
+    )
+    server = TestServer(datasets, faults, port=input_args.port)
+    print(f"{LIME_GREEN}Glucose-ML{R}: Test server listening on {BOLD}{server.url}{R}")
+    for key, url in server.dataset_urls().items():
+        print(f"  {key}: {url}")
+    print(f"  Figshare API: {server.url}/figshare/v2/articles/{FIGSHARE_ARTICLE_ID}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{LIGHT_RED}Glucose-ML{R}: Stopping test server.")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
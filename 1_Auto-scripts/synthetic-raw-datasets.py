@@ -0,0 +1,449 @@
+import os
+import csv
+import json
+import math
+import random
+import argparse
+import importlib.util
+from pathlib import Path
+from datetime import datetime, timedelta
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+BOLD = "\033[1m"
+R = "\033[0m"
+
+# Synthetic readings start here and are 5 minutes apart (15 minutes for the FreeStyle Libre datasets).
+START = datetime(2021, 3, 1)
+SAS_EPOCH = datetime(1960, 1, 1)
+
+
+def load_harmonizer():
+    '''
+    Imports auto-harmonize-CGM-datasets.py from this folder (loaded by path because of the dashes in its name).
+    '''
+    script_path = Path(__file__).resolve().parent / "auto-harmonize-CGM-datasets.py"
+    spec = importlib.util.spec_from_file_location("auto_harmonize_CGM_datasets", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def cgm_trace(rnd, readings, missing=0.01):
+    '''
+    Returns `readings` CGM-like glucose values in mg/dL: a random walk around a daily rhythm, kept between 40 and 400
+    mg/dL, with about `missing` of the readings left empty (None) as in sensor exports.
+    '''
+    values = []
+    baseline = rnd.uniform(100, 170)
+    glucose = baseline
+    for reading in range(readings):
+        target = baseline + 35 * math.sin(2 * math.pi * reading / 288)
+        glucose = min(400.0, max(40.0, glucose + 0.1 * (target - glucose) + rnd.gauss(0, 5)))
+        values.append(None if rnd.random() < missing else round(glucose))
+    return values
+
+
+def reading_times(readings, minutes=5, start=START):
+    return [start + timedelta(minutes=minutes * reading) for reading in range(readings)]
+
+
+def mmol(value):
+    return None if value is None else round(value / 18, 1)
+
+
+def write_csv(path, header, rows, delimiter=","):
+    '''
+    Writes rows under header to path (creating its folders). None is written as an empty field.
+    '''
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def write_excel(path, columns, sheet_name="Sheet1", index=None):
+    '''
+    Writes columns (a dict of lists) to an Excel sheet at path, with index as the first, unnamed column if given.
+    '''
+    import pandas as pd
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(columns, index=index).to_excel(path, sheet_name=sheet_name, index=index is not None)
+
+
+def dexcom_export(path, rnd, readings, subject, milliseconds=False):
+    '''
+    Writes a Dexcom Clarity export: a few header rows (patient and device details, no timestamp) followed by one
+    EGV row per reading. With milliseconds, the timestamps carry the fractions of a second the receiver logs.
+    '''
+    header = ["Index", "Timestamp (YYYY-MM-DDThh:mm:ss)", "Event Type", "Event Subtype", "Patient Info", "Device Info",
+              "Source Device ID", "Glucose Value (mg/dL)", "Insulin Value (u)", "Carb Value (grams)", "Duration (hh:mm:ss)",
+              "Glucose Rate of Change (mg/dL/min)", "Transmitter Time (Long Integer)"]
+    rows = [
+        [1, "", "FirstName", "", subject, "", "", "", "", "", "", "", ""],
+        [2, "", "LastName", "", subject, "", "", "", "", "", "", "", ""],
+        [3, "", "Device", "", "", "G6 Mobile App", "Android G6", "", "", "", "", "", ""],
+    ]
+    time_format = "%Y-%m-%d %H:%M:%S.%f" if milliseconds else "%Y-%m-%d %H:%M:%S"
+    for reading, (timestamp, glucose) in enumerate(zip(reading_times(readings), cgm_trace(rnd, readings))):
+        if milliseconds:
+            timestamp += timedelta(milliseconds=rnd.randint(0, 999))
+        rows.append([reading + 4, timestamp.strftime(time_format), "EGV", "", "", "", "Android G6", glucose, "", "", "", "", 7_000_000 + reading * 300])
+    write_csv(path, header, rows)
+    return readings
+
+
+# Generators of each dataset's raw layout, by harmonize script key (see auto-harmonize-CGM-datasets.py DATASETS).
+# Each one writes `subjects` subjects of about `readings` CGM readings into raw_data_path (the folder
+# harmonize_paths() points the dataset's extract script at) and returns the number of readings written.
+
+def hall_2018(raw_data_path, subjects, readings, rnd):
+    '''
+    One tab-separated table of all subjects (pbio.2005143.s010, the paper's supplementary file S10).
+    '''
+    rows = []
+    for subject in range(1, subjects + 1):
+        subject_id = f"1636-69-{subject:03d}"
+        rows += [[subject_id, timestamp.strftime("%Y-%m-%d %H:%M:%S"), glucose] for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+    write_csv(raw_data_path / "pbio.2005143.s010", ["subjectId", "DisplayTime", "GlucoseValue"], rows, delimiter="\t")
+    return len(rows)
+
+
+def d1namo(raw_data_path, subjects, readings, rnd):
+    '''
+    A glucose.csv (mmol/L) per subject folder. Most times are logged without seconds, and some rows are
+    manual finger-stick readings.
+    '''
+    for subject in range(1, subjects + 1):
+        rows = []
+        for reading, (timestamp, glucose) in enumerate(zip(reading_times(readings), cgm_trace(rnd, readings))):
+            time_of_day = timestamp.strftime("%H:%M:%S" if reading % 11 == 0 else "%H:%M")
+            rows.append([timestamp.strftime("%Y-%m-%d"), time_of_day, mmol(glucose), "manual" if reading % 13 == 0 else "cgm", ""])
+        write_csv(raw_data_path / "diabetes_subset_pictures-glucose-food-insulin" / f"{subject:03d}" / "glucose.csv", ["date", "time", "glucose", "type", "comments"], rows)
+    return subjects * readings
+
+
+def colas_2019(raw_data_path, subjects, readings, rnd):
+    '''
+    A CSV per subject ("case  <n>.csv") whose readings only have a time of day.
+    '''
+    for subject in range(1, subjects + 1):
+        offset = timedelta(seconds=rnd.randint(0, 59))
+        rows = [[(timestamp + offset).strftime("%H:%M:%S"), glucose] for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+        write_csv(raw_data_path / f"case  {subject}.csv", ["hora", "glucemia"], rows)
+    return subjects * readings
+
+
+def ohiot1dm(raw_data_path, subjects, readings, rnd):
+    '''
+    An XML file per patient and split (<id>-ws-training.xml / <id>-ws-testing.xml) in the 2018 and 2020 folders, with
+    the readings as glucose_level/event nodes next to other event lists. The last 20% of the readings are the test split.
+    '''
+    count = 0
+    for subject in range(1, subjects + 1):
+        patient_id = 539 + subject * 4
+        year = "2018" if subject <= (subjects + 1) // 2 else "2020"
+        events = [(timestamp, glucose) for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings)) if glucose is not None]
+        split = int(len(events) * 0.8)
+        for name, part in (("training", events[:split]), ("testing", events[split:])):
+            glucose_level = "".join(f'\n\t\t<event ts="{timestamp.strftime("%d-%m-%Y %H:%M:%S")}" value="{glucose}"/>' for timestamp, glucose in part)
+            finger_stick = "".join(f'\n\t\t<event ts="{timestamp.strftime("%d-%m-%Y %H:%M:%S")}" value="{glucose}"/>' for timestamp, glucose in part[::48])
+            path = raw_data_path / "OhioT1DM" / year / name.replace("ing", "") / f"{patient_id}-ws-{name}.xml"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                f'<patient id="{patient_id}" weight="99" insulin_type="Humalog">\n'
+                f'\t<glucose_level>{glucose_level}\n\t</glucose_level>\n'
+                f'\t<finger_stick>{finger_stick}\n\t</finger_stick>\n'
+                f'\t<basal>\n\t</basal>\n</patient>\n'
+            )
+            count += len(part)
+    return count
+
+
+def _lb_rows(rnd, subjects, readings):
+    '''
+    Returns the rows of a T1DEXI-style LB (laboratory) table: the CGM glucose readings of each subject, plus an
+    HbA1c result per subject that the extract scripts must drop. Subject IDs are integers, not in order.
+    '''
+    subject_ids = rnd.sample(range(1, subjects * 10 + 1), subjects)
+    rows = []
+    for subject_id in subject_ids:
+        rows.append((subject_id, "HBA1C", "Hemoglobin A1C", START, round(rnd.uniform(5.5, 9.0), 1), "%"))
+        rows += [(subject_id, "GLUC", "Glucose", timestamp, glucose, "mg/dL") for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+    return rows
+
+
+LB_HEADER = ["STUDYID", "DOMAIN", "USUBJID", "LBSEQ", "LBTESTCD", "LBTEST", "LBCAT", "LBORRES", "LBORRESU", "LBDTC"]
+
+
+def t1dexi(raw_data_path, subjects, readings, rnd):
+    '''
+    T1DEXI/LB.csv: the laboratory table of all subjects (USUBJID, LBTESTCD, LBDTC, LBORRES, ...) with ISO timestamps.
+    '''
+    rows = [
+        ["T1DEXI", "LB", subject_id, seq, test_code, test, "CGM" if test_code == "GLUC" else "", "" if value is None else float(value), unit, timestamp.strftime("%Y-%m-%dT%H:%M:%S")]
+        for seq, (subject_id, test_code, test, timestamp, value, unit) in enumerate(_lb_rows(rnd, subjects, readings), 1)
+    ]
+    write_csv(raw_data_path / "T1DEXI" / "LB.csv", LB_HEADER, rows)
+    return subjects * readings
+
+
+def t1dexip(raw_data_path, subjects, readings, rnd):
+    '''
+    T1DEXIP/LB.csv: the same table converted from SAS, so text values are Python byte strings (b'...') and the
+    timestamps are SAS datetimes (seconds since 1960-01-01).
+    '''
+    rows = [
+        ["b'T1DEXIP'", "b'LB'", f"b'{subject_id}'", seq, f"b'{test_code}'", f"b'{test}'", "b'CGM'" if test_code == "GLUC" else "b''",
+         "" if value is None else float(value), f"b'{unit}'", int((timestamp - SAS_EPOCH).total_seconds())]
+        for seq, (subject_id, test_code, test, timestamp, value, unit) in enumerate(_lb_rows(rnd, subjects, readings), 1)
+    ]
+    write_csv(raw_data_path / "T1DEXIP" / "LB.csv", LB_HEADER, rows)
+    return subjects * readings
+
+
+def bigideas(raw_data_path, subjects, readings, rnd):
+    '''
+    A Dexcom export (Dexcom_<id>.csv) per subject folder.
+    '''
+    for subject in range(1, subjects + 1):
+        dexcom_export(raw_data_path / "big-ideas-glycemic-wearable-1.1.2" / f"{subject:03d}" / f"Dexcom_{subject:03d}.csv", rnd, readings, f"{subject:03d}")
+    return subjects * readings
+
+
+def diatrend(raw_data_path, subjects, readings, rnd):
+    '''
+    An Excel file per subject (Subject<n>.xlsx) whose datetimes carry fractions of a second.
+    '''
+    for subject in range(1, subjects + 1):
+        dates = [timestamp + timedelta(milliseconds=rnd.randint(0, 999)) for timestamp in reading_times(readings)]
+        write_excel(raw_data_path / f"Subject{subject}.xlsx", {"date": dates, "mg/dl": cgm_trace(rnd, readings)})
+    return subjects * readings
+
+
+def _shanghai(raw_data_path, subjects, readings, rnd, first_id, date, t1dm):
+    '''
+    Excel files named <subject>_<number>_<date>.xlsx with FreeStyle Libre H readings every 15 minutes. Every third
+    subject's readings are split over two files. T1DM files name their sheet after the file; one T2DM subject names
+    its glucose column "CGM ".
+    '''
+    for subject in range(subjects):
+        subject_id = first_id + subject
+        timestamps, glucose = reading_times(readings, minutes=15), cgm_trace(rnd, readings)
+        parts = [(0, readings // 2), (1, readings)] if subject % 3 == 2 else [(0, readings)]
+        start = 0
+        for number, end in parts:
+            name = f"{subject_id}_{number}_{date}"
+            glucose_column = "CGM " if not t1dm and subject == 1 else "CGM (mg / dl)"
+            write_excel(raw_data_path / f"{name}.xlsx", {
+                "Date": timestamps[start:end],
+                glucose_column: glucose[start:end],
+                "CBG (mg / dl)": [None] * (end - start),
+                "Dietary intake": [None] * (end - start),
+            }, sheet_name=name if t1dm else "Sheet1")
+            start = end
+    return subjects * readings
+
+
+def shanghait1dm(raw_data_path, subjects, readings, rnd):
+    return _shanghai(raw_data_path, subjects, readings, rnd, 1001, "20210730", t1dm=True)
+
+
+def shanghait2dm(raw_data_path, subjects, readings, rnd):
+    return _shanghai(raw_data_path, subjects, readings, rnd, 2000, "20201230", t1dm=False)
+
+
+def t1diabetesgranada(raw_data_path, subjects, readings, rnd):
+    '''
+    Glucose_measurements.csv: one table of all patients with FreeStyle Libre readings every 15 minutes, the date and
+    time of each in their own columns.
+    '''
+    rows = []
+    for subject in range(subjects):
+        rows += [[f"LIB{193263 + subject}", timestamp.strftime("%Y-%m-%d"), timestamp.strftime("%H:%M:%S"), glucose]
+                 for timestamp, glucose in zip(reading_times(readings, minutes=15), cgm_trace(rnd, readings))]
+    write_csv(raw_data_path / "Glucose_measurements.csv", ["Patient_ID", "Measurement_date", "Measurement_time", "Measurement"], rows)
+    return len(rows)
+
+
+def ai_readi(raw_data_path, subjects, readings, rnd):
+    '''
+    An Open mHealth JSON file (<id>_DEX.json) per participant folder, with the readings under body.cgm. Readings
+    outside the sensor's range are "Low" / "High" instead of a number.
+    '''
+    for subject in range(subjects):
+        participant_id = str(1001 + subject)
+        cgm = []
+        for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings)):
+            value = "Low" if glucose == 40 else "High" if glucose == 400 else glucose
+            cgm.append({
+                "header": {"uuid": f"{participant_id}-{len(cgm)}"},
+                "effective_time_frame": {"time_interval": {
+                    "start_date_time": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "end_date_time": (timestamp + timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }},
+                "event_type": "EGV",
+                "source_device_id": "DXCM",
+                "blood_glucose": {"value": value, "unit": "mg/dL"},
+                "transmitter_time": {"value": 7_000_000 + len(cgm) * 300, "unit": "s"},
+            })
+        path = raw_data_path / "wearable_blood_glucose" / "continuous_glucose_monitoring" / "dexcom_g6" / participant_id / f"{participant_id}_DEX.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"header": {"patient_id": participant_id, "schema_id": {"name": "omh:blood-glucose"}}, "body": {"cgm": cgm}}))
+    return subjects * readings
+
+
+def uchtt1dm(raw_data_path, subjects, readings, rnd):
+    '''
+    A Glucose.xlsx per subject folder, with the timestamps in the first, unnamed column.
+    '''
+    for subject in range(1, subjects + 1):
+        write_excel(raw_data_path / "UC_HT_T1DM-main" / f"HT_{subject:02d}" / "Glucose.xlsx", {"Value (mg/dl)": cgm_trace(rnd, readings)}, index=reading_times(readings))
+    return subjects * readings
+
+
+def hupa_ucm(raw_data_path, subjects, readings, rnd):
+    '''
+    A semicolon-separated CSV per patient in the Preprocessed folder, with the other signals next to the glucose.
+    '''
+    for subject in range(1, subjects + 1):
+        rows = [[timestamp.strftime("%Y-%m-%dT%H:%M:%S"), glucose, round(rnd.uniform(5, 40), 4), rnd.randint(60, 120), rnd.randint(0, 300), 0.0125, 0.0, 0.0]
+                for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+        write_csv(raw_data_path / "HUPA-UCM Diabetes Dataset" / "Preprocessed" / f"HUPA{subject:04d}P.csv",
+                  ["time", "glucose", "calories", "heart_rate", "steps", "basal_rate", "bolus_volume_delivered", "carb_input"], rows, delimiter=";")
+    return subjects * readings
+
+
+def cgmacros(raw_data_path, subjects, readings, rnd):
+    '''
+    A CSV per participant folder with one row per minute holding both the Libre and the Dexcom readings (the Dexcom
+    starts a little later), heart rate and meal columns. Used by both cgmacros_dexcom and cgmacros_libre.
+    '''
+    for subject in range(1, subjects + 1):
+        libre, dexcom = cgm_trace(rnd, readings), cgm_trace(rnd, readings)
+        rows = [[timestamp.strftime("%Y-%m-%d %H:%M:%S"), libre[minute], None if minute < 30 else dexcom[minute], rnd.randint(60, 110), round(rnd.uniform(1, 3), 2), "", "", ""]
+                for minute, timestamp in enumerate(reading_times(readings, minutes=1))]
+        write_csv(raw_data_path / "cgmacros-1.0.0" / "CGMacros_dateshifted365" / f"CGMacros-{subject:03d}" / f"CGMacros-{subject:03d}.csv",
+                  ["Timestamp", "Libre GL", "Dexcom GL", "HR", "METs", "Meal Type", "Calories", "Image path"], rows)
+    return subjects * readings
+
+
+def t1d_uom(raw_data_path, subjects, readings, rnd):
+    '''
+    A CSV per participant in the "Glucose Data" folder, with day-first timestamps and mmol/L readings.
+    '''
+    for subject in range(subjects):
+        rows = [[timestamp.strftime("%d/%m/%Y %H:%M"), mmol(glucose)] for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+        write_csv(raw_data_path / "ManchesterCSCoordinatedDiabetesStudy" / "Glucose Data" / f"UoMGlucose{2301 + subject}.csv", ["bg_ts", "value"], rows)
+    return subjects * readings
+
+
+def bris_t1d_open(raw_data_path, subjects, readings, rnd):
+    '''
+    A CSV per participant in the processed_state folder, with mmol/L readings next to insulin, carbs and activity.
+    '''
+    for subject in range(1, subjects + 1):
+        rows = [[timestamp.strftime("%Y-%m-%d %H:%M:%S"), mmol(glucose), "", "", rnd.randint(60, 120), rnd.randint(0, 300)]
+                for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+        write_csv(raw_data_path / "T1D_Open" / "processed_state" / f"P{subject:02d}.csv", ["timestamp", "bg", "insulin", "carbs", "hr", "steps"], rows)
+    return subjects * readings
+
+
+def azt1d(raw_data_path, subjects, readings, rnd):
+    '''
+    A CSV per subject folder exported from the insulin pump, with pump events next to the readings. Some subjects
+    name the glucose column "Readings (CGM / BGM)" instead of "CGM".
+    '''
+    for subject in range(1, subjects + 1):
+        glucose_column = "Readings (CGM / BGM)" if subject % 4 == 0 else "CGM"
+        rows = [[timestamp.strftime("%Y-%m-%d %H:%M:%S"), "AutoMode", "", 0.8, "", "", "", "", glucose]
+                for timestamp, glucose in zip(reading_times(readings), cgm_trace(rnd, readings))]
+        write_csv(raw_data_path / "AZT1D Diabetes" / "AZT1D 2025" / "CGM Records" / f"Subject {subject}" / f"Subject {subject}.csv",
+                  ["EventDateTime", "DeviceMode", "BolusType", "Basal", "CorrectionDelivered", "TotalBolusInsulinDelivered", "FoodDelivered", "CarbSize", glucose_column], rows)
+    return subjects * readings
+
+
+def park_2025(raw_data_path, subjects, readings, rnd):
+    '''
+    One CSV of all subjects whose timestamps are minutes since the start of the study (negative before it).
+    '''
+    rows = []
+    for subject in range(1, subjects + 1):
+        rows += [[f"XB{subject}", (reading - 5) * 5, None if glucose is None else glucose + round(rnd.random(), 6), rnd.randint(0, 1)]
+                 for reading, glucose in enumerate(cgm_trace(rnd, readings))]
+    write_csv(raw_data_path / "cgm_data.csv", ["subject", "mins_since_start", "glucose", "meal"], rows)
+    return len(rows)
+
+
+def physiocgm(raw_data_path, subjects, readings, rnd):
+    '''
+    A Dexcom export (cgm.csv) in each subject's c<n>s<nn>_raw folder, with fractions of a second in the timestamps.
+    '''
+    for subject in range(1, subjects + 1):
+        dexcom_export(raw_data_path / f"c1s{subject:02d}_raw" / "cgm.csv", rnd, readings, f"c1s{subject:02d}", milliseconds=True)
+    return subjects * readings
+
+
+GENERATORS = {
+    "hall_2018": hall_2018,
+    "d1namo": d1namo,
+    "colas_2019": colas_2019,
+    "ohiot1dm": ohiot1dm,
+    "t1dexi": t1dexi,
+    "t1dexip": t1dexip,
+    "bigideas": bigideas,
+    "diatrend": diatrend,
+    "shanghait1dm": shanghait1dm,
+    "shanghait2dm": shanghait2dm,
+    "t1diabetesgranada": t1diabetesgranada,
+    "ai-readi": ai_readi,
+    "uchtt1dm": uchtt1dm,
+    "hupa-ucm": hupa_ucm,
+    "cgmacros_dexcom": cgmacros,
+    "cgmacros_libre": cgmacros,
+    "t1d-uom": t1d_uom,
+    "bris-t1d_open": bris_t1d_open,
+    "azt1d": azt1d,
+    "park_2025": park_2025,
+    "physiocgm": physiocgm,
+}
+
+
+def generate_dataset(key, raw_root, subjects=10, readings=2000, seed=0, harmonizer=None):
+    '''
+    Writes synthetic raw data for a dataset under raw_root (laid out like Original-Glucose-ML-datasets), where
+    auto-harmonize-CGM-datasets.py looks for it. The same key, sizes and seed always give the same files.
+    Returns the number of CGM readings written.
+    '''
+    harmonizer = harmonizer or load_harmonizer()
+    _, raw_data_path = harmonizer.harmonize_paths(key, raw_root)
+    return GENERATORS[key](Path(raw_data_path), subjects, readings, random.Random(f"{key}-{seed}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes synthetic raw data in the layout of each Glucose-ML dataset (file names, folders, formats and columns), so the harmonization scripts can be tested and benchmarked without the real downloads.")
+    parser.add_argument("datasets", nargs="*", type=str, help="Harmonize script keys of the datasets to generate (default: all).")
+    parser.add_argument("--output", type=str, default="Synthetic-Glucose-ML-datasets", help="Folder to write the raw data to, laid out like Original-Glucose-ML-datasets (default: Synthetic-Glucose-ML-datasets).")
+    parser.add_argument("--subjects", type=int, default=10, help="Subjects per dataset (default: 10).")
+    parser.add_argument("--readings", type=int, default=2000, help="CGM readings per subject (default: 2000, about a week of 5-minute readings).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random readings (default: 0).")
+    input_args = parser.parse_args()
+
+    keys = list(dict.fromkeys(input_args.datasets)) or list(GENERATORS)
+    unknown = [key for key in keys if key not in GENERATORS]
+    if unknown:
+        print(f"{LIGHT_RED}Glucose-ML{R}: Unknown dataset provided: {', '.join(unknown)}")
+        raise SystemExit(1)
+    if input_args.subjects < 1 or input_args.readings < 1:
+        parser.error("--subjects and --readings must be at least 1.")
+
+    harmonizer = load_harmonizer()
+    os.makedirs(input_args.output, exist_ok=True)
+    for key in keys:
+        count = generate_dataset(key, input_args.output, input_args.subjects, input_args.readings, input_args.seed, harmonizer)
+        print(f"{LIME_GREEN}Glucose-ML{R}: Wrote {LIGHT_RED}{count}{R} synthetic readings for {BOLD}{key}{R}.")
+
+
+if __name__ == "__main__":
+    main()
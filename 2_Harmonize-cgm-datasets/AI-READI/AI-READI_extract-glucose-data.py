@@ -1,59 +1,45 @@
-import pandas as pd
 import sys
-import os
-import json
 from pathlib import Path
+import json
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
-
-def clean_aireadi_data(json_path, subject_id, dst):
-    """
-    Processes AI-READI JSON data files and extracts blood glucose measurements.
-    
-    This function reads JSON files from the AI-READI dataset, extracts the continuous glucose 
-    monitoring (CGM) data, normalizes it into a pandas DataFrame, selects relevant columns,
-    and saves the processed data as CSV files.
-    
-    Args:
-        root (str): Path to the root directory containing subject folders with JSON files
-        dst (str): Path to destination directory where processed CSV files will be saved
-    
-    Returns:
-        None: The function saves CSV files to the specified destination directory
-    """
-    dst = Path(dst)
-    dst.mkdir(parents=True, exist_ok=True)
-
-    with open(json_path, "r") as f:
-        data = json.load(f)
-
-    cgm_data = data["body"]["cgm"]
-
-    df = pd.json_normalize(cgm_data)
-
-
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df = df[
-        [
-            "effective_time_frame.time_interval.start_date_time",
-            "blood_glucose.value",
-        ]
-    ].rename(
-        columns={
-            "effective_time_frame.time_interval.start_date_time": "timestamp",
-            "blood_glucose.value": "glucose_value_mg_dl",
-        }
-    )
-
-
-    df["timestamp"] = (pd.to_datetime(df["timestamp"], format="%Y-%m-%dT%H:%M:%SZ").dt.strftime("%Y-%m-%d %H:%M:%S"))
-
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
+
+
+def read_cgm_json(f, raw_file):
+    '''
+    Plug-in reader of the AI-READI JSON files (see SPEC): returns one row per CGM reading, holding its start time and
+    blood glucose value under their JSON paths. Only these two fields are taken from each reading, instead of
+    flattening every field of the file with pd.json_normalize.
+    '''
+    import pandas as pd
+    cgm_data = json.load(f)["body"]["cgm"]
+    return pd.DataFrame({
+        "effective_time_frame.time_interval.start_date_time": [reading.get("effective_time_frame", {}).get("time_interval", {}).get("start_date_time") for reading in cgm_data],
+        "blood_glucose.value": [reading.get("blood_glucose", {}).get("value") for reading in cgm_data],
+    })
+
+
+# How the raw AI-READI data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # One Dexcom export per subject, in a folder named after the subject.
+    "files": "**/*_DEX.json",
+    "subject_id": "parent",
+    "reader": read_cgm_json,
+    "columns": {"timestamp": "effective_time_frame.time_interval.start_date_time", "glucose_value_mg_dl": "blood_glucose.value"},
+    "timestamp_format": "%Y-%m-%dT%H:%M:%SZ",
+    "timestamp_output_format": "%Y-%m-%d %H:%M:%S",
+}
+
+
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/AI-READI"):
+    '''
+    Standardizes the raw AI-READI data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
-    df.to_csv(dst / f"{subject_id}.csv", index=False)
 
 def main():
     """
@@ -73,20 +59,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store processed CSV file outputs.
-    output_dir = "Standardized-datasets/AI-READI"
-    os.makedirs(output_dir, exist_ok=True)
-    count = 0
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    for subject in input_path.rglob("**/*_DEX.json"):
-        subject_id = subject.parent.stem#pulls subjectID to use for output file generation.
-        clean_aireadi_data(subject, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
-
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,11 @@
-import pandas as pd
 import sys
 from pathlib import Path
 import os
 
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import HarmonizeManifest, METADATA_MANIFEST_NAME
+
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
 R = "\033[0m"
@@ -14,6 +17,7 @@ def clean_and_compute_metadata(df, subject_id):
       - Average glucose level (mg/dL), excluding 'Low'/'High' entries
       - Duration of glucose data coverage in days (Counts each unique day with at least one glucose sample)
     '''
+    import pandas as pd
     #Ensure timestamp column in Pandas readable format.
     df['timestamp'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%d %H:%M:%S", errors="coerce")
     
@@ -41,6 +45,50 @@ def clean_and_compute_metadata(df, subject_id):
     return metadata
 
 
+def write_metadata(metadata_list):
+    '''
+    Sorts the subjects' metadata (from clean_and_compute_metadata) and writes it to Standardized-metadata/AI-READI_metadata_calcs.csv.
+    Returns the metadata table.
+    '''
+    import pandas as pd
+    # Save metadata for all subjects
+    metadata_df = pd.DataFrame(metadata_list)
+
+    #Helper Regex function to order rows (numerically) by subject ID. Creates a temporary column "subject_num" to order subjects.
+    metadata_df["subject_num"] = (metadata_df["subject_id"].str.extract(r"(\d+)").astype(int))
+    metadata_df = metadata_df.sort_values("subject_num").drop(columns=["subject_num"])
+
+    os.makedirs("Standardized-metadata", exist_ok=True)
+    metadata_df.to_csv("Standardized-metadata/AI-READI_metadata_calcs.csv", index=False)
+    print(f"{LIME_GREEN}Glucose-ML{R}: Generated metadata for {LIGHT_RED}{len(metadata_df)}{R} subjects.")
+    return metadata_df
+
+
+def generate_metadata(input_path):
+    '''
+    Computes the metadata of the standardized AI-READI subjects in input_path and writes it to Standardized-metadata/AI-READI_metadata_calcs.csv.
+    Returns the metadata table.
+    '''
+    import pandas as pd
+    # Path to where the AI-READI_extract-glucose-data.py output lives.
+    input_path = Path(input_path)
+
+    metadata_list = []
+    manifest = HarmonizeManifest(input_path / METADATA_MANIFEST_NAME, [__file__])
+    for subject in input_path.rglob("*.csv"):
+        subject_id = subject.stem
+        # The metadata of subjects whose standardized CSV did not change since the last run is reused.
+        metadata = manifest.cached(subject_id, [subject])
+        if metadata is None:
+            df = pd.read_csv(subject)
+            metadata = clean_and_compute_metadata(df, subject_id)
+            manifest.record(subject_id, [subject], data=metadata)
+        metadata_list.append(metadata)
+    manifest.save()
+
+    return write_metadata(metadata_list)
+
+
 def main():
     '''
     This script calculates various subject-level CGM statistics from the AI-READI dataset that are reported in AI-READI_metadata.csv
@@ -55,25 +103,7 @@ def main():
         print("Also make sure input folder contians the standardized outputs generated by AI-READI_extract-glucose-data.py")
         sys.exit(1)
 
-    # Path to where the AI-READI_extract-glucose-data.py output lives.
-    input_path = Path(sys.argv[1])
-
-    metadata_list = []
-    for subject in input_path.rglob("*.csv"):
-        subject_id = subject.stem
-        df = pd.read_csv(subject)
-        metadata = clean_and_compute_metadata(df, subject_id)
-        metadata_list.append(metadata)
-    # Save metadata for all subjects
-    metadata_df = pd.DataFrame(metadata_list)
-
-    #Helper Regex function to order rows (numerically) by subject ID. Creates a temporary column "subject_num" to order subjects.
-    metadata_df["subject_num"] = (metadata_df["subject_id"].str.extract(r"(\d+)").astype(int))
-    metadata_df = metadata_df.sort_values("subject_num").drop(columns=["subject_num"])
-
-    os.makedirs("Standardized-metadata", exist_ok=True)
-    metadata_df.to_csv("Standardized-metadata/AI-READI_metadata_calcs.csv", index=False)
-    print(f"{LIME_GREEN}Glucose-ML{R}: Generated metadata for {LIGHT_RED}{len(metadata_df)}{R} subjects.")
+    generate_metadata(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
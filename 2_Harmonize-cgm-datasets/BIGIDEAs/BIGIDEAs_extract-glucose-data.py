@@ -1,41 +1,26 @@
-import pandas as pd
-import os
 import sys
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
 
-def clean_big_idea_lab_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes BIGIDEAs CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
+# How the raw BIGIDEAs data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The glucose readings are stored in the "Dexcom_*.csv" file of each subject's folder.
+    "files": "*/Dexcom_*.csv",
+    "subject_id": "parent",
+    "columns": {"timestamp": "Timestamp (YYYY-MM-DDThh:mm:ss)", "glucose_value_mg_dl": "Glucose Value (mg/dL)"},
+}
 
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"Timestamp (YYYY-MM-DDThh:mm:ss)": "timestamp", "Glucose Value (mg/dL)": "glucose_value_mg_dl"}, inplace=True)
 
-    #Convert timestamp column to Pandas readable format.
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-    # Find first valid row of valid data.
-    first_row_of_data = df["timestamp"].first_valid_index()
-    if first_row_of_data is not None:
-        df = df.loc[first_row_of_data:]
-        
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
-    
-    # Collect timestamp & glucose readings into a new dataframe. 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
-    
-    # Create an output csv for each subject using the subj_df variable.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    subj_df.to_csv(outfile, index=False)
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/BIGIDEAs"):
+    '''
+    Standardizes the raw BIGIDEAs data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -55,24 +40,7 @@ def main():
         print("Tip: Make sure input folder contians the standardized outputs generated by BIGIDEAs_extract-glucose-data.py")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = sys.argv[1]
-    source_data_path = Path(input_path)
-
-    #Create output directory "Standardized-datasets" to store processed CSV file outputs.
-    output_dir = "Standardized-datasets/BIGIDEAs"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Find all the files that are named "Dexcom_*.csv", as this is where the glucose readings are stored.
-    sourcedata_files = source_data_path.rglob("*/Dexcom_*.csv")
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    count = 0
-    for subject in sourcedata_files:
-        df=pd.read_csv(subject)
-        subject_id = subject.parent.name
-        clean_big_idea_lab_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,11 @@
-import pandas as pd
 from pathlib import Path
 import sys
 import os
 
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import HarmonizeManifest, METADATA_MANIFEST_NAME
+
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
 R = "\033[0m"
@@ -14,6 +17,7 @@ def clean_and_compute_metadata(df, subject_id):
       - Compute average glucose level (mg/dL).
       - Duration of glucose data coverage in days (Counts each unique day with at least one glucose sample)
     '''
+    import pandas as pd
 
     #Ensure timestamp column in Pandas readable format.
     df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -37,45 +41,70 @@ def clean_and_compute_metadata(df, subject_id):
     return metadata
 
 
-def main():
+def write_metadata(metadata_list):
     '''
-    This script calculates various subject-level CGM statistics from the BIGIDEAs dataset that are reported in BIGIDEAs_metadata.csv
-    The following columns are calcualted in this script: glucose_level_record_count, average_glucose_level_mg_dl, glucose_data_duration_days
-    
-    Input: The directory of standardized data generated by BIGIDEAs_extract-glucose-data.py.
-    Output: "BIGIDEAs_metadata_calcs.csv" file containing computed metadata for all subjects.
+    Sorts the subjects' metadata (from clean_and_compute_metadata) and writes it to Standardized-metadata/BIGIDEAs_metadata_calcs.csv.
+    Returns the metadata table.
     '''
+    import pandas as pd
+    metadata_df = pd.DataFrame(metadata_list)
 
-    if len(sys.argv) != 2:
-        print("Invalid command. Usage: python BIGIDEAs_extract-demographics.py <input_folder>")
-        print("Tip: Make sure input folder contians the standardized outputs generated by BIGIDEAs_extract-glucose-data.py")
-        sys.exit(1)
+    #Helper Regex function to order rows (numerically) by subject ID. Creates a temporary column "subject_num" to order subjects.
+    metadata_df["subject_num"] = (metadata_df["subject_id"].str.extract(r"(\d+)").astype(int))
+    metadata_df = metadata_df.sort_values("subject_num").drop(columns=["subject_num"])
+    
+    # Write metadata calculations to the output csv.
+    os.makedirs("Standardized-metadata", exist_ok=True)
+    metadata_df.to_csv("Standardized-metadata/BIGIDEAs_metadata_calcs.csv", index=False)
+    print(f'Generated metadata for {len(metadata_df)} subjects.')
+    print(f"{LIME_GREEN}Glucose-ML{R}: Generated metadata for {LIGHT_RED}{len(metadata_df)}{R} subjects.")
+    return metadata_df
 
+
+def generate_metadata(input_path):
+    '''
+    Computes the metadata of the standardized BIGIDEAs subjects in input_path and writes it to Standardized-metadata/BIGIDEAs_metadata_calcs.csv.
+    Returns the metadata table.
+    '''
+    import pandas as pd
     # Path to where the BIGIDEAs_extract-glucose-data.py output lives.
-    input_path = Path(sys.argv[1])
+    input_path = Path(input_path)
 
     #bin to store calculations until needed for  output file generation.
     metadata_list = []
 
+    manifest = HarmonizeManifest(input_path / METADATA_MANIFEST_NAME, [__file__])
     # Loop through each subject CSV file and calculate output values for each subject.
     for subject in input_path.rglob("*.csv"):
         subject_id = subject.stem
-        df = pd.read_csv(subject)
-        metadata = clean_and_compute_metadata(df, subject_id)
+        # The metadata of subjects whose standardized CSV did not change since the last run is reused.
+        metadata = manifest.cached(subject_id, [subject])
+        if metadata is None:
+            df = pd.read_csv(subject)
+            metadata = clean_and_compute_metadata(df, subject_id)
+            manifest.record(subject_id, [subject], data=metadata)
         # Store output in bin until output file generation.
         metadata_list.append(metadata)
+    manifest.save()
 
-    metadata_df = pd.DataFrame(metadata_list)
+    return write_metadata(metadata_list)
 
-    #Helper Regex function to order rows (numerically) by subject ID. Creates a temporary column "subject_num" to order subjects.
-    metadata_df["subject_num"] = (metadata_df["subject_id"].str.extract(r"(\d+)").astype(int))
-    metadata_df = metadata_df.sort_values("subject_num").drop(columns=["subject_num"])
+
+def main():
+    '''
+    This script calculates various subject-level CGM statistics from the BIGIDEAs dataset that are reported in BIGIDEAs_metadata.csv
+    The following columns are calcualted in this script: glucose_level_record_count, average_glucose_level_mg_dl, glucose_data_duration_days
     
-    # Write metadata calculations to the output csv.
-    os.makedirs("Standardized-metadata", exist_ok=True)
-    metadata_df.to_csv("Standardized-metadata/BIGIDEAs_metadata_calcs.csv", index=False)
-    print(f'Generated metadata for {len(metadata_df)} subjects.')
-    print(f"{LIME_GREEN}Glucose-ML{R}: Generated metadata for {LIGHT_RED}{len(metadata_df)}{R} subjects.")
+    Input: The directory of standardized data generated by BIGIDEAs_extract-glucose-data.py.
+    Output: "BIGIDEAs_metadata_calcs.csv" file containing computed metadata for all subjects.
+    '''
+
+    if len(sys.argv) != 2:
+        print("Invalid command. Usage: python BIGIDEAs_extract-demographics.py <input_folder>")
+        print("Tip: Make sure input folder contians the standardized outputs generated by BIGIDEAs_extract-glucose-data.py")
+        sys.exit(1)
+
+    generate_metadata(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,40 +1,28 @@
-import pandas as pd
 import sys
-import os
 from pathlib import Path
-import shutil
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_cgmacros_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes CGMacros_Dexcom CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
-    df.rename(columns={"Timestamp": "timestamp", "Dexcom GL": "glucose_value_mg_dl"}, inplace=True)
 
-    #Convert timestamp column to Pandas readable format.
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Find first valid row of valid data.
-    first_row_of_data = df["glucose_value_mg_dl"].first_valid_index()
-    if first_row_of_data is not None:
-        df = df.loc[first_row_of_data:]
+# How the raw CGMacros_Dexcom data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The CGMacros_dateshifted*.zip archives are read in place, so they do not need to be unzipped first.
+    "files": "*/CGMacros-*.csv",
+    "subject_id": "parent",
+    # The same files hold the Libre readings (see CGMacros_Libre).
+    "columns": {"timestamp": "Timestamp", "glucose_value_mg_dl": "Dexcom GL"},
+}
+
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/CGMacros_Dexcom"):
+    '''
+    Standardizes the raw CGMacros_Dexcom data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
-    # Collect timestamp & glucose readings into a new dataframe. 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
-    
-    # Create an output csv for each subject using the subj_df variable.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    subj_df.to_csv(outfile, index=False)
-    
 
 def main():
     '''
@@ -53,31 +41,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = sys.argv[1]
-    source_data_path = Path(input_path)
-
-    #Create output directory "Standardized-datasets" to store processed CSV file outputs.
-    output_dir = "Standardized-datasets/CGMacros_Dexcom"
-    os.makedirs(output_dir, exist_ok=True)
-
-    for zip_path in source_data_path.rglob("CGMacros_dateshifted*.zip"):
-        extract_dir = zip_path.parent
-        print(f"Unzipping: {zip_path}")
-        shutil.unpack_archive(zip_path, extract_dir)
-
-
-    # Find all the files that are named "Dexcom_*.csv", as this is where the glucose readings are stored.
-    sourcedata_files = source_data_path.rglob("*/CGMacros-*.csv")
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    count = 0
-    for subject in sourcedata_files:
-        df=pd.read_csv(subject)
-        subject_id = subject.parent.name
-        clean_cgmacros_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    extract_glucose_data(sys.argv[1])
 
-    
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,33 +1,27 @@
-import os
-import pandas as pd
-from pathlib import Path
 import sys
+from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
-
-def clean_colas_2019_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes Colas_2019 CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"hora": "timestamp", "glucemia": "glucose_value_mg_dl"}, inplace=True)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], format="%H:%M:%S").dt.time
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw Colas_2019 data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    "files": "**/*.csv",
+    "columns": {"timestamp": "hora", "glucose_value_mg_dl": "glucemia"},
+    # The readings only have a time of day.
+    "timestamp_format": "%H:%M:%S",
+    "timestamp_output_format": "%H:%M:%S",
+}
 
-    # Collect timestamp & glucose readings into a new dataframe. 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
 
-    # Create an output csv for each subject using the subj_df variable.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    subj_df.to_csv(outfile, index=False)
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/Colas_2019"):
+    '''
+    Standardizes the raw Colas_2019 data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -46,23 +40,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to where the Colas_2019_extract-glucose-data.py output lives.
-    input_path = Path(sys.argv[1])
-    
-    #Create output directory "Standardized-datasets" to store standardized CSV file outputs.
-    output_dir = "Standardized-datasets/Colas_2019"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    count = 0
-    for subject in input_path.rglob("**/*.csv"):
-        subject_id = subject.stem #pulls subjectID to use for output file generation.
-        df=pd.read_csv(subject)
-        clean_colas_2019_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
-
-
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,11 @@
 import os
-import pandas as pd
 import sys
 from pathlib import Path
 
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import HarmonizeManifest, METADATA_MANIFEST_NAME
+
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
 R = "\033[0m"
@@ -14,6 +17,7 @@ def clean_and_compute_metadata(df, subject_id):
       - Compute average glucose level (mg/dL).
       - Duration of glucose data coverage in days (Counts each unique day with at least one glucose sample)
     '''
+    import pandas as pd
     
     # Glucose recordings only have the hour:minute:second in raw metadata.
     # To identify each new "day" of recordings, timestamps values are converted to time deltas which lets us...
@@ -45,28 +49,12 @@ def clean_and_compute_metadata(df, subject_id):
     return metadata
 
 
-def main():
+def write_metadata(metadata_list):
     '''
-    This script calculates various subject-level CGM statistics from the Colas_2019 dataset that are reported in Colas_2019_metadata.csv
-    The following columns are calcualted in this script: glucose_level_record_count, average_glucose_level_mg_dl, glucose_data_duration_days
-    
-    Input: "Standardized-datasets/" directory of standardized data generated from the Colas_2019_extract-glucose-data.py.
-    Output: "Colas_2019_metadata_calcs.csv" file containing computed metadata for all subjects.
+    Sorts the subjects' metadata (from clean_and_compute_metadata) and writes it to Standardized-metadata/Colas_2019_metadata_calcs.csv.
+    Returns the metadata table.
     '''
-
-    # Path to where the Colas_2019_extract-glucose-data.py output lives.
-    source_data_path = Path(sys.argv[1])
-    
-    #bin to store calculations until needed for  output file generation.
-    metadata_list = []
-
-    # Loop through each subject CSV file and calcualte output values for each subject.
-    for subject in source_data_path.rglob("*.csv"):
-        subject_id = subject.stem
-        df = pd.read_csv(subject)
-        metadata = clean_and_compute_metadata(df, subject_id)
-        metadata_list.append(metadata)
-
+    import pandas as pd
     metadata_df = pd.DataFrame(metadata_list)
 
     #Helper Regex function to order rows (numerically) by subject ID. Creates a temporary column "subject_num" to order subjects.
@@ -81,6 +69,46 @@ def main():
     os.makedirs("Standardized-metadata", exist_ok=True)
     metadata_df.to_csv("Standardized-metadata/Colas_2019_metadata_calcs.csv", index=False)
     print(f"{LIME_GREEN}Glucose-ML{R}: Generated metadata for {LIGHT_RED}{len(metadata_df)}{R} subjects.")
+    return metadata_df
+
+
+def generate_metadata(input_path):
+    '''
+    Computes the metadata of the standardized Colas_2019 subjects in input_path and writes it to Standardized-metadata/Colas_2019_metadata_calcs.csv.
+    Returns the metadata table.
+    '''
+    import pandas as pd
+    # Path to where the Colas_2019_extract-glucose-data.py output lives.
+    source_data_path = Path(input_path)
+    
+    #bin to store calculations until needed for  output file generation.
+    metadata_list = []
+
+    manifest = HarmonizeManifest(source_data_path / METADATA_MANIFEST_NAME, [__file__])
+    # Loop through each subject CSV file and calcualte output values for each subject.
+    for subject in source_data_path.rglob("*.csv"):
+        subject_id = subject.stem
+        # The metadata of subjects whose standardized CSV did not change since the last run is reused.
+        metadata = manifest.cached(subject_id, [subject])
+        if metadata is None:
+            df = pd.read_csv(subject)
+            metadata = clean_and_compute_metadata(df, subject_id)
+            manifest.record(subject_id, [subject], data=metadata)
+        metadata_list.append(metadata)
+    manifest.save()
+
+    return write_metadata(metadata_list)
+
+
+def main():
+    '''
+    This script calculates various subject-level CGM statistics from the Colas_2019 dataset that are reported in Colas_2019_metadata.csv
+    The following columns are calcualted in this script: glucose_level_record_count, average_glucose_level_mg_dl, glucose_data_duration_days
+    
+    Input: "Standardized-datasets/" directory of standardized data generated from the Colas_2019_extract-glucose-data.py.
+    Output: "Colas_2019_metadata_calcs.csv" file containing computed metadata for all subjects.
+    '''
+    generate_metadata(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,62 +1,34 @@
-import os
-import pandas as pd
-from pathlib import Path
 import sys
+from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
-
-def clean_d1namo_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes D1NAMO CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format with additional quality checks.
-    - Writing per-subject CSV files containing timestamped glucose values
-    - Convert glucose records from raw mmol/L units to the project-standard mg/dL units.
-    '''
-
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"glucose": "glucose_value_mg_dl"}, inplace=True)
-
-
-    # Need to handle different timestamp formats, so push to function parse_timestamp to figure out the inconsistencies.
-    df["timestamp"] = parse_timestamp(df["date"] + " " + df["time"])
-    
-    df["glucose_value_mg_dl"] = pd.to_numeric(df["glucose_value_mg_dl"],errors="coerce")
-
-    # Convert glucose records from mmol/L to mg/dL
-    df["glucose_value_mg_dl"] = (df["glucose_value_mg_dl"] * 18).round(1)
-    
-    # exclude any values that are "manual"
-    df = df[df["type"] == "cgm"]
-
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
 
-    #Make blank csv output file.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    # Populate the output file
-    subj_df.to_csv(outfile, index=False)
+# How the raw D1NAMO data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The glucose readings are stored in the "glucose.csv" file of each subject's folder.
+    "files": "diabetes_subset*/*/glucose.csv",
+    "subject_id": "parent",
+    "columns": {"timestamp": ["date", "time"], "glucose_value_mg_dl": "glucose"},
+    # Exclude the "manual" readings.
+    "keep_rows": {"type": "cgm"},
+    # Most times are logged without seconds; the rows that do not parse are parsed again with any ISO format.
+    "timestamp_format": ["%Y-%m-%d %H:%M", "mixed"],
+    # Convert glucose records from raw mmol/L units to the project-standard mg/dL units.
+    "unit_factor": 18,
+}
 
-def parse_timestamp(input):
-    """
-    Handle timestamps with various formats. This dataset has logged glucose readings in day/time formats, 
-    so to standardize safely this function attempts to parse the timestamps using various ISO-formatting types.
-    """
 
-    #Try parsing the timestamps using the most common format.
-    timestamp = pd.to_datetime(input,format="%Y-%m-%d %H:%M",errors="coerce")
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/D1NAMO"):
+    '''
+    Standardizes the raw D1NAMO data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
-    # If first parse fails, try parsing again on the failed rows using the other format.
-    mask = timestamp.isna()
-    if mask.any():
-        timestamp.loc[mask] = pd.to_datetime(input[mask], format="mixed", errors="raise")
 
-    return timestamp
-        
 def main():
     '''
     Processes raw data from the D1NAMO dataset by pulling timestamp & glucose data and 
@@ -78,23 +50,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-
-    #Create output directory "Standardized-datasets" to store standardized CSV file outputs.
-    output_dir = "Standardized-datasets/D1NAMO"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Find all the files that are named "glucose.csv", as this is where the glucose readings are stored.
-    sourcedata_files = input_path.rglob("diabetes_subset*/*/glucose.csv")
-    count = 0
-    for subject in sourcedata_files:
-        df=pd.read_csv(subject)
-        subject_id = subject.parent.name
-        clean_d1namo_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
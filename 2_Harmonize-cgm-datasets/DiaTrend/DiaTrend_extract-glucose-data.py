@@ -1,34 +1,27 @@
-import os
-import pandas as pd
 import sys
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_diatrend_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes DiaTrend CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format with additional quality checks.
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
-
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"date": "timestamp", "mg/dl": "glucose_value_mg_dl"}, inplace=True)
-    
-    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.round('s')#Need to round because Excel stores datetimes as floating-point numbers
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw DiaTrend data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    "files": "**/Subject*.xlsx",
+    "reader": "excel",
+    "columns": {"timestamp": "date", "glucose_value_mg_dl": "mg/dl"},
+    # Need to round because Excel stores datetimes as floating-point numbers.
+    "round_timestamp": "s",
+}
 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
 
-    #Make blank csv output file.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    # Populate the output file
-    subj_df.to_csv(outfile, index=False)
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/DiaTrend"):
+    '''
+    Standardizes the raw DiaTrend data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -48,20 +41,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store CSV file outputs.
-    output_dir = "Standardized-datasets/DiaTrend"
-    os.makedirs(output_dir, exist_ok=True)
+    extract_glucose_data(sys.argv[1])
 
-    # Find all the files that contain the glucose readings.
-    count = 0
-    for subject in input_path.rglob("**/Subject*.xlsx"):
-        subject_id = subject.stem #pulls subjectID to use for output file generation.
-        df=pd.read_excel(subject)
-        clean_diatrend_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
 if __name__ == "__main__":
     main()
\ No newline at end of file
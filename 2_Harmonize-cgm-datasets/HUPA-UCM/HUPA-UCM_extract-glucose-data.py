@@ -1,36 +1,25 @@
-import os
-import pandas as pd
 import sys
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_hupaucm_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes HUPA-UCM CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
-
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"time": "timestamp", "glucose": "glucose_value_mg_dl"}, inplace=True)
-
-    #Convert timestamp column to Pandas readable format.
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw HUPA-UCM data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    "files": "**/Preprocessed/*.csv",
+    "read_options": {"sep": ";"},
+    "columns": {"timestamp": "time", "glucose_value_mg_dl": "glucose"},
+}
 
-    # Collect timestamp & glucose readings into a new dataframe. 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
-    
-    # Create an output csv for each subject using the subj_df variable.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    subj_df.to_csv(outfile, index=False)
 
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/HUPA-UCM"):
+    '''
+    Standardizes the raw HUPA-UCM data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -50,21 +39,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store standardized CSV file outputs.
-    output_dir = "Standardized-datasets/HUPA-UCM"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    count = 0
-    for subject in input_path.rglob("**/Preprocessed/*.csv"):
-        subject_id = subject.stem #pull the subject ID from the raw file name.
-        df=pd.read_csv(subject, sep=';') 
-        clean_hupaucm_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
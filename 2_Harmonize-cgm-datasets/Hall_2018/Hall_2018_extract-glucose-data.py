@@ -1,34 +1,29 @@
-import os
-import pandas as pd
 import sys
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_hall_2018_data(df, output_dir):
-    '''
-    Cleans and standardizes Hall_2018 CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"DisplayTime": "timestamp", "GlucoseValue": "glucose_value_mg_dl"}, inplace=True)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors="raise")
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw Hall_2018 data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # All subjects are in one tab-separated file.
+    "files": "pbio.*.s*",
+    "recursive": False,
+    "use_files": "first",
+    "read_options": {"sep": "\t"},
+    "subject_column": "subjectId",
+    "columns": {"timestamp": "DisplayTime", "glucose_value_mg_dl": "GlucoseValue"},
+}
+
 
-    # Loop to generate csv output files for each subject.
-    count = 0
-    for subj in df["subjectId"].unique():
-        subj_df = df[df["subjectId"] == subj][["timestamp", "glucose_value_mg_dl"]]
-        filename = os.path.join(output_dir, f"{subj}.csv")
-        subj_df.to_csv(filename, index=False)
-        count +=1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/Hall_2018"):
+    '''
+    Standardizes the raw Hall_2018 data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -48,18 +43,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw UNZIPPED download.
-    input_path = Path(sys.argv[1])
-    data_file = next(input_path.glob("pbio.*.s*"))
-
-    #Create output directory to store standardized CSV file outputs.
-    output_dir = "Standardized-datasets/Hall_2018"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    raw_data_file = pd.read_csv(data_file, sep="\t")
-    clean_hall_2018_data(raw_data_file, output_dir)
-
-
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
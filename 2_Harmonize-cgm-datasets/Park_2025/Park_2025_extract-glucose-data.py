@@ -1,35 +1,30 @@
-import os
-import pandas as pd
 import sys
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_park_2025_data(df, output_dir):
-    '''
-    Cleans and standardizes Park_2025 CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
 
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"mins_since_start": "timestamp", "glucose": "glucose_value_mg_dl"}, inplace=True)
+# How the raw Park_2025 data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # All subjects are in one CSV file.
+    "files": "*.csv",
+    "recursive": False,
+    "use_files": "first",
+    "subject_column": "subject",
+    "columns": {"timestamp": "mins_since_start", "glucose_value_mg_dl": "glucose"},
+    # The timestamps are minutes since the start of the study, and are kept as they are.
+    "parse_timestamp": False,
+}
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
 
-    # Loop to generate csv output files for each subject.
-    count = 0
-    for subj in df["subject"].unique():
-        subj_df = df[df["subject"] == subj][["timestamp", "glucose_value_mg_dl"]]
-        filename = os.path.join(output_dir, f"{subj}.csv")
-        subj_df.to_csv(filename, index=False)
-        #print(f"Saved file for subject {subj}: {filename}")
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/Park_2025"):
+    '''
+    Standardizes the raw Park_2025 data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -49,19 +44,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    # Raw CSV file input to extract data from.
-    csv_files = list(input_path.glob("*.csv"))
-    raw_data_file = pd.read_csv(csv_files[0])
-
-    #Create output directory to store CSV file outputs.
-    output_dir = "Standardized-datasets/Park_2025"
-    os.makedirs(output_dir, exist_ok=True)
-
-
-    clean_park_2025_data(raw_data_file, output_dir)
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
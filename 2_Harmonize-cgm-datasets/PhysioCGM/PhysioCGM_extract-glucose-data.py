@@ -1,33 +1,45 @@
-import os
-import pandas as pd
 import sys
 from pathlib import Path
 
-def clean_physiocgm_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes PhysioCGM CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format with additional quality checks.
-    - Writing per-subject CSV files containing timestamped glucose values
-    '''
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import RawSource, harmonize_dataset, standardize_raw_files
 
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"Timestamp (YYYY-MM-DDThh:mm:ss)": "timestamp", "Glucose Value (mg/dL)": "glucose_value_mg_dl"}, inplace=True)
-    
-    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.round('s')#Need to round because Excel stores datetimes as floating-point numbers
-    first_row_of_data = df["glucose_value_mg_dl"].first_valid_index()
-    if first_row_of_data is not None:
-        df = df.loc[first_row_of_data:]
 
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw PhysioCGM data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The per-subject *_raw.zip files are read in place (as if unpacked into their *_raw folder) when they have not been unzipped.
+    "files": "**/*_raw/cgm.csv",
+    "unpack_to_stem": True,
+    "subject_id": lambda raw_file: raw_file.parent.name.replace("_raw", ""),
+    "columns": {"timestamp": "Timestamp (YYYY-MM-DDThh:mm:ss)", "glucose_value_mg_dl": "Glucose Value (mg/dL)"},
+    # Need to round because Excel stores datetimes as floating-point numbers.
+    "round_timestamp": "s",
+}
+
+
+def extract_subject(raw_path, output_dir):
+    '''
+    Standardizes a single PhysioCGM subject from its "<subject>_raw.zip" download or its unpacked
+    "<subject>_raw" folder. Lets subjects be harmonized one by one as their files arrive.
+    Returns the subject ID.
+    '''
+    raw_path = Path(raw_path)
+    subject_id = raw_path.stem.replace("_raw", "")
+    with RawSource(raw_path) as source:
+        cgm_files = source.rglob("cgm.csv")
+        if not cgm_files:
+            raise FileNotFoundError(f"No cgm.csv found in {raw_path}")
+        standardize_raw_files(SPEC, cgm_files[0], subject_id, output_dir)
+    return subject_id
 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
 
-    #Make blank csv output file.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    # Populate the output file
-    subj_df.to_csv(outfile, index=False)
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/PhysioCGM"):
+    '''
+    Standardizes the raw PhysioCGM data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -47,21 +59,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store CSV file outputs.
-    output_dir = "Standardized-datasets/PhysioCGM"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Find all the files that contain the glucose readings.
-
-    sourcedata_files = input_path.rglob("**/*_raw/cgm.csv")
-    for subject in sourcedata_files:
-        print(subject)
-        df=pd.read_csv(subject)
-        subject_id = subject.parent.name.replace("_raw", "")
-        clean_physiocgm_data(df, subject_id, output_dir)
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,15 @@
-import pandas as pd
 import sys
-import os
 from pathlib import Path
 
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
+
 LIME_GREEN = "\033[92m"
 LIGHT_RED = "\033[91m"
 R = "\033[0m"
 
+
 def determine_engine(filename):
     """
     Determine which Excel engine to use based on file extension
@@ -19,72 +22,43 @@ def determine_engine(filename):
         # Default to openpyxl for unknown extensions
         return 'openpyxl'
 
-def clean_shanghait1dm_data(root, dst):
-    """
-    Cleans and standardizes ShanghaiT1DM CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    
-    Args:
-        root (str): Path to the directory containing Shanghai T1DM Excel files
-        dst (str): Path to destination directory where processed CSV files will be saved
-    
-    Returns:
-        None: The function saves processed CSV files to the specified destination directory
-    """
 
-    subj_dict = {}
-    # Iterrate through raw data files.
-    for file in os.listdir(root):
-        if file.endswith('.xlsx') or file.endswith('.xls'):
-            if file.split('_')[0] not in subj_dict:
-                subj_dict.update({file.split('_')[0]: [file]})
-            else:
-                subj_dict[file.split('_')[0]].append(file)
-    count = 0
-    for subj in subj_dict.keys():
-        count += 1
-        if len(subj_dict[subj]) == 1:
-            file_path = os.path.join(root, subj_dict[subj][0])
-            # Determines file root
-            engine = determine_engine(subj_dict[subj][0])
-            try:
-                df = pd.read_excel(file_path, sheet_name=subj_dict[subj][0].split('.')[0], engine=engine)
-                # Rename columns & convert timestamp data to the standardized names used throughout the project.
-                df_selected = df[['Date', 'CGM (mg / dl)']].rename(columns={'Date': 'timestamp', 'CGM (mg / dl)': 'glucose_value_mg_dl'})
-                # Drop rows missing timestamps or glucose values
-                df_selected = df_selected.dropna(subset=["timestamp", "glucose_value_mg_dl"])
-
-                df_selected.to_csv(os.path.join(dst, subj+'.csv'), index=None)
-            except Exception as e:
-                print(f"{LIGHT_RED}Glucose-ML{R}: Error processing {file_path}: {e}")
-        # subject with multiple files
-        else: 
-            subj_dict[subj].sort()
-            df_list = []
-            for file in subj_dict[subj]:
-                file_path = os.path.join(root, file)
-                # Determines file root
-                engine = determine_engine(file)
-                try:
-                    df = pd.read_excel(file_path, sheet_name=file.split('.')[0], engine=engine)
-                    df_list.append(df)
-                except Exception as e:
-                    print(f"{LIGHT_RED}Glucose-ML{R}: Error processing {file_path}: {e}")
-            
-            if df_list:
-                df = pd.concat(df_list, ignore_index=True)
-                # Rename columns & convert timestamp data to the standardized names used throughout the project.
-
-                df_selected = df[['Date', 'CGM (mg / dl)']].rename(columns={'Date': 'timestamp', 'CGM (mg / dl)': 'glucose_value_mg_dl'})
-                # Drop rows missing timestamps or glucose values
-                df_selected = df_selected.dropna(subset=["timestamp", "glucose_value_mg_dl"])
-
-                df_selected.to_csv(os.path.join(dst, subj+'.csv'), index=None)
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
-    
-    
+def read_subject_excel(f, raw_file):
+    '''
+    Plug-in reader of the ShanghaiT1DM Excel files (see SPEC): the readings are in a sheet named after the file,
+    read with the engine its extension needs. Files that cannot be read are reported and skipped.
+    '''
+    import pandas as pd
+    try:
+        return pd.read_excel(f, sheet_name=raw_file.name.split('.')[0], engine=determine_engine(raw_file.name), usecols=lambda column: column in ("Date", "CGM (mg / dl)"))
+    except Exception as e:
+        print(f"{LIGHT_RED}Glucose-ML{R}: Error processing {raw_file}: {e}")
+        return None
+
+
+# How the raw ShanghaiT1DM data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The Excel files are read straight out of the raw zip archive when it has not been unzipped.
+    "files": ["*.xlsx", "*.xls"],
+    "recursive": False,
+    # Files are named <subject>_<number>_<date>, and a subject with several files has them read in order.
+    "subject_id": lambda raw_file: raw_file.name.split('_')[0],
+    "group_files": True,
+    "reader": read_subject_excel,
+    "columns": {"timestamp": "Date", "glucose_value_mg_dl": "CGM (mg / dl)"},
+    # Excel already stores the dates as datetimes.
+    "parse_timestamp": False,
+}
+
+
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/ShanghaiT1DM"):
+    '''
+    Standardizes the raw ShanghaiT1DM data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
+
+
 def main():
     '''
     Processes raw data from the ShanghaiT1DM dataset by pulling timestamp & glucose data and 
@@ -102,14 +76,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store processed CSV file outputs.
-    output_dir = "Standardized-datasets/ShanghaiT1DM"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    clean_shanghait1dm_data(input_path, output_dir)
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
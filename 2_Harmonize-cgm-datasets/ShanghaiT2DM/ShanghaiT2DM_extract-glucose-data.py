@@ -1,53 +1,34 @@
-import pandas as pd
 import sys
-import os
 from pathlib import Path
 
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-def clean_shanghait2dm_data(root, dst):
-    """
-    Cleans and standardizes ShanghaiT2DM CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format
-    - Writing per-subject CSV files containing timestamped glucose values
-    
-    Args:
-        root (str): Path to the directory containing Shanghai T2DM Excel files
-        dst (str): Path to destination directory where processed CSV files will be saved
-    
-    Returns:
-        None: The function saves processed CSV files to the specified destination directory
-    """
 
-    subj_dict = {}
-    for file in os.listdir(root):
-        if file.split('_')[0] not in subj_dict:
-            subj_dict.update({file.split('_')[0]: [file]})
-        else:
-            subj_dict[file.split('_')[0]].append(file)
-    count = 0
-    for subj in subj_dict.keys():
-        if len(subj_dict[subj]) == 1: # subject only has one record
-            df = pd.read_excel(os.path.join(root, subj_dict[subj][0]))
-        else: # subject with multiple files
-            subj_dict[subj].sort() # sorted by time
-            df_list = [pd.read_excel(os.path.join(root,file)) for file in subj_dict[subj]]
-            df = pd.concat(df_list, ignore_index=True)
+# How the raw ShanghaiT2DM data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    # The Excel files are read straight out of the raw zip archive when it has not been unzipped.
+    "files": "*",
+    "recursive": False,
+    # Files are named <subject>_<number>_<date>, and a subject with several files has them read in order.
+    "subject_id": lambda raw_file: raw_file.name.split('_')[0],
+    "group_files": True,
+    "reader": "excel",
+    # Subject 2045 names the glucose column "CGM ".
+    "columns": {"timestamp": "Date", "glucose_value_mg_dl": ["CGM (mg / dl)", "CGM "]},
+    # Excel already stores the dates as datetimes.
+    "parse_timestamp": False,
+}
+
 
-        try:
-            df_selected = df[['Date', 'CGM (mg / dl)']].rename(columns={'Date': 'timestamp', 'CGM (mg / dl)': 'glucose_value_mg_dl'})
-        except: # subject 2045
-            df_selected = df[['Date', 'CGM ']].rename(columns={'Date': 'timestamp', 'CGM ': 'glucose_value_mg_dl'})
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/ShanghaiT2DM"):
+    '''
+    Standardizes the raw ShanghaiT2DM data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
-        # Drop rows missing timestamps or glucose values
-        df_selected = df_selected.dropna(subset=["timestamp", "glucose_value_mg_dl"])
-        df_selected.to_csv(os.path.join(dst, subj+'.csv'), index=None)
-        count += 1
-            # break
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
 
 def main():
     """
@@ -67,15 +48,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = sys.argv[1]
-    source_data_path = Path(input_path)
-
-    #Create output directory "Standardized-datasets" to store processed CSV file outputs.
-    output_dir = "Standardized-datasets/ShanghaiT2DM"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    clean_shanghait2dm_data(source_data_path, output_dir)
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
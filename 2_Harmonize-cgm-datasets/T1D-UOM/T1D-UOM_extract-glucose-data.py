@@ -1,39 +1,28 @@
-import os
-import pandas as pd
-from pathlib import Path
 import sys
-LIME_GREEN = "\033[92m"
-LIGHT_RED = "\033[91m"
-R = "\033[0m"
-
-
-def clean_t1dmuom_data(df, subject_id, output_dir):
-    '''
-    Cleans and standardizes T1D-UOM CGM data by:
-    - Renaming columns to project-standard names
-    - Converting timestamps to pandas datetime format with additional quality checks.
-    - Writing per-subject CSV files containing timestamped glucose values
-    - Convert glucose records from raw mmol/L units to the project-standard mg/dL units.
-    '''
+from pathlib import Path
 
-    # Rename columns & convert timestamp data to the standardized names used throughout the project.
-    df.rename(columns={"bg_ts": "timestamp", "value": "glucose_value_mg_dl"}, inplace=True)
+# harmonize_utils.py lives in the parent folder (2_Harmonize-cgm-datasets).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from harmonize_utils import harmonize_dataset
 
-    df['timestamp'] = pd.to_datetime(df['timestamp'], dayfirst=True)
-    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
 
-    # Convert glucose records from mmol/L to mg/dL
-    df["glucose_value_mg_dl"] = (df["glucose_value_mg_dl"] * 18).round(1)
-    
-    # Drop rows missing timestamps or glucose values
-    df = df.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+# How the raw T1D-UOM data is standardized (see SPEC_DEFAULTS in harmonize_utils.py).
+SPEC = {
+    "files": "*/Glucose Data/*.csv",
+    "columns": {"timestamp": "bg_ts", "glucose_value_mg_dl": "value"},
+    "dayfirst": True,
+    "timestamp_output_format": "%Y-%m-%d %H:%M:%S",
+    # Convert glucose records from raw mmol/L units to the project-standard mg/dL units.
+    "unit_factor": 18,
+}
 
-    subj_df = df[["timestamp", "glucose_value_mg_dl"]]
 
-    # Create an output csv for each subject using the subj_df variable.
-    outfile = os.path.join(output_dir, f"{subject_id}.csv")
-    # Populate output file.
-    subj_df.to_csv(outfile, index=False)
+def extract_glucose_data(input_path, output_dir="Standardized-datasets/T1D-UOM"):
+    '''
+    Standardizes the raw T1D-UOM data in input_path (a folder or zip archive) into one CSV per subject in output_dir,
+    and writes their metadata to Standardized-metadata in the same pass. Returns the metadata table.
+    '''
+    return harmonize_dataset(__file__, SPEC, input_path, output_dir)
 
 
 def main():
@@ -54,23 +43,7 @@ def main():
         print("Tip: Make sure to only pass 1 argument & that data exists in input directory")
         sys.exit(1)
 
-    # Path to directory containing the raw data files.
-    input_path = Path(sys.argv[1])
-
-    #Create output directory "Standardized-datasets" to store CSV file outputs.
-    output_dir = "Standardized-datasets/T1D-UOM"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Loop through raw directory contents and pull the subject ID from the raw file name.
-    count = 0
-    print(input_path)
-    for subject in input_path.rglob("*/Glucose Data/*.csv"):
-        subject_id = subject.stem #pulls subjectID to use for output file generation.
-        print(subject_id)
-        df=pd.read_csv(subject)
-        clean_t1dmuom_data(df, subject_id, output_dir)
-        count += 1
-    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    extract_glucose_data(sys.argv[1])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,1241 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import threading
+import hashlib
+import contextlib
+import posixpath
+import zipfile
+from pathlib import Path, PurePosixPath
+
+LIME_GREEN = "\033[92m"
+LIGHT_RED = "\033[91m"
+YELLOW = "\033[93m"
+R = "\033[0m"
+
+# Incremental runs: set GLUCOSE_ML_HASH_INPUTS=1 to compare raw files on disk by SHA-256 instead of size and
+# modification time, and GLUCOSE_ML_REBUILD=1 to ignore the manifests and process every subject again.
+HASH_INPUTS_ENV = "GLUCOSE_ML_HASH_INPUTS"
+REBUILD_ENV = "GLUCOSE_ML_REBUILD"
+# Number of processes that standardize the subjects of one dataset (see standardize_subjects), default: one per CPU.
+SUBJECT_JOBS_ENV = "GLUCOSE_ML_SUBJECT_JOBS"
+
+MANIFEST_NAME = ".harmonize-manifest.json"
+# Folder the metadata scripts write their tables to, relative to the folder the harmonization runs from.
+METADATA_DIR = "Standardized-metadata"
+METADATA_MANIFEST_NAME = ".metadata-manifest.json"
+# Manifest key of datasets that are standardized as a whole from one set of raw files.
+ALL_SUBJECTS = "*"
+
+
+def file_sha256(fileobj):
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(1024 * 1024), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, hash_contents=False):
+    '''
+    Returns what identifies the version of a file on disk: its name and size, plus its SHA-256 with
+    hash_contents or its modification time otherwise.
+    '''
+    path = Path(path)
+    stat = path.stat()
+    fingerprint = {"path": path.name, "size": stat.st_size}
+    if hash_contents:
+        with open(path, "rb") as f:
+            fingerprint["sha256"] = file_sha256(f)
+    else:
+        fingerprint["mtime_ns"] = stat.st_mtime_ns
+    return fingerprint
+
+
+def glob_to_regex(pattern, recursive=False):
+    '''
+    Converts a glob pattern into a compiled regex for "/"-separated relative paths.
+    "**/" matches any number of folders, "*" and "?" match within a single path part.
+    With recursive=True the pattern may start at any folder depth, like Path.rglob.
+    '''
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:[^/]*/)*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(("(?:.*/)?" if recursive else "") + regex)
+
+
+class RawFile:
+    '''
+    One file of a raw dataset, either on disk or inside a zip archive.
+    Exposes the Path attributes the harmonization scripts use (name, stem, suffix, parent)
+    and open(), which returns a binary file object that pandas can read directly.
+    '''
+
+    def __init__(self, path, location, opener, info=None):
+        self.path = PurePosixPath(path)
+        self.location = location
+        self._opener = opener
+        # The file's Path on disk, or its ZipInfo inside an archive (used by fingerprint()).
+        self.info = info
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def stem(self):
+        return self.path.stem
+
+    @property
+    def suffix(self):
+        return self.path.suffix
+
+    @property
+    def parent(self):
+        return self.path.parent
+
+    @property
+    def size(self):
+        '''
+        The uncompressed size of the file in bytes.
+        '''
+        return self.info.file_size if isinstance(self.info, zipfile.ZipInfo) else self.info.stat().st_size
+
+    def open(self):
+        fileobj = self._opener()
+        report = active_report()
+        if report is None:
+            return fileobj
+        return io.BufferedReader(CountingReader(fileobj, report))
+
+    def fingerprint(self, hash_contents=False):
+        '''
+        Returns what identifies the version of this file. Archive members are identified by their size and
+        CRC-32 from the archive's table of contents, which already depend on their contents.
+        '''
+        if isinstance(self.info, zipfile.ZipInfo):
+            return {"path": str(self.path), "size": self.info.file_size, "crc": self.info.CRC}
+        fingerprint = file_fingerprint(self.info, hash_contents)
+        fingerprint["path"] = str(self.path)
+        return fingerprint
+
+    def __str__(self):
+        return self.location
+
+    def __repr__(self):
+        return f"RawFile({self.location!r})"
+
+
+class RawSource:
+    '''
+    A raw dataset that can be read without extracting it. The source may be:
+      - a directory (extracted files, zip archives, or both),
+      - a single .zip archive,
+      - a folder that only exists inside an archive, e.g. Shanghai_raw_data/diabetes_datasets/Shanghai_T1DM
+        when only Shanghai_raw-data.zip is on disk.
+
+    Zip archives, including zips inside zips, are read in place: their members appear under the folder
+    that holds the archive, exactly where unpacking them would have put them. Files already extracted
+    on disk take precedence over the same path inside an archive, and archives whose members are all
+    extracted already are not read, so an extracted directory is read as before. Members are streamed
+    out of the archives on open(); nothing is written to disk.
+
+    With unpack_to_stem=True, archive members appear in a folder named after the archive instead
+    (<folder>/<archive stem>/...), matching datasets whose zips are unpacked that way (PhysioCGM).
+    '''
+
+    def __init__(self, path, unpack_to_stem=False):
+        requested_path = Path(path)
+        self.path = requested_path
+        path = requested_path
+        prefix = []
+        # A folder that is not on disk may still be inside an archive further up.
+        while not path.exists():
+            if path.parent == path:
+                raise FileNotFoundError(f"{LIGHT_RED}Glucose-ML{R}: Raw data path not found: {requested_path}")
+            prefix.append(path.name)
+            path = path.parent
+        self.root = path
+        self.prefix = "/".join(reversed(prefix))
+        self.unpack_to_stem = unpack_to_stem
+        self.archives = []
+        with report_stage("discover"):
+            self.files = self._index()
+        if self.prefix and not self.files:
+            raise FileNotFoundError(f"{LIGHT_RED}Glucose-ML{R}: Raw data path not found: {requested_path}")
+
+    def _index(self):
+        '''
+        Lists every file in the source, keyed by its path relative to the source root.
+        '''
+        entries = {}
+        pending_zips = []
+
+        if self.root.is_file():
+            pending_zips.append(("", str(self.root), lambda: open(self.root, "rb"), True))
+        else:
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    full_path = Path(dirpath) / filename
+                    rel_path = full_path.relative_to(self.root).as_posix()
+                    entries[rel_path] = RawFile(rel_path, str(full_path), lambda p=full_path: open(p, "rb"), info=full_path)
+                    if filename.lower().endswith(".zip"):
+                        pending_zips.append((rel_path, str(full_path), entries[rel_path]._opener, False))
+
+        # Merge archive members into the folder that holds each archive, breadth first so nested zips follow.
+        while pending_zips:
+            rel_path, location, opener, is_root = pending_zips.pop(0)
+            fileobj = opener()
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile:
+                fileobj.close()
+                print(f"{YELLOW}Glucose-ML{R}: Skipping {location} (not a complete zip archive).")
+                continue
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            base = "" if is_root else posixpath.dirname(rel_path)
+            stem_base = posixpath.splitext(rel_path)[0]
+            if self.unpack_to_stem and not is_root:
+                base = stem_base
+
+            # Skip archives that were already unpacked next to themselves, either in place or into
+            # a folder named after the archive (as some unzip tools do).
+            if not is_root and members and any(
+                all(posixpath.join(folder, info.filename) in entries for info in members) for folder in (base, stem_base)
+            ):
+                archive.close()
+                fileobj.close()
+                continue
+            self.archives.append((archive, fileobj))
+
+            for info in members:
+                member_path = posixpath.join(base, info.filename)
+                if member_path in entries:
+                    continue
+                entries[member_path] = RawFile(
+                    member_path, f"{location}/{info.filename}",
+                    lambda archive=archive, info=info: archive.open(info), info=info,
+                )
+                if info.filename.lower().endswith(".zip"):
+                    pending_zips.append((member_path, f"{location}/{info.filename}", entries[member_path]._opener, False))
+
+        if not self.prefix:
+            return entries
+        # Keep only the files below the requested folder, with paths relative to it.
+        files = {}
+        for rel_path, raw_file in entries.items():
+            if rel_path.startswith(self.prefix + "/"):
+                sub_path = rel_path[len(self.prefix) + 1:]
+                files[sub_path] = RawFile(sub_path, raw_file.location, raw_file._opener, info=raw_file.info)
+        return files
+
+    def glob(self, pattern):
+        '''
+        Returns the files whose path relative to the source matches pattern (like Path.glob), sorted by path.
+        '''
+        with report_stage("discover") as stats:
+            regex = glob_to_regex(pattern)
+            found = [self.files[path] for path in sorted(self.files) if regex.fullmatch(path)]
+            if stats is not None:
+                stats["rows_out"] += len(found)
+        return found
+
+    def rglob(self, pattern):
+        '''
+        Returns the files matching pattern at any folder depth (like Path.rglob), sorted by path.
+        '''
+        with report_stage("discover") as stats:
+            regex = glob_to_regex(pattern, recursive=True)
+            found = [self.files[path] for path in sorted(self.files) if regex.fullmatch(path)]
+            if stats is not None:
+                stats["rows_out"] += len(found)
+        return found
+
+    def close(self):
+        for archive, fileobj in reversed(self.archives):
+            archive.close()
+            fileobj.close()
+        self.archives = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def code_version(code_files):
+    '''
+    Returns a SHA-256 over the given source files and this module, so outputs are rebuilt when the code changes.
+    '''
+    digest = hashlib.sha256()
+    for code_file in [*code_files, __file__]:
+        with open(code_file, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def output_snapshot(output_dir):
+    '''
+    Returns the size and modification time of every CSV in output_dir, to find the files a run wrote (see written_since).
+    '''
+    return {str(path): (path.stat().st_size, path.stat().st_mtime_ns) for path in Path(output_dir).glob("*.csv")}
+
+
+def written_since(output_dir, snapshot):
+    return sorted(path for path, stat in output_snapshot(output_dir).items() if snapshot.get(path) != stat)
+
+
+class HarmonizeManifest:
+    '''
+    Remembers, for each subject, the fingerprints of the raw files its outputs were built from, the outputs
+    themselves, and the version of the code that built them. A re-run can then skip the subjects whose
+    inputs and code did not change (is_current / cached) and only process new or changed ones (record).
+    save() deletes the outputs of subjects that were not seen again, i.e. that disappeared from the raw
+    data, and writes the manifest (JSON) to manifest_path.
+
+    Datasets that are standardized as a whole use the single subject ALL_SUBJECTS.
+    See HASH_INPUTS_ENV and REBUILD_ENV for the defaults of hash_contents and rebuild.
+    '''
+
+    def __init__(self, manifest_path, code_files, hash_contents=None, rebuild=None):
+        self.path = Path(manifest_path)
+        self.code = code_version(code_files)
+        self.hash_contents = os.environ.get(HASH_INPUTS_ENV) == "1" if hash_contents is None else hash_contents
+        rebuild = os.environ.get(REBUILD_ENV) == "1" if rebuild is None else rebuild
+
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        # Outputs of earlier runs are remembered even when the code changed, so stale ones can still be removed.
+        self.previous = stored.get("subjects", {})
+        self.subjects = {} if rebuild or stored.get("code") != self.code else dict(self.previous)
+        self.seen = set()
+        self.skipped = 0
+
+    def _fingerprints(self, inputs):
+        return [
+            raw_file.fingerprint(self.hash_contents) if isinstance(raw_file, RawFile) else file_fingerprint(raw_file, self.hash_contents)
+            for raw_file in inputs
+        ]
+
+    def _output_path(self, output):
+        return self.path.parent / output
+
+    def is_current(self, subject_id, inputs):
+        '''
+        Returns True if subject_id was built from the same inputs (RawFiles or paths) by the same code,
+        and all of its outputs still exist.
+        '''
+        self.seen.add(subject_id)
+        entry = self.subjects.get(subject_id)
+        if entry is None or entry["inputs"] != self._fingerprints(inputs):
+            return False
+        if not all(os.path.exists(self._output_path(output)) for output in entry["outputs"]):
+            return False
+        self.skipped += 1
+        return True
+
+    def cached(self, subject_id, inputs):
+        '''
+        Returns the data recorded for subject_id if it is current (see is_current), else None.
+        '''
+        return self.subjects[subject_id]["data"] if self.is_current(subject_id, inputs) else None
+
+    def record(self, subject_id, inputs, outputs=(), data=None):
+        '''
+        Records that subject_id was built from inputs into outputs, with optional JSON-serializable data.
+        Outputs the subject had before but no longer has are deleted.
+        '''
+        self.seen.add(subject_id)
+        # Outputs are stored relative to the manifest, so a run from another working directory still finds them.
+        outputs = [os.path.relpath(output, self.path.parent) for output in outputs]
+        for old_output in self.previous.get(subject_id, {}).get("outputs", []):
+            if old_output not in outputs and os.path.exists(self._output_path(old_output)):
+                os.remove(self._output_path(old_output))
+        self.subjects[subject_id] = {"inputs": self._fingerprints(inputs), "outputs": outputs, "data": data}
+
+    def save(self):
+        '''
+        Deletes the outputs of subjects that were not seen in this run and writes the manifest.
+        Returns the IDs of the removed subjects.
+        '''
+        removed = sorted(subject_id for subject_id in {*self.previous, *self.subjects} if subject_id not in self.seen)
+        removed_outputs = 0
+        for subject_id in removed:
+            for output in self.previous.get(subject_id, self.subjects.get(subject_id, {})).get("outputs", []):
+                if os.path.exists(self._output_path(output)):
+                    os.remove(self._output_path(output))
+                    removed_outputs += 1
+            self.subjects.pop(subject_id, None)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"code": self.code, "subjects": self.subjects}, f, indent=1, default=lambda value: value.item())
+        os.replace(tmp_path, self.path)
+
+        if self.skipped and ALL_SUBJECTS in self.seen:
+            print(f"{YELLOW}Glucose-ML{R}: The raw data is unchanged since the last run, nothing to standardize.")
+        elif self.skipped:
+            print(f"{YELLOW}Glucose-ML{R}: {self.skipped} subject(s) unchanged since the last run were skipped.")
+        if removed_outputs:
+            print(f"{YELLOW}Glucose-ML{R}: Removed {len(removed)} subject(s) that are no longer in the data: {', '.join(removed)}")
+        return removed
+
+
+def load_script(script_path):
+    '''
+    Imports a harmonization script by path, since the file names can contain dashes.
+    '''
+    import importlib.util
+    script_path = Path(script_path).resolve()
+    spec = importlib.util.spec_from_file_location(script_path.stem.replace("-", "_"), script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def metadata_script_path(extract_script):
+    '''
+    Returns the path of the <Dataset>_metadata.py script that sits next to a <Dataset>_extract-glucose-data.py script.
+    '''
+    return Path(extract_script).resolve().with_name(Path(extract_script).name.replace("_extract-glucose-data.py", "_metadata.py"))
+
+
+def load_metadata_script(extract_script):
+    '''
+    Imports the <Dataset>_metadata.py script that sits next to a <Dataset>_extract-glucose-data.py script.
+    '''
+    return load_script(metadata_script_path(extract_script))
+
+
+def metadata_frame(df):
+    '''
+    Returns the timestamp and glucose columns of a standardized frame the way pd.read_csv reads them back from
+    the written CSV: timestamps held as python objects (e.g. datetime.time) become the text written for them, and
+    glucose values that are not numbers yet (e.g. strings, or "Low"/"High") become numbers or NaN.
+    '''
+    import pandas as pd
+    frame = df[["timestamp", "glucose_value_mg_dl"]].copy()
+    if frame["timestamp"].dtype == object:
+        frame["timestamp"] = frame["timestamp"].astype(str)
+    if not pd.api.types.is_numeric_dtype(frame["glucose_value_mg_dl"]):
+        frame["glucose_value_mg_dl"] = pd.to_numeric(frame["glucose_value_mg_dl"], errors="coerce")
+    return frame
+
+
+class SubjectMetadata:
+    '''
+    Computes each subject's metadata (with the dataset's clean_and_compute_metadata) from the frame the extract
+    script is about to write, instead of reading every standardized CSV back afterwards, and writes
+    Standardized-metadata/<Dataset>_metadata_calcs.csv with the dataset's write_metadata (see save).
+    '''
+
+    def __init__(self, extract_script):
+        self.module = load_metadata_script(extract_script)
+        self.script = self.module.__file__
+        self.subjects = {}
+
+    def add(self, subject_id, df):
+        '''
+        Computes and keeps the metadata of one subject's standardized frame. Returns the metadata.
+        '''
+        subject_id = str(subject_id)
+        with report_stage("metadata") as stats:
+            if stats is not None:
+                stats["rows_in"] += len(df)
+            self.subjects[subject_id] = self.module.clean_and_compute_metadata(metadata_frame(df), subject_id)
+        return self.subjects[subject_id]
+
+    def add_cached(self, subject_id, metadata):
+        '''
+        Keeps the metadata of a subject that was not standardized again (see HarmonizeManifest.cached).
+        '''
+        self.subjects[str(subject_id)] = metadata
+
+    def save(self, output_dir):
+        '''
+        Writes the metadata of every standardized CSV in output_dir, in the same order as the metadata script.
+        Files this run did not see (e.g. standardized one by one with extract_subject) are read back as before.
+        Returns the metadata table.
+        '''
+        import pandas as pd
+        with report_stage("metadata") as stats:
+            metadata_list = []
+            for subject in Path(output_dir).rglob("*.csv"):
+                metadata = self.subjects.get(subject.stem)
+                if metadata is None:
+                    df = pd.read_csv(subject)
+                    if stats is not None:
+                        stats["rows_in"] += len(df)
+                    metadata = self.module.clean_and_compute_metadata(df, subject.stem)
+                metadata_list.append(metadata)
+            # The metadata script writes its table to Standardized-metadata.
+            snapshot = output_snapshot(METADATA_DIR)
+            metadata_df = self.module.write_metadata(metadata_list)
+            if stats is not None:
+                stats["rows_out"] += len(metadata_df)
+                stats["bytes_written"] += sum(os.path.getsize(path) for path in written_since(METADATA_DIR, snapshot))
+            return metadata_df
+
+
+# Dataset specs: most datasets are standardized the same way (find the raw files, read them, rename the timestamp and
+# glucose columns, convert the units and timestamps, drop the incomplete rows, write one CSV per subject), so their
+# extract scripts only describe their raw data in a SPEC dict and harmonize_dataset does the rest. The keys of a spec:
+SPEC_DEFAULTS = {
+    # Glob pattern (or list of patterns) of the raw files, relative to the raw data folder.
+    "files": None,
+    # Match the patterns at any folder depth (RawSource.rglob) or only from the top of the folder (RawSource.glob).
+    "recursive": True,
+    # Use "all" the matching files, the "first" one, or exactly "one" (more than one is an error).
+    "use_files": "all",
+    # Read zip archives as if they were unpacked into a folder named after them (see RawSource).
+    "unpack_to_stem": False,
+    # "csv", "excel", or a plug-in reader: a function reader(f, raw_file) that returns the frame of an open raw file,
+    # or None to skip the file.
+    "reader": "csv",
+    # Keyword arguments of pd.read_csv / pd.read_excel, e.g. {"sep": ";"}.
+    "read_options": {},
+    # Raw column of the standardized "timestamp" and "glucose_value_mg_dl" columns. A list of timestamp columns is
+    # joined with spaces (e.g. a date and a time column), a list of glucose columns holds alternative names.
+    "columns": None,
+    # Subject of a raw file: "stem" (its name), "parent" (its folder's name) or a function of the RawFile.
+    "subject_id": "stem",
+    # Read the files of a subject together, in file name order (recordings split over several files).
+    "group_files": False,
+    # Column holding the subject of each row, for datasets published as one table of all subjects.
+    "subject_column": None,
+    # Type the subject column is converted to, e.g. int so the subjects sort numerically.
+    "subject_type": None,
+    # Columns whose values are replaced by the first group of a regular expression, e.g. {"USUBJID": r"'(.*)'"}.
+    "extract": {},
+    # Only keep the rows with these values, or drop them, e.g. {"type": "cgm"}.
+    "keep_rows": {},
+    "drop_rows": {},
+    # Sort the rows by "subject" (before anything else) or by "timestamp" (keeping the order of equal timestamps).
+    "sort": None,
+    # Glucose values are multiplied by this factor and rounded to one decimal, e.g. 18 for mmol/L.
+    "unit_factor": None,
+    # Parse the timestamps, or keep them as they are (e.g. minutes since the start of the study).
+    "parse_timestamp": True,
+    # Format of the timestamps (None: inferred), or a list of formats, each tried on the rows the ones before missed.
+    "timestamp_format": None,
+    "dayfirst": False,
+    # Timestamps counted from an epoch, e.g. {"unit": "s", "origin": "1960-01-01"} (arguments of pd.to_datetime).
+    "epoch": None,
+    # "raise" on timestamps that cannot be parsed, or "coerce" them so their rows are dropped.
+    "timestamp_errors": "raise",
+    # Round the timestamps, e.g. to "s" when Excel stored them as floating-point days.
+    "round_timestamp": None,
+    # strftime format the timestamps are written in (None: the pandas default).
+    "timestamp_output_format": None,
+    # Write a CSV (without readings) for subjects whose rows were all dropped.
+    "write_empty_subjects": False,
+}
+
+
+def dataset_spec(spec):
+    '''
+    Returns spec with the defaults of SPEC_DEFAULTS filled in. Raises ValueError on keys SPEC_DEFAULTS does not know
+    (e.g. a typo) and on specs without files or columns.
+    '''
+    unknown = sorted(set(spec) - set(SPEC_DEFAULTS))
+    if unknown:
+        raise ValueError(f"Unknown dataset spec keys: {', '.join(unknown)}")
+    spec = {**SPEC_DEFAULTS, **spec}
+    if spec["files"] is None or spec["columns"] is None:
+        raise ValueError("A dataset spec needs files and columns.")
+    return spec
+
+
+def spec_columns(spec):
+    '''
+    Returns the raw columns a spec uses. The other columns of a raw file are not parsed at all.
+    '''
+    columns = set()
+    for raw_columns in spec["columns"].values():
+        columns.update([raw_columns] if isinstance(raw_columns, str) else raw_columns)
+    if spec["subject_column"] is not None:
+        columns.add(spec["subject_column"])
+    for rule in ("extract", "keep_rows", "drop_rows"):
+        columns.update(spec[rule])
+    return columns
+
+
+def read_raw_file(spec, raw_file):
+    '''
+    Reads one raw file (a RawFile) with the spec's reader. Returns its frame, or None if a plug-in reader skipped it.
+    '''
+    import pandas as pd
+    with report_stage("parse") as stats, raw_file.open() as f:
+        if callable(spec["reader"]):
+            df = spec["reader"](f, raw_file)
+        else:
+            columns = spec_columns(spec)
+            read = {"csv": pd.read_csv, "excel": pd.read_excel}[spec["reader"]]
+            df = read(f, usecols=lambda column: column in columns, **spec["read_options"])
+        if stats is not None and df is not None:
+            stats["rows_out"] += len(df)
+    return df
+
+
+def parse_timestamps(spec, timestamp):
+    '''
+    Parses a raw timestamp column as the spec describes, all rows at once.
+    '''
+    import pandas as pd
+    if spec["epoch"] is not None:
+        return pd.to_datetime(timestamp, errors=spec["timestamp_errors"], **spec["epoch"])
+    formats = spec["timestamp_format"]
+    formats = formats if isinstance(formats, list) else [formats]
+    parsed = None
+    for number, timestamp_format in enumerate(formats, start=1):
+        # Only the last format raises (if the spec says so); the earlier ones leave what they missed to the next.
+        errors = spec["timestamp_errors"] if number == len(formats) else "coerce"
+        if parsed is None:
+            parsed = pd.to_datetime(timestamp, format=timestamp_format, dayfirst=spec["dayfirst"], errors=errors)
+            continue
+        missed = parsed.isna()
+        if not missed.any():
+            break
+        parsed.loc[missed] = pd.to_datetime(timestamp[missed], format=timestamp_format, dayfirst=spec["dayfirst"], errors=errors)
+    return parsed
+
+
+def standardize_frame(spec, df):
+    '''
+    Turns a raw frame into the standardized timestamp and glucose_value_mg_dl columns (and the subject column of a
+    table of all subjects), without the rows that miss either value. Every step works on whole columns.
+    '''
+    import pandas as pd
+    rows_in = len(df)
+    with report_stage("clean") as stats:
+        for column, pattern in spec["extract"].items():
+            df[column] = df[column].str.extract(pattern, expand=False)
+        subject_column = spec["subject_column"]
+        if subject_column is not None:
+            if spec["subject_type"] is not None:
+                df[subject_column] = df[subject_column].astype(spec["subject_type"])
+            if spec["sort"] == "subject":
+                df = df.sort_values(subject_column)
+            if spec["write_empty_subjects"]:
+                # Grouping by categories keeps the subjects whose rows are all dropped below.
+                df[subject_column] = pd.Categorical(df[subject_column], categories=df[subject_column].dropna().unique())
+        for column, value in spec["keep_rows"].items():
+            df = df[df[column] == value]
+        for column, value in spec["drop_rows"].items():
+            df = df[df[column] != value]
+
+        # Rename columns to the standardized names used throughout the project.
+        timestamp_columns = spec["columns"]["timestamp"]
+        if isinstance(timestamp_columns, str):
+            timestamp = df[timestamp_columns]
+        else:
+            timestamp = df[timestamp_columns[0]]
+            for column in timestamp_columns[1:]:
+                timestamp = timestamp + " " + df[column]
+        glucose_columns = spec["columns"]["glucose_value_mg_dl"]
+        if not isinstance(glucose_columns, str):
+            glucose_columns = next((column for column in glucose_columns if column in df.columns), glucose_columns[0])
+        frame = pd.DataFrame({"timestamp": timestamp, "glucose_value_mg_dl": df[glucose_columns]})
+        if subject_column is not None:
+            frame[subject_column] = df[subject_column]
+
+        if spec["parse_timestamp"]:
+            frame["timestamp"] = parse_timestamps(spec, frame["timestamp"])
+            if spec["round_timestamp"] is not None:
+                frame["timestamp"] = frame["timestamp"].dt.round(spec["round_timestamp"])
+        if spec["sort"] == "timestamp":
+            frame = frame.sort_values("timestamp", kind="stable")
+        if spec["unit_factor"] is not None:
+            # Convert glucose records to mg/dL (e.g. from mmol/L).
+            frame["glucose_value_mg_dl"] = (pd.to_numeric(frame["glucose_value_mg_dl"], errors="coerce") * spec["unit_factor"]).round(1)
+
+        # Drop rows missing timestamps or glucose values
+        frame = frame.dropna(subset=["timestamp", "glucose_value_mg_dl"])
+        if spec["timestamp_output_format"] is not None:
+            frame["timestamp"] = frame["timestamp"].dt.strftime(spec["timestamp_output_format"])
+        if stats is not None:
+            stats["rows_in"] += rows_in
+            stats["rows_out"] += len(frame)
+            # Rows dropped for missing values and by keep_rows/drop_rows.
+            stats["rows_dropped"] += rows_in - len(frame)
+    return frame
+
+
+def write_standardized_csv(df, path):
+    '''
+    Writes a standardized frame to path without its index, as the "write" stage of the active RunReport.
+    '''
+    with report_stage("write") as stats:
+        df.to_csv(path, index=False)
+        if stats is not None:
+            stats["rows_in"] += len(df)
+            stats["rows_out"] += len(df)
+            stats["bytes_written"] += os.path.getsize(path)
+
+
+def standardize_raw_files(spec, subject, subject_id, output_dir):
+    '''
+    Standardizes one subject of a dataset published as one raw file (or a few) per subject: reads its raw file(s)
+    (a RawFile, or a list of them) and writes output_dir/<subject_id>.csv.
+    Returns the written frame, or None if the subject has no raw file the reader could read.
+    '''
+    import pandas as pd
+    spec = dataset_spec(spec)
+    raw_files = subject if isinstance(subject, list) else [subject]
+    frames = [frame for frame in (read_raw_file(spec, raw_file) for raw_file in raw_files) if frame is not None]
+    if not frames:
+        return None
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    subj_df = standardize_frame(spec, df)
+    # Create an output csv for the subject.
+    write_standardized_csv(subj_df, os.path.join(output_dir, f"{subject_id}.csv"))
+    return subj_df
+
+
+def subject_jobs(jobs=None):
+    '''
+    Returns how many processes standardize_subjects may use: jobs if given, else SUBJECT_JOBS_ENV, else one per CPU.
+    '''
+    if jobs is None:
+        jobs = os.environ.get(SUBJECT_JOBS_ENV) or os.cpu_count() or 1
+    return max(int(jobs), 1)
+
+
+# What each worker process of standardize_subjects has loaded, so it is only done once per process.
+_worker_sources = {}
+_worker_specs = {}
+_worker_metadata = {}
+
+
+def _standardize_in_worker(extract_script, source_path, unpack_to_stem, raw_paths, subject_id, output_dir, dataset):
+    '''
+    Runs standardize_raw_files for one subject of standardize_subjects in a worker process. The spec is the SPEC of
+    extract_script, and the raw files are looked up in the worker's own RawSource, since open archives cannot be sent
+    between processes.
+    Returns the subject's metadata (None if it was skipped) and, if the dataset is being reported on (dataset is not
+    None), the stages measured here.
+    '''
+    key = (source_path, unpack_to_stem)
+    if key not in _worker_sources:
+        _worker_sources[key] = RawSource(source_path, unpack_to_stem=unpack_to_stem)
+    if extract_script not in _worker_specs:
+        _worker_specs[extract_script] = load_script(extract_script).SPEC
+        _worker_metadata[extract_script] = SubjectMetadata(extract_script)
+    raw_files = [_worker_sources[key].files[raw_path] for raw_path in raw_paths]
+    subject = raw_files if len(raw_files) > 1 else raw_files[0]
+
+    def standardize():
+        subj_df = standardize_raw_files(_worker_specs[extract_script], subject, subject_id, output_dir)
+        return None if subj_df is None else _worker_metadata[extract_script].add(subject_id, subj_df)
+
+    if dataset is None:
+        return standardize(), None
+    report = RunReport(dataset)
+    with report.track():
+        metadata = standardize()
+    return metadata, report.stages
+
+
+def standardize_subjects(extract_script, spec, source, subjects, output_dir, jobs=None):
+    '''
+    Standardizes a dataset published as one raw file (or a few) per subject, and writes its metadata.
+    subjects is a list of (subject_id, raw file(s)) from source, each standardized with standardize_raw_files and spec,
+    which must be the SPEC of extract_script.
+    Subjects unchanged since the last run are skipped (see HarmonizeManifest). The others are spread over up to
+    jobs worker processes (see subject_jobs), or standardized in this process when there is only one to do.
+    Returns the metadata table (see SubjectMetadata.save).
+    '''
+    metadata = SubjectMetadata(extract_script)
+    manifest = HarmonizeManifest(Path(output_dir) / MANIFEST_NAME, [extract_script, metadata.script])
+
+    pending = []
+    for subject_id, subject in subjects:
+        raw_files = subject if isinstance(subject, list) else [subject]
+        # Subjects whose raw files and the code did not change since the last run are already standardized.
+        cached = manifest.cached(subject_id, raw_files)
+        if cached is not None:
+            metadata.add_cached(subject_id, cached)
+        else:
+            pending.append((subject_id, subject, raw_files))
+
+    # Subjects standardized in this run; those without a readable raw file write no CSV and are not counted.
+    standardized = 0
+    jobs = min(subject_jobs(jobs), len(pending))
+    if jobs <= 1:
+        for subject_id, subject, raw_files in pending:
+            subj_df = standardize_raw_files(spec, subject, subject_id, output_dir)
+            if subj_df is not None:
+                standardized += 1
+                manifest.record(subject_id, raw_files, outputs=[os.path.join(output_dir, f"{subject_id}.csv")], data=metadata.add(subject_id, subj_df))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        report = active_report()
+        with report.workers() if report is not None else contextlib.nullcontext():
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {
+                    pool.submit(_standardize_in_worker, str(Path(extract_script).resolve()), str(source.path),
+                                source.unpack_to_stem, [str(raw_file.path) for raw_file in raw_files], subject_id,
+                                str(output_dir), report.dataset if report is not None else None): (subject_id, raw_files)
+                    for subject_id, subject, raw_files in pending
+                }
+                for future in as_completed(futures):
+                    subject_id, raw_files = futures[future]
+                    subject_metadata, stages = future.result()
+                    if stages is not None:
+                        report.merge(stages)
+                    if subject_metadata is not None:
+                        standardized += 1
+                        metadata.add_cached(subject_id, subject_metadata)
+                        manifest.record(subject_id, raw_files, outputs=[os.path.join(output_dir, f"{subject_id}.csv")], data=subject_metadata)
+    manifest.save()
+    unchanged = len(metadata.subjects) - standardized
+    if unchanged:
+        print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{standardized}{R} subjects ({unchanged} unchanged, {len(metadata.subjects)} in total).')
+    else:
+        print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{standardized}{R} subjects.')
+    return metadata.save(output_dir)
+
+
+def standardize_table(extract_script, spec, raw_files, output_dir):
+    '''
+    Standardizes a dataset published as one table of all subjects (spread over raw_files, which are read one after
+    the other), and writes its metadata. The whole table is standardized at once and split by subject in one pass.
+    Every subject comes from the same raw data, so nothing is standardized again unless it (or the code) changed.
+    Returns the metadata table (see SubjectMetadata.save).
+    '''
+    import pandas as pd
+    metadata = SubjectMetadata(extract_script)
+    manifest = HarmonizeManifest(Path(output_dir) / MANIFEST_NAME, [extract_script, metadata.script])
+    cached = manifest.cached(ALL_SUBJECTS, raw_files)
+    if cached is not None:
+        metadata.subjects.update(cached)
+        manifest.save()
+        return metadata.save(output_dir)
+
+    snapshot = output_snapshot(output_dir)
+    frames = [frame for frame in (read_raw_file(spec, raw_file) for raw_file in raw_files) if frame is not None]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    frame = standardize_frame(spec, df)
+    del df, frames
+    count = 0
+    for subject, subj_df in frame.groupby(spec["subject_column"], sort=False, observed=not spec["write_empty_subjects"]):
+        subj_df = subj_df[["timestamp", "glucose_value_mg_dl"]]
+        # Create an output csv for each subject.
+        write_standardized_csv(subj_df, os.path.join(output_dir, f"{subject}.csv"))
+        metadata.add(subject, subj_df)
+        count += 1
+    print(f'{LIME_GREEN}Glucose-ML{R}: Standardized CGM records for {LIGHT_RED}{count}{R} subjects.')
+    manifest.record(ALL_SUBJECTS, raw_files, outputs=written_since(output_dir, snapshot), data=metadata.subjects)
+    manifest.save()
+    return metadata.save(output_dir)
+
+
+def spec_subjects(spec, source):
+    '''
+    Finds the raw files of the dataset that spec (filled in by dataset_spec) describes in source (a RawSource), and
+    returns its subjects as a list of (subject_id, raw file(s)). A dataset published as one table of all subjects is
+    a single subject ALL_SUBJECTS whose raw files are the table's.
+    '''
+    patterns = spec["files"] if isinstance(spec["files"], list) else [spec["files"]]
+    find = source.rglob if spec["recursive"] else source.glob
+    raw_files = sorted({raw_file.path: raw_file for pattern in patterns for raw_file in find(pattern)}.values(), key=lambda raw_file: raw_file.path)
+    if spec["use_files"] != "all" or spec["subject_column"] is not None:
+        if not raw_files:
+            raise FileNotFoundError(f"{LIGHT_RED}Glucose-ML{R}: Error - No raw file matching {' or '.join(patterns)} found under: {source.path}")
+        if spec["use_files"] == "one" and len(raw_files) > 1:
+            raise RuntimeError(f"{LIGHT_RED}Glucose-ML{R}: Error - Multiple raw files found: {raw_files}")
+        if spec["use_files"] == "first":
+            raw_files = raw_files[:1]
+
+    if spec["subject_column"] is not None:
+        return [(ALL_SUBJECTS, raw_files)]
+
+    subject_id = {"stem": lambda raw_file: raw_file.stem, "parent": lambda raw_file: raw_file.parent.name}.get(spec["subject_id"], spec["subject_id"])
+    if spec["group_files"]:
+        subject_files = {}
+        for raw_file in raw_files:
+            subject_files.setdefault(subject_id(raw_file), []).append(raw_file)
+        return [(subject, sorted(files, key=lambda raw_file: raw_file.name)) for subject, files in subject_files.items()]
+    return [(subject_id(raw_file), raw_file) for raw_file in raw_files]
+
+
+def harmonize_dataset(extract_script, spec, input_path, output_dir):
+    '''
+    Standardizes the raw data in input_path (a folder or zip archive) of the dataset that spec describes (see
+    SPEC_DEFAULTS) into one CSV per subject in output_dir, and writes their metadata to Standardized-metadata in the
+    same pass. extract_script is the dataset's extract script, whose SPEC spec is.
+    Returns the metadata table.
+    '''
+    spec = dataset_spec(spec)
+    input_path = Path(input_path)
+    #Create output directory "Standardized-datasets" to store standardized CSV file outputs.
+    os.makedirs(output_dir, exist_ok=True)
+
+    with RawSource(input_path, unpack_to_stem=spec["unpack_to_stem"]) as source:
+        subjects = spec_subjects(spec, source)
+        if spec["subject_column"] is not None:
+            return standardize_table(extract_script, spec, subjects[0][1], output_dir)
+        # Each subject is a work unit (see standardize_raw_files), spread over several processes when there are many.
+        return standardize_subjects(extract_script, spec, source, subjects, output_dir)
+
+
+def dry_run_dataset(extract_script, spec, input_path, output_dir):
+    '''
+    Works out what harmonize_dataset would do, without reading any raw data or writing anything: the raw files it
+    would find in input_path, and which subjects are unchanged since the last run (see HarmonizeManifest) and which
+    would be standardized. Only needs the standard library.
+    Returns a dict with the counts of raw files and subjects, and the IDs of the subjects to standardize.
+    '''
+    spec = dataset_spec(spec)
+    manifest = HarmonizeManifest(Path(output_dir) / MANIFEST_NAME, [extract_script, metadata_script_path(extract_script)])
+    with RawSource(input_path, unpack_to_stem=spec["unpack_to_stem"]) as source:
+        subjects = spec_subjects(spec, source)
+        raw_files = [raw_file for _, subject in subjects for raw_file in (subject if isinstance(subject, list) else [subject])]
+        pending = [subject_id for subject_id, subject in subjects if manifest.cached(subject_id, subject if isinstance(subject, list) else [subject]) is None]
+    return {
+        "raw_files": len(raw_files),
+        "raw_bytes": sum(raw_file.size for raw_file in raw_files),
+        "subjects": None if spec["subject_column"] is not None else len(subjects),
+        "pending": pending,
+    }
+
+
+# Run reports: standardize_datasets measures each dataset's harmonization stage by stage (see RunReport) and
+# appends one JSON line per dataset to REPORT_NAME, so runs can be compared over time.
+REPORT_NAME = "harmonize-report.jsonl"
+REPORT_STAGES = ("discover", "read", "parse", "clean", "write", "metadata")
+
+# The RunReport of the dataset each thread is harmonizing, if any (datasets can be harmonized in threads
+# while others download, see auto-download-open-datasets.py --harmonize).
+_reporting = threading.local()
+
+
+def active_report():
+    return getattr(_reporting, "report", None)
+
+
+def peak_rss_bytes():
+    '''
+    Returns the peak resident memory of this process over its whole life, in bytes (None where the resource module is
+    missing, e.g. on Windows). It is never reset, so it includes everything the process ran before; see PeakMemory
+    for the peak of one dataset or stage.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux, where resetting VmHWM (see PeakMemory) resets it too.
+    return max(peak if sys.platform == "darwin" else peak * 1024, _process_peak)
+
+
+def _high_water_mark():
+    '''
+    Returns the peak resident memory of this process since it was last reset (VmHWM), in bytes, or None outside Linux.
+    '''
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_high_water_mark():
+    '''
+    Resets VmHWM to the memory in use now. Returns False where that is not possible (outside Linux, or not allowed).
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# The PeakMemory blocks running in this process, which each reset of the peak hands the peak so far to, and the
+# process's peak before the last reset (see peak_rss_bytes).
+_peak_lock = threading.Lock()
+_peak_blocks = []
+_process_peak = 0
+
+
+def _reset_peak_blocks():
+    # A forked worker process measures its own blocks, and must not inherit a lock held by another thread.
+    global _peak_lock, _process_peak
+    _peak_lock = threading.Lock()
+    _peak_blocks.clear()
+    _process_peak = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_peak_blocks)
+
+
+class PeakMemory:
+    '''
+    Measures the peak resident memory of the code in a with block on its own: the process's peak is reset when
+    the block starts, so memory used before it (e.g. by datasets harmonized earlier in the same process) does not
+    count, while memory still held from before does. Blocks can be nested or overlap (datasets harmonized in threads);
+    each reset first records the peak so far for the blocks still running.
+    peak_rss_bytes is set when the block ends, and stays None where the peak cannot be reset (outside Linux).
+    '''
+
+    def __init__(self):
+        self.peak_rss_bytes = None
+        self.tracked = False
+
+    @staticmethod
+    def _record():
+        global _process_peak
+        peak = _high_water_mark()
+        if peak is not None:
+            _process_peak = max(_process_peak, peak)
+            for block in _peak_blocks:
+                block.peak_rss_bytes = max(block.peak_rss_bytes or 0, peak)
+
+    def __enter__(self):
+        with _peak_lock:
+            self._record()
+            self.tracked = _reset_high_water_mark()
+            if self.tracked:
+                _peak_blocks.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self.tracked:
+            with _peak_lock:
+                self._record()
+                _peak_blocks.remove(self)
+                self.tracked = False
+
+
+def max_peak(*peaks):
+    '''
+    Returns the largest of the peaks that are known (not None), or None.
+    '''
+    known = [peak for peak in peaks if peak is not None]
+    return max(known) if known else None
+
+
+def report_stage(name):
+    '''
+    Times the code in a with block as stage name of the active RunReport, and does nothing when no report is active.
+    The with block receives the stage's counters (a dict, or None when nothing is recorded).
+    '''
+    report = active_report()
+    if report is None:
+        return contextlib.nullcontext()
+    return report.stage(name)
+
+
+class CountingReader(io.RawIOBase):
+    '''
+    Wraps a raw file opened while a RunReport is active, adding the bytes read and the time spent reading
+    (and decompressing) them to the report's "read" stage.
+    '''
+
+    def __init__(self, fileobj, report):
+        self.fileobj = fileobj
+        self.report = report
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.fileobj.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.fileobj.seek(offset, whence)
+
+    def tell(self):
+        return self.fileobj.tell()
+
+    def readinto(self, buffer):
+        wall, cpu = time.perf_counter(), time.process_time()
+        data = self.fileobj.read(len(buffer))
+        buffer[:len(data)] = data
+        self.report.add_read(len(data), time.perf_counter() - wall, time.process_time() - cpu)
+        return len(data)
+
+    def close(self):
+        self.fileobj.close()
+        super().close()
+
+
+class RunReport:
+    '''
+    Measures one dataset's harmonization in these stages:
+      - discover: listing the raw files (RawSource); rows_out counts the raw files found
+      - read: reading and decompressing raw files (RawFile.open); bytes_read
+      - parse: turning raw files into frames with the spec's reader (read_raw_file); rows_out
+      - clean: standardizing the frames (standardize_frame) and everything else the extract script does; rows_in,
+        rows_dropped, rows_out
+      - write: writing the standardized CSVs (write_standardized_csv); rows_out, bytes_written
+      - metadata: computing and writing the metadata (SubjectMetadata, generate_metadata); rows_in, rows_out (subjects),
+        bytes_written
+    with the wall and CPU seconds spent in each, and the peak memory of each on its own (peak_rss_bytes, see
+    PeakMemory), so a stage that needs too much memory shows up even after other datasets ran in the same process.
+    Raw files are read while they are parsed, so the read stage's peak is its parse stage's.
+
+    The functions above count their own rows and bytes into the calling thread's active report (see report_stage),
+    so extract scripts built on them are measured without changes. A stage started inside another one counts toward
+    the outer stage, except reading raw files, which is always "read".
+    CPU seconds and peak memory are those of the whole process, so they overlap when datasets are harmonized in threads.
+    Stages run in the worker processes of standardize_subjects are added up over the workers (so they can add up
+    to more than the dataset's wall time), and their peak memory is that of the largest worker.
+    '''
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.started = time.time()
+        self.stages = self._empty_stages()
+        # Stages measured in worker processes (see standardize_subjects), and the time spent waiting for them.
+        self.worker_stages = self._empty_stages()
+        self.workers_wall_s = 0.0
+        self.workers_cpu_s = 0.0
+        self.current = None
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_bytes = None
+
+    @staticmethod
+    def _empty_stages():
+        return {
+            name: {"wall_s": 0.0, "cpu_s": 0.0, "rows_in": 0, "rows_out": 0, "rows_dropped": 0,
+                   "bytes_read": 0, "bytes_written": 0, "peak_rss_bytes": None}
+            for name in REPORT_STAGES
+        }
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.current is not None:
+            yield self.stages[self.current]
+            return
+        self.current = name
+        read = self.stages["read"]
+        read_wall, read_cpu = read["wall_s"], read["cpu_s"]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            with PeakMemory() as peak:
+                yield self.stages[name]
+        finally:
+            stats = self.stages[name]
+            # Raw file reads inside the stage were already counted as "read".
+            stats["wall_s"] += time.perf_counter() - wall - (read["wall_s"] - read_wall)
+            stats["cpu_s"] += time.process_time() - cpu - (read["cpu_s"] - read_cpu)
+            stats["peak_rss_bytes"] = max_peak(stats["peak_rss_bytes"], peak.peak_rss_bytes)
+            self.current = None
+
+    def add_read(self, size, wall, cpu):
+        read = self.stages["read"]
+        read["bytes_read"] += size
+        read["wall_s"] += wall
+        read["cpu_s"] += cpu
+
+    @contextlib.contextmanager
+    def workers(self):
+        '''
+        Marks the with block as waiting for worker processes, whose stages are added with merge.
+        '''
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.workers_wall_s += time.perf_counter() - wall
+            self.workers_cpu_s += time.process_time() - cpu
+
+    @staticmethod
+    def _add_stages(totals, stages):
+        for name, stats in stages.items():
+            for key, value in stats.items():
+                if key != "peak_rss_bytes":
+                    totals[name][key] += value
+                else:
+                    totals[name][key] = max_peak(totals[name][key], value)
+
+    def merge(self, stages):
+        '''
+        Adds the stages a worker process measured for one subject.
+        '''
+        self._add_stages(self.worker_stages, stages)
+
+    @contextlib.contextmanager
+    def track(self):
+        '''
+        Makes this the calling thread's active report and measures the code in the with block (one dataset's harmonization).
+        '''
+        _reporting.report = self
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            with PeakMemory() as peak:
+                yield self
+        finally:
+            self.peak_rss_bytes = peak.peak_rss_bytes
+            self.wall_s = time.perf_counter() - wall
+            self.cpu_s = time.process_time() - cpu
+            _reporting.report = None
+            # Whatever was not measured by another stage (or done by worker processes) is the extract script's own cleaning work.
+            clean = self.stages["clean"]
+            other_stages = [stats for name, stats in self.stages.items() if name != "clean"]
+            clean["wall_s"] = max(self.wall_s - self.workers_wall_s - sum(stats["wall_s"] for stats in other_stages), 0.0)
+            clean["cpu_s"] = max(self.cpu_s - self.workers_cpu_s - sum(stats["cpu_s"] for stats in other_stages), 0.0)
+            # Raw files are read while they are parsed.
+            self.stages["read"]["peak_rss_bytes"] = self.stages["parse"]["peak_rss_bytes"]
+            self.merge_workers()
+
+    def merge_workers(self):
+        '''
+        Adds the stages measured in worker processes to this process's own.
+        '''
+        self._add_stages(self.stages, self.worker_stages)
+        self.worker_stages = self._empty_stages()
+
+    def save(self, status, path=REPORT_NAME):
+        '''
+        Appends this report, with the dataset's status ("ok" or "failed"), as one JSON line to path. Returns the entry.
+        '''
+        entry = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "dataset": self.dataset,
+            "status": status,
+            "wall_s": round(self.wall_s, 3),
+            "cpu_s": round(self.cpu_s, 3),
+            # The dataset's own peak (the largest of this process's and its worker processes'), and the peak of the whole
+            # process so far, which includes the datasets harmonized before this one in the same process.
+            "peak_rss_bytes": max_peak(self.peak_rss_bytes, *(stats["peak_rss_bytes"] for stats in self.stages.values())),
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "stages": {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()}
+                for name, stats in self.stages.items()
+            },
+        }
+        # One write per line, so datasets harmonized at the same time (--jobs) do not interleave their entries.
+        with open(path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
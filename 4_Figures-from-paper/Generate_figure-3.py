@@ -161,7 +161,7 @@ def plot_race_eth(base_directory):
 
 def main():
     # Table 1 csv.
-    raw_csv = Path("../5_Tables-from-paper/Tables/Table_3.csv")
+    raw_csv = Path("../5_Tables-from-paper/Table_3.csv")
     data_raw = pd.read_csv(raw_csv)
     data_raw = data_raw.drop([0, 15]) # Drop one of the CGMacros rows.
 